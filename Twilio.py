@@ -6,19 +6,51 @@ Module for managing a Twilio client and handling WhatsApp conversations.
 import os
 import time
 import json
+import asyncio
+import threading
+import weakref
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
 from twilio.rest import Client
+from twilio.http.async_http_client import AsyncTwilioHttpClient
+from twilio.base.exceptions import TwilioRestException
 from dotenv import load_dotenv
 from rich.console import Console
 from rich import progress
+from twilio_webhook import WebhookServer
+from inbox import Inbox
+from deadline import deadline_paused
+from message_status import DeliveryTracker, MessageHandle
+from outbound_scheduler import OutboundScheduler
+from conversation_registry import ConversationRegistry, UserSession
+from template_cache import CACHE_FOLDER
 
 console = Console()
 
+CONVERSATION_INDEX_PATH = os.path.join(CACHE_FOLDER, "conversation_index.json")
+
+# Address of the user the current command is being handled for
+_current_address = ContextVar("current_address", default=None)
+
 
 class Twilio:
-    def __init__(self):
+    def __init__(self, webhook_port: int = None):
         """
         Initialize the Twilio client, set up the conversation service,
-        and reset old messages.
+        and remember where the existing message history ends.
+
+        The user in PHONE_NUMBER (if set) is registered as the default user.
+        Further users are registered as their messages arrive.
+
+        If a webhook port is given (or TWILIO_WEBHOOK_PORT is set), inbound
+        messages are received through a local webhook endpoint instead of
+        polling the conversation.
+
+        Args:
+            webhook_port (int, optional): Port for the inbound webhook receiver.
+                Defaults to os.getenv("TWILIO_WEBHOOK_PORT").
         """
         console.print("Initializing Twilio connection ...", style="bold green")
         load_dotenv()
@@ -28,15 +60,166 @@ class Twilio:
         self.service_sid = os.getenv("TWILIO_CHAT_SERVICE_SID")
         self.client = Client(api_sid, api_secret, account_sid)
         self.service = self.client.conversations.v1.services(self.service_sid)
+        # Clients using Twilio's async HTTP client, one per event loop
+        self._credentials = (api_sid, api_secret, account_sid)
+        self._async_clients = weakref.WeakKeyDictionary()
 
-        self.address = f"whatsapp:{os.getenv('PHONE_NUMBER')}"
         self.ms_address = f"whatsapp:{os.getenv('TWILIO_PHONE_NUMBER')}"
 
-        self.my_conversation = (
-            self.get_my_conversation() or self.create_my_conversation()
+        # Every user the bot talks to, keyed by WhatsApp address
+        self.registry = ConversationRegistry()
+        self.default_address = None
+        if os.getenv("PHONE_NUMBER"):
+            self.default_address = f"whatsapp:{os.getenv('PHONE_NUMBER')}"
+            start = time.perf_counter()
+            session = self.open_session(self.default_address)
+            console.print(
+                f"Found conversation {session.conversation_sid} in {time.perf_counter() - start:.2f}s",
+                style="bold green",
+            )
+
+        # Every inbound message is queued here in order until the bot takes it
+        self.inbox = Inbox()
+
+        webhook_port = webhook_port or os.getenv("TWILIO_WEBHOOK_PORT")
+        self.webhook = None
+        if webhook_port:
+            self.webhook = WebhookServer(
+                port=int(webhook_port), inbox=self.inbox, accept=self._is_user_message,
+                on_status=lambda sid, status: self.delivery.update(sid, status),
+            )
+            self.webhook.start()
+
+        # Delivery statuses of sent messages come from status callbacks when
+        # Twilio can reach the webhook, with batched polling as the fallback
+        self.status_callback_url = os.getenv("TWILIO_STATUS_CALLBACK_URL")
+        if not self.status_callback_url and self.webhook is not None and os.getenv("TWILIO_WEBHOOK_URL"):
+            self.status_callback_url = f"{self.webhook.public_url.rstrip('/')}/status"
+        self.delivery = DeliveryTracker(
+            poll=self._poll_delivery_statuses,
+            poll_interval=5.0 if self.status_callback_url else 0.5,
         )
-        
-        self.reset_messages()
+
+        # Async sends are paced to stay within Twilio's per-number throughput
+        self.outbound = OutboundScheduler(
+            sender_rate=float(os.getenv("TWILIO_SENDER_RATE", "80")),
+            sender_burst=float(os.getenv("TWILIO_SENDER_BURST", "10")),
+            recipient_rate=float(os.getenv("TWILIO_RECIPIENT_RATE", "2")),
+            recipient_burst=float(os.getenv("TWILIO_RECIPIENT_BURST", "5")),
+        )
+
+        # Without the webhook, users idle for longer than the active window are
+        # polled only once per idle interval instead of on every poll
+        self.poll_active_window = float(os.getenv("TWILIO_POLL_ACTIVE_WINDOW", "900"))
+        self.idle_poll_interval = float(os.getenv("TWILIO_IDLE_POLL_INTERVAL", "30"))
+        self._idle_polled_at = 0.0
+        self._waiting_for = {}
+        self._waiting_lock = threading.Lock()
+
+    def open_session(self, address, conversation_sid=None):
+        """
+        Return the session of a user, registering the user if needed.
+
+        The user's conversation is looked up (or created) unless its SID is given.
+        Only messages added after the session is opened are treated as new.
+
+        Args:
+            address (str): The user's WhatsApp address.
+            conversation_sid (str, optional): SID of the user's conversation, if known.
+
+        Returns:
+            UserSession: The user's session.
+        """
+        session = self.registry.get(address)
+        if session is not None:
+            return session
+        if conversation_sid is None:
+            conversation = self.find_conversation(address) or self.create_conversation(address)
+            conversation_sid = conversation.sid
+        last_message_index = self._latest_message_index(self.service.conversations(conversation_sid))
+        return self.registry.add(address, conversation_sid, last_message_index)
+
+    @contextmanager
+    def session_for(self, address):
+        """
+        Direct messages sent within the block to the given user.
+
+        Args:
+            address (str): The user's WhatsApp address.
+
+        Yields:
+            UserSession: The user's session.
+        """
+        session = self.open_session(address)
+        token = _current_address.set(address)
+        try:
+            yield session
+        finally:
+            _current_address.reset(token)
+
+    @property
+    def current_session(self) -> UserSession:
+        """
+        The session of the user currently being served, or of the default user.
+        """
+        address = _current_address.get() or self.default_address
+        if address is None:
+            raise RuntimeError("No current user. Use session_for() or set PHONE_NUMBER in .env file")
+        return self.open_session(address)
+
+    @property
+    def address(self):
+        """
+        WhatsApp address of the current user.
+        """
+        return self.current_session.address
+
+    @property
+    def my_conversation(self):
+        """
+        Conversation with the current user.
+        """
+        return self.service.conversations(self.current_session.conversation_sid)
+
+    @property
+    def last_message_index(self):
+        """
+        Index of the newest message already seen in the current user's conversation.
+        """
+        return self.current_session.last_message_index
+
+    @last_message_index.setter
+    def last_message_index(self, index):
+        self.current_session.last_message_index = index
+
+    @property
+    def async_client(self):
+        """
+        Twilio client for the running event loop, using Twilio's async HTTP client.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = Client(
+                *self._credentials, http_client=AsyncTwilioHttpClient()
+            )
+        return client
+
+    @property
+    def my_async_conversation(self):
+        """
+        Conversation with the current user, accessed through the async client.
+        """
+        service = self.async_client.conversations.v1.services(self.service_sid)
+        return service.conversations(self.current_session.conversation_sid)
+
+    async def close_async(self):
+        """
+        Close the async HTTP client of the running event loop, if any.
+        """
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.http_client.close()
 
     def delete_all_conversations(self):
         """
@@ -48,6 +231,82 @@ class Twilio:
         ):
             conversation.delete()
 
+    def _load_conversation_index(self):
+        """
+        Load the persisted address to conversation SID index.
+
+        Returns:
+            dict: Conversation SIDs keyed by participant address.
+        """
+        if not os.path.exists(CONVERSATION_INDEX_PATH):
+            return {}
+        try:
+            with open(CONVERSATION_INDEX_PATH, "r") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            console.print(f"Could not read conversation index: {str(e)}", style="bold yellow")
+            return {}
+
+    def _save_conversation_index(self, index):
+        """
+        Persist the address to conversation SID index.
+
+        Args:
+            index (dict): Conversation SIDs keyed by participant address.
+        """
+        try:
+            os.makedirs(CACHE_FOLDER, exist_ok=True)
+            with open(CONVERSATION_INDEX_PATH, "w") as f:
+                json.dump(index, f, indent=2)
+        except OSError as e:
+            console.print(f"Could not save conversation index: {str(e)}", style="bold yellow")
+
+    def _remember_conversation(self, address, conversation_sid):
+        """
+        Record the conversation SID of an address in the persisted index.
+        """
+        index = self._load_conversation_index()
+        index[address] = conversation_sid
+        self._save_conversation_index(index)
+
+    def rebuild_conversation_index(self, max_workers: int = 8):
+        """
+        Rebuild the address to conversation SID index from every conversation.
+
+        Participants of all conversations are listed in parallel.
+
+        Args:
+            max_workers (int, optional): Number of concurrent participant lookups. Defaults to 8.
+
+        Returns:
+            tuple: The new index and the conversation objects keyed by SID.
+        """
+        conversations = {
+            conversation.sid: conversation for conversation in self.service.conversations.list()
+        }
+
+        def addresses_of(conversation):
+            return [
+                participant.messaging_binding["address"]
+                for participant in conversation.participants.list()
+                if participant.messaging_binding
+            ]
+
+        index = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for conversation, addresses in zip(
+                conversations.values(),
+                progress.track(
+                    executor.map(addresses_of, conversations.values()),
+                    total=len(conversations),
+                    description="Indexing conversations...",
+                ),
+            ):
+                for address in addresses:
+                    index.setdefault(address, conversation.sid)
+        self._save_conversation_index(index)
+        return index, conversations
+
     def get_my_conversation(self):
         """
         Retrieve an existing conversation that includes the user's phone number.
@@ -55,53 +314,264 @@ class Twilio:
         Returns:
             conversation: The conversation object if found, otherwise None.
         """
-        for conversation in progress.track(
-            self.service.conversations.list(), description="Getting my conversation..."
-        ):
-            participants = conversation.participants.list()
-            for participant in participants:
-                if (
-                    participant.messaging_binding
-                    and participant.messaging_binding["address"] == self.address
-                ):
+        return self.find_conversation(self.address)
+
+    def find_conversation(self, address):
+        """
+        Retrieve an existing conversation that includes the given address.
+
+        The conversation SID is looked up in the persisted index and validated
+        with a single fetch. On a miss, the address's conversations are looked up
+        with a single request instead of scanning every conversation; use
+        `rebuild_conversation_index` to rebuild the whole index.
+
+        Args:
+            address (str): The user's WhatsApp address.
+        
+        Returns:
+            conversation: The conversation object if found, otherwise None.
+        """
+        conversation_sid = self._load_conversation_index().get(address)
+        if conversation_sid:
+            try:
+                conversation = self.service.conversations(conversation_sid).fetch()
+                if conversation.state != "closed":
+                    console.print("Conversation index hit", style="bold green")
                     return conversation
+            except TwilioRestException as e:
+                console.print(f"Indexed conversation is gone: {str(e)}", style="bold yellow")
+
+        console.print("Conversation index miss, looking up the address...", style="bold yellow")
+        for participant in self.service.participant_conversations.list(address=address, limit=20):
+            if participant.conversation_state != "closed":
+                self._remember_conversation(address, participant.conversation_sid)
+                return self.service.conversations(participant.conversation_sid).fetch()
         return None
 
     def create_my_conversation(self):
         """
         Create a new conversation with the user's phone number.
         
+        Returns:
+            conversation: The newly created conversation object.
+        """
+        return self.create_conversation(self.address)
+
+    def create_conversation(self, address):
+        """
+        Create a new conversation with the given address.
+
+        Args:
+            address (str): The user's WhatsApp address.
+        
         Returns:
             conversation: The newly created conversation object.
         """
         conversation = self.service.conversations.create(
-            friendly_name=f"Conversation with {self.address}"
+            friendly_name=f"Conversation with {address}"
         )
         conversation.participants.create(
-            messaging_binding_address=self.address,
+            messaging_binding_address=address,
             messaging_binding_proxy_address=self.ms_address,
         )
+        self._remember_conversation(address, conversation.sid)
         return conversation
 
+    def wait_for_next_message(self, match=None):
+        """
+        Wait until any user sends a message, registering users seen for the first time.
+
+        Messages are returned one at a time in the order they were received.
+
+        Args:
+            match (callable, optional): Further restricts which messages are taken,
+                e.g. to skip users whose previous command is still running.
+
+        Returns:
+            dict: The inbox message, with `author` and `body` keys.
+        """
+        return self._wait_for_inbox_message(
+            lambda message: self._is_user_message(message) and (match is None or match(message))
+        )
+
     def wait_for_user_message(self):
         """
-        Wait until the user sends a message to the conversation.
+        Wait until the current user sends a message to the conversation.
+
+        Messages are returned one at a time in the order they were sent, so
+        several commands sent between two polls are all processed. Messages
+        from other users stay queued.
         
         Returns:
             str: The body of the user's message.
         """
+        match = self._from_current_user()
+        with self._awaiting(self.address):
+            message = self._wait_for_inbox_message(match)
+        return message["body"]
+
+    async def wait_for_user_message_async(self, timeout: float = None):
+        """
+        Wait until the current user sends a message, without blocking the event loop.
+
+        The time spent waiting does not count against the current command's deadline.
+
+        Args:
+            timeout (float, optional): Seconds to wait, or None to wait forever.
+
+        Returns:
+            str: The body of the user's message, or None if the timeout expired.
+        """
+        match = self._from_current_user()
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        with deadline_paused(), self._awaiting(self.address):
+            while give_up_at is None or time.monotonic() < give_up_at:
+                # Wait in short slices so no worker thread outlives the event loop
+                message = await asyncio.to_thread(self._wait_for_inbox_message, match, 1)
+                if message is not None:
+                    return message["body"]
+        return None
+
+    def _from_current_user(self):
+        """
+        Build a predicate accepting messages sent by the current user.
+        """
+        address = self.address
+        return lambda message: message["author"] == address and self._is_user_message(message)
+
+    @contextmanager
+    def _awaiting(self, address):
+        """
+        Mark a user as being waited for, so polling keeps fetching their messages.
+        """
+        with self._waiting_lock:
+            self._waiting_for[address] = self._waiting_for.get(address, 0) + 1
+        try:
+            yield
+        finally:
+            with self._waiting_lock:
+                self._waiting_for[address] -= 1
+                if not self._waiting_for[address]:
+                    del self._waiting_for[address]
+
+    def _wait_for_inbox_message(self, match, timeout=None):
+        """
+        Take the oldest inbox message accepted by `match`, polling while none is queued.
+
+        Args:
+            match (callable): Predicate selecting the message to take.
+            timeout (float, optional): Seconds to wait, or None to wait forever.
+
+        Returns:
+            dict: The inbox message, or None if the timeout expired.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
         while True:
-            messages = self.my_conversation.messages.list()
-            if len(messages) > 0 and messages[-1].author == self.address:
-                console.print("Got a message from the user", style="bold green")
-                message_body = messages[-1].body
-                try:
-                    messages[-1].delete()
-                except Exception as e:
-                    console.print(f"Could not delete message: {str(e)}", style="bold yellow")
-                return message_body
-            console.print("Waiting for user message...", style="bold yellow")
-            time.sleep(1)
+            if self.webhook is not None:
+                message = self.inbox.get(timeout=timeout, match=match)
+                if message is None:
+                    return None
+            else:
+                message = self.inbox.get(timeout=0, match=match)
+                if message is None:
+                    self.poll_into_inbox()
+                    message = self.inbox.get(timeout=0, match=match)
+                if message is None:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        return None
+                    console.print("Waiting for user message...", style="bold yellow")
+                    time.sleep(1)
+                    continue
+            session = self.open_session(message["author"], message["conversation_sid"])
+            session.last_active = time.time()
+            console.print(f"Got a message from {message['author']}", style="bold green")
+            return message
+
+    def _is_user_message(self, message):
+        """
+        Check whether an inbox message was sent by a WhatsApp user rather than the bot.
+
+        Args:
+            message (dict): The inbox message.
+
+        Returns:
+            bool: True if the message should be handled by the bot.
+        """
+        author = message["author"] or ""
+        return author.startswith("whatsapp:") and author != self.ms_address
+
+    def poll_into_inbox(self):
+        """
+        Fetch new messages from the conversations worth polling and queue them in the inbox.
+
+        Polling costs a request per conversation, so the default user, users
+        being waited for and users active within `poll_active_window` seconds
+        are polled every time, and idle users only every `idle_poll_interval`
+        seconds. A message from an idle user makes them active again.
+
+        Returns:
+            int: Number of messages queued.
+        """
+        queued = 0
+        now = time.time()
+        active_since = now - self.poll_active_window
+        with self._waiting_lock:
+            waiting_for = set(self._waiting_for)
+            poll_idle = now - self._idle_polled_at >= self.idle_poll_interval
+            if poll_idle:
+                self._idle_polled_at = now
+        for session in self.registry.sessions():
+            if (not poll_idle and session.address != self.default_address
+                    and session.address not in waiting_for and session.last_active < active_since):
+                continue
+            with self.session_for(session.address):
+                for message in self.fetch_new_messages():
+                    inbox_message = {
+                        "sid": message.sid,
+                        "author": message.author,
+                        "body": message.body,
+                        "conversation_sid": session.conversation_sid,
+                    }
+                    if self._is_user_message(inbox_message):
+                        queued += self.inbox.put(inbox_message)
+        return queued
+
+    def _latest_message_index(self, conversation):
+        """
+        Get the index of the newest message in a conversation.
+
+        Args:
+            conversation: The conversation object.
+
+        Returns:
+            int: The newest message index, or -1 if the conversation is empty.
+        """
+        for message in conversation.messages.stream(order="desc", limit=1):
+            return message.index
+        return -1
+
+    def fetch_new_messages(self, page_size: int = 5):
+        """
+        Fetch only the messages added since the last call, oldest first.
+
+        Pages are read newest first and reading stops at the last seen message
+        index, so the cost of a poll does not depend on the conversation length.
+
+        Args:
+            page_size (int, optional): Messages requested per page. Defaults to 5.
+
+        Returns:
+            list: The new message objects in the order they were sent.
+        """
+        new_messages = []
+        for message in self.my_conversation.messages.stream(order="desc", page_size=page_size):
+            if message.index <= self.last_message_index:
+                break
+            new_messages.append(message)
+        if new_messages:
+            self.last_message_index = new_messages[0].index
+        new_messages.reverse()
+        return new_messages
 
     def reset_messages(self):
         """
@@ -121,6 +591,23 @@ class Twilio:
         """
         console.print(f"Sending message to the user: {message}", style="bold blue")
         self.my_conversation.messages.create(body=message)
+
+    async def send_message_async(self, message) -> MessageHandle:
+        """
+        Send a text message to the user without blocking the event loop.
+
+        Args:
+            message (str): The message to be sent.
+
+        Returns:
+            MessageHandle: Handle to await the message's delivery with.
+        """
+        console.print(f"Sending message to the user: {message}", style="bold blue")
+        conversation = self.my_async_conversation
+        created = await self.outbound.submit(
+            self.address, lambda: conversation.messages.create_async(body=message)
+        )
+        return self.delivery.track(created.sid, "queued", conversation_sid=created.conversation_sid)
         
     def send_test_message(self):
         """
@@ -155,6 +642,27 @@ class Twilio:
         })
         )
         print("Message SID:", message.sid)
+
+    async def send_quick_reply_message_async(self, template_id) -> MessageHandle:
+        """
+        Send the quick reply message for a template without blocking the event loop.
+
+        Args:
+            template_id (str): ID of the meme template.
+
+        Returns:
+            MessageHandle: Handle to await the message's delivery with.
+        """
+        console.print(f"Sending quick reply for template {template_id}", style="bold blue")
+        conversation = self.my_async_conversation
+        message = await self.outbound.submit(self.address, lambda: conversation.messages.create_async(
+            content_sid="HX61d6f00d36124d6259f741df5183f746",
+            content_variables=json.dumps({
+                "1": template_id
+            })
+        ))
+        print("Message SID:", message.sid)
+        return self.delivery.track(message.sid, "queued", conversation_sid=message.conversation_sid)
     
         
         
@@ -175,6 +683,85 @@ class Twilio:
         )
         print("Message SID:", message.sid)
 
+    async def send_media_message_async(self, message_body, url_for_media) -> MessageHandle:
+        """
+        Send a media message to the user without blocking the event loop.
+
+        Args:
+            message_body (str): The text accompanying the media.
+            url_for_media (list or str): URL(s) of the media to send.
+
+        Returns:
+            MessageHandle: Handle to await the message's delivery with.
+        """
+        console.print(f"Sending message to the user: {message_body}", style="bold blue")
+        params = {
+            "from_": self.ms_address,
+            "to": self.address,
+            "body": message_body,
+            "media_url": url_for_media,
+        }
+        if self.status_callback_url:
+            params["status_callback"] = self.status_callback_url
+        messages = self.async_client.messages
+        message = await self.outbound.submit(self.address, lambda: messages.create_async(**params))
+        print("Message SID:", message.sid)
+        return self.delivery.track(message.sid, message.status)
+
+    async def _poll_delivery_statuses(self, handles):
+        """
+        Fetch the statuses of pending messages with as few requests as possible.
+
+        Messages sent through the Messaging API are looked up in one listing of
+        the bot's recently sent messages; conversation messages in one listing
+        per conversation.
+
+        Args:
+            handles (list): The pending message handles.
+
+        Returns:
+            dict: Status by message SID.
+        """
+        statuses = {}
+        messaging = [handle for handle in handles if handle.conversation_sid is None]
+        if messaging:
+            oldest = datetime.fromtimestamp(min(handle.created_at for handle in messaging) - 60, timezone.utc)
+            for message in await self.async_client.messages.list_async(
+                from_=self.ms_address, date_sent_after=oldest, limit=max(50, 2 * len(messaging))
+            ):
+                statuses[message.sid] = message.status
+
+        by_conversation = {}
+        for handle in handles:
+            if handle.conversation_sid is not None:
+                by_conversation.setdefault(handle.conversation_sid, []).append(handle)
+        service = self.async_client.conversations.v1.services(self.service_sid)
+        for conversation_sid, pending in by_conversation.items():
+            for message in await service.conversations(conversation_sid).messages.list_async(
+                order="desc", limit=max(20, 2 * len(pending))
+            ):
+                status = _conversation_delivery_status(message.delivery)
+                if status is not None:
+                    statuses[message.sid] = status
+        return statuses
+
+
+def _conversation_delivery_status(delivery):
+    """
+    Summarize a conversation message's delivery receipts as a single status.
+
+    Args:
+        delivery (dict): The message's `delivery` summary, e.g. {"delivered": "all", ...}.
+
+    Returns:
+        str: The status, or None if there are no receipts yet.
+    """
+    if not delivery:
+        return None
+    for status in ("read", "delivered", "failed", "undelivered", "sent"):
+        if delivery.get(status) == "all":
+            return status
+    return None
 
 if __name__ == "__main__":
     demo = Twilio()
@@ -0,0 +1,912 @@
+"""
+Micro-benchmarks for the Meme Machine's performance-sensitive paths.
+
+Run a single benchmark by name, or all of them without arguments:
+
+    python benchmarks.py metadata_memory
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import random
+import statistics
+import time
+import tracemalloc
+from collections import deque
+from types import SimpleNamespace
+from rich.console import Console
+from rich.table import Table
+
+from content_cache import ContentCache
+from conversation_registry import ConversationRegistry
+from delivery_pipeline import DeliveryPipeline
+from inbox import Inbox
+from meme_db import MemeDatabase, migrate_json_archive
+from meme_store import MemeArchive, MemeTimeline, archive_paths, read_memes
+from message_status import DeliveryTracker
+from outbound_scheduler import OutboundScheduler
+from prompt_pool import PromptPool
+from request_coalescer import RequestCoalescer, normalize_prompt
+from surprise_pool import SurpriseMemePool
+from Twilio import Twilio
+from template_index import TemplateIndex
+
+console = Console()
+
+# Number of Imgflip clients MemeBot creates, each of which used to hold its own copy
+CLIENTS_PER_BOT = 6
+
+
+def _fake_meme(i: int) -> dict:
+    """
+    Build a meme record shaped like the ones ImgflipAPI saves.
+    """
+    return {
+        "timestamp": f"2025-04-01T00:00:{i:09d}",
+        "type": "auto",
+        "query": f"benchmark meme number {i}",
+        "imgflip_url": f"https://i.imgflip.com/{i}.jpg",
+        "page_url": f"https://imgflip.com/i/{i}",
+        "template_id": i % 100,
+        "texts": [f"top text {i}", f"bottom text {i}"],
+    }
+
+
+def _build_archive(folder: str, size: int) -> MemeArchive:
+    archive = MemeArchive(folder, compact_every=size + 1)
+    for i in range(size):
+        archive.append(_fake_meme(i))
+    archive.compact()
+    return archive
+
+
+def _opened_database(folder: str) -> MemeDatabase:
+    database = MemeDatabase(os.path.join(folder, "memes.db"))
+    migrate_json_archive(database, folder)
+    len(database)
+    return database
+
+
+def _measure(load) -> int:
+    tracemalloc.start()
+    kept = load()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return current
+
+
+def bench_metadata_memory():
+    """
+    Compare memory held by one metadata copy per client against the shared meme database.
+    """
+    table = Table(title="Metadata memory vs archive size")
+    table.add_column("Memes", justify="right")
+    table.add_column(f"Per-client copies (x{CLIENTS_PER_BOT})", justify="right")
+    table.add_column("Shared database", justify="right")
+
+    for size in (1_000, 10_000, 50_000):
+        folder = tempfile.mkdtemp()
+        try:
+            archive = _build_archive(folder, size)
+            per_client = _measure(lambda: [archive.load() for _ in range(CLIENTS_PER_BOT)])
+            shared = _measure(lambda: _opened_database(folder))
+            table.add_row(f"{size:,}", f"{per_client / 1e6:.1f} MB", f"{shared / 1e6:.1f} MB")
+        finally:
+            shutil.rmtree(folder)
+    console.print(table)
+
+
+_SYLLABLES = ["ba", "ko", "ri", "me", "tu", "shi", "dra", "ke", "lo", "pan", "cat", "dog", "zen", "mo", "vi"]
+
+
+def _fake_word(rng: random.Random) -> str:
+    return "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def _latency_row(index: TemplateIndex, queries: list) -> str:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    return f"{statistics.median(timings):.3f} / {p95:.3f} ms"
+
+
+def bench_template_search():
+    """
+    Measure local template search latency for exact, prefix and typo queries.
+    """
+    table = Table(title="Local template search latency (p50 / p95)")
+    table.add_column("Templates", justify="right")
+    table.add_column("Build", justify="right")
+    table.add_column("Exact", justify="right")
+    table.add_column("Prefix", justify="right")
+    table.add_column("Typo", justify="right")
+
+    rng = random.Random(42)
+    vocabulary = list({_fake_word(rng) for _ in range(20_000)})
+    for size in (100, 10_000, 100_000):
+        templates = [
+            {"id": str(i), "name": " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4))), "box_count": 2}
+            for i in range(size)
+        ]
+        start = time.perf_counter()
+        index = TemplateIndex()
+        index.add_many(templates)
+        build = time.perf_counter() - start
+
+        words = [rng.choice(templates)["name"].split()[0] for _ in range(200)]
+        exact = words
+        prefix = [word[:3] for word in words]
+        typo = [word[:2] + word[3:] if len(word) > 4 else word + "x" for word in words]
+        table.add_row(
+            f"{size:,}", f"{build:.2f} s",
+            _latency_row(index, exact), _latency_row(index, prefix), _latency_row(index, typo),
+        )
+    console.print(table)
+
+
+class FakeMessage:
+    """
+    Stand-in for a Twilio conversation message.
+    """
+
+    def __init__(self, index: int, author: str, body: str):
+        self.index = index
+        self.sid = f"IM{index:032d}"
+        self.author = author
+        self.body = body
+
+
+class FakeMessageList:
+    """
+    Stand-in for a conversation's message list that counts the records it transfers.
+    """
+
+    def __init__(self, messages: list):
+        self.messages = messages
+        self.pages = 0
+        self.records = 0
+
+    def list(self):
+        self.pages += max(1, -(-len(self.messages) // 50))
+        self.records += len(self.messages)
+        return list(self.messages)
+
+    def stream(self, order: str = "asc", limit: int = None, page_size: int = 50):
+        total = len(self.messages) if limit is None else min(limit, len(self.messages))
+        page_size = min(page_size or 50, total or 1)
+        for start in range(0, total, page_size):
+            positions = range(start, min(start + page_size, total))
+            if order == "desc":
+                page = [self.messages[-1 - position] for position in positions]
+            else:
+                page = [self.messages[position] for position in positions]
+            self.pages += 1
+            self.records += len(page)
+            yield from page
+
+
+class FakeConversation:
+    def __init__(self, size: int, author: str):
+        self.sid = "CHbenchmark"
+        self.messages = FakeMessageList([
+            FakeMessage(i, author if i % 2 else "system", f"message {i}") for i in range(size)
+        ])
+
+
+class FakeConversations:
+    """
+    Stand-in for a conversation service's conversation list.
+    """
+
+    def __init__(self, conversations: list):
+        self.by_sid = {conversation.sid: conversation for conversation in conversations}
+
+    def __call__(self, sid: str) -> FakeConversation:
+        return self.by_sid[sid]
+
+
+class FakeService:
+    def __init__(self, conversations: list):
+        self.conversations = FakeConversations(conversations)
+
+
+def _fake_twilio(conversation: FakeConversation, address: str) -> Twilio:
+    twilio = Twilio.__new__(Twilio)
+    twilio.service = FakeService([conversation])
+    twilio.service_sid = "ISbenchmark"
+    twilio.ms_address = "whatsapp:+15559999999"
+    twilio.registry = ConversationRegistry()
+    twilio.default_address = address
+    twilio.webhook = None
+    twilio.inbox = Inbox()
+    twilio.status_callback_url = None
+    twilio.delivery = DeliveryTracker(poll=twilio._poll_delivery_statuses)
+    twilio.outbound = OutboundScheduler()
+    twilio.open_session(address, conversation.sid)
+    return twilio
+
+
+def bench_message_polling():
+    """
+    Compare listing the whole conversation per poll with the incremental cursor fetch.
+    """
+    address = "whatsapp:+15550000000"
+    polls = 100
+    table = Table(title=f"Per-poll cost over {polls} idle polls")
+    table.add_column("Messages", justify="right")
+    table.add_column("Full list\nrecords", justify="right")
+    table.add_column("Full list\npages", justify="right")
+    table.add_column("Full list\ntime", justify="right")
+    table.add_column("Cursor\nrecords", justify="right")
+    table.add_column("Cursor\npages", justify="right")
+    table.add_column("Cursor\ntime", justify="right")
+
+    for size in (100, 1_000, 10_000):
+        conversation = FakeConversation(size, address)
+        messages = conversation.messages
+        messages.records = messages.pages = 0
+        start = time.perf_counter()
+        for _ in range(polls):
+            listed = messages.list()
+            listed and listed[-1].author == address
+        full = (messages.records / polls, messages.pages / polls, (time.perf_counter() - start) / polls)
+
+        twilio = _fake_twilio(conversation, address)
+        messages.records = messages.pages = 0
+        start = time.perf_counter()
+        for _ in range(polls):
+            twilio.fetch_new_messages()
+        cursor = (messages.records / polls, messages.pages / polls, (time.perf_counter() - start) / polls)
+
+        cells = [f"{size:,}"]
+        for records, pages, elapsed in (full, cursor):
+            cells += [f"{records:,.0f}", f"{pages:,.0f}", f"{elapsed * 1e6:.0f} µs"]
+        table.add_row(*cells)
+    console.print(table)
+
+
+class FakeSentMessage:
+    """
+    Stand-in for a created outbound message that is sent at `sent_at` and delivered at `delivered_at`.
+    """
+
+    def __init__(self, sid: str, sent_at: float, delivered_at: float, conversation_sid: str = None,
+                 params: dict = None):
+        self.sid = sid
+        self.sent_at = sent_at
+        self.delivered_at = delivered_at
+        self.conversation_sid = conversation_sid
+        self.params = params or {}
+
+    @property
+    def status(self) -> str:
+        now = asyncio.get_running_loop().time()
+        if now >= self.delivered_at:
+            return "delivered"
+        return "sent" if now >= self.sent_at else "queued"
+
+    @property
+    def delivery(self) -> dict:
+        return {"total": 1, self.status: "all"}
+
+
+class FakeAsyncMessages:
+    """
+    Stand-in for Twilio's async message lists, recording when each message reaches WhatsApp.
+
+    Every API call takes `api_latency` seconds. A message is sent to WhatsApp
+    `text_delay` seconds after it is created, or `media_delay` seconds if it
+    has media Twilio has to fetch first, and delivered `delivery_delay`
+    seconds later. With a `tracker`, statuses are also pushed to it the way
+    status callbacks would.
+    """
+
+    def __init__(self, api_latency: float = 0.1, text_delay: float = 0.1, media_delay: float = 0.8,
+                 delivery_delay: float = 0.1, tracker: DeliveryTracker = None):
+        self.api_latency = api_latency
+        self.text_delay = text_delay
+        self.media_delay = media_delay
+        self.delivery_delay = delivery_delay
+        self.tracker = tracker
+        self.created = []
+        self.listings = 0
+
+    async def create_async(self, **params) -> FakeSentMessage:
+        await asyncio.sleep(self.api_latency)
+        loop = asyncio.get_running_loop()
+        sent_at = loop.time() + (self.media_delay if "media_url" in params else self.text_delay)
+        message = FakeSentMessage(
+            f"SM{len(self.created):032d}", sent_at, sent_at + self.delivery_delay,
+            conversation_sid=None if "media_url" in params else "CHbenchmark", params=params,
+        )
+        self.created.append(message)
+        if self.tracker is not None:
+            loop.call_at(sent_at, self.tracker.update, message.sid, "sent")
+            loop.call_at(message.delivered_at, self.tracker.update, message.sid, "delivered")
+        return message
+
+    async def list_async(self, **params) -> list:
+        await asyncio.sleep(self.api_latency)
+        self.listings += 1
+        return list(self.created)
+
+
+class FakeAsyncClient:
+    """
+    Stand-in for a Twilio client using the async HTTP client.
+    """
+
+    def __init__(self, messages: FakeAsyncMessages):
+        self.messages = messages
+        conversation = SimpleNamespace(messages=messages)
+        service = SimpleNamespace(conversations=lambda sid: conversation)
+        self.conversations = SimpleNamespace(v1=SimpleNamespace(services=lambda sid: service))
+
+
+async def _send_listing_with_sleeps(twilio: Twilio, memes: list):
+    """
+    The former way of sending a listing: one template at a time with a fixed pause.
+    """
+    for meme in memes:
+        await twilio.send_media_message_async(meme["name"], url_for_media=meme["url"])
+        await asyncio.sleep(3)
+        await twilio.send_quick_reply_message_async(meme["id"])
+    await twilio.send_message_async("done")
+
+
+async def _send_listing_unordered(twilio: Twilio, memes: list):
+    """
+    Every message at once, with nothing keeping them in order.
+    """
+    sends = []
+    for meme in memes:
+        sends.append(twilio.send_media_message_async(meme["name"], url_for_media=meme["url"]))
+        sends.append(twilio.send_quick_reply_message_async(meme["id"]))
+    sends.append(twilio.send_message_async("done"))
+    await asyncio.gather(*sends)
+
+
+async def _send_listing_pipelined(twilio: Twilio, memes: list):
+    pipeline = DeliveryPipeline(twilio)
+    for meme in memes:
+        pipeline.send_media_message(meme["name"], url_for_media=meme["url"])
+        pipeline.send_quick_reply_message(meme["id"])
+    pipeline.send_message("done")
+    await pipeline.drain()
+
+
+def bench_template_fanout():
+    """
+    Measure how long a 10-template listing takes to reach the user, and whether it arrives in order.
+    """
+    address = "whatsapp:+15550000000"
+    memes = [{"id": str(i), "name": f"Template {i}", "url": f"https://i.imgflip.com/{i}.jpg"} for i in range(10)]
+    table = Table(title=f"Sending {len(memes)} templates with quick replies")
+    table.add_column("Strategy")
+    table.add_column("Last message\narrives", justify="right")
+    table.add_column("Out of order", justify="right")
+
+    table.add_column("Status\npolls", justify="right")
+
+    for name, send, callbacks in (
+        ("sleep(3) per template", _send_listing_with_sleeps, False),
+        ("all at once", _send_listing_unordered, False),
+        ("pipeline, polled status", _send_listing_pipelined, False),
+        ("pipeline, status callbacks", _send_listing_pipelined, True),
+    ):
+        async def run():
+            twilio = _fake_twilio(FakeConversation(0, address), address)
+            messages = FakeAsyncMessages(tracker=twilio.delivery if callbacks else None)
+            if callbacks:
+                twilio.delivery.poll_interval = 5.0
+            twilio._async_clients = {asyncio.get_running_loop(): FakeAsyncClient(messages)}
+            start = asyncio.get_running_loop().time()
+            await send(twilio, memes)
+            # Arrival order is what the user sees: images in order, each quick reply
+            # after its image, and the closing message last
+            images, quick_replies, closing = [], [], []
+            for message in messages.created:
+                if "media_url" in message.params:
+                    images.append(message.sent_at)
+                elif "content_sid" in message.params:
+                    quick_replies.append(message.sent_at)
+                else:
+                    closing.append(message.sent_at)
+            last = max(images + quick_replies)
+            inversions = (
+                sum(1 for before, after in zip(images, images[1:]) if after < before)
+                + sum(1 for image, reply in zip(images, quick_replies) if reply < image)
+                + sum(1 for arrival in closing if arrival < last)
+            )
+            return max(closing + [last]) - start, inversions, messages.listings
+
+        with console.status(f"Sending with {name}..."):
+            elapsed, inversions, polls = asyncio.run(run())
+        table.add_row(name, f"{elapsed:.1f} s", str(inversions), str(polls))
+    console.print(table)
+
+
+class FakeThrottledError(Exception):
+    """
+    Stand-in for Twilio rejecting a request with HTTP 429.
+    """
+
+    status = 429
+
+
+class FakeRateLimitedMessages(FakeAsyncMessages):
+    """
+    Fake message list rejecting creates beyond `limit` messages per second.
+    """
+
+    def __init__(self, limit: int, **kwargs):
+        super().__init__(**kwargs)
+        self.limit = limit
+        self.window = deque()
+        self.rejected = 0
+
+    async def create_async(self, **params) -> FakeSentMessage:
+        now = asyncio.get_running_loop().time()
+        while self.window and self.window[0] <= now - 1:
+            self.window.popleft()
+        if len(self.window) >= self.limit:
+            self.rejected += 1
+            await asyncio.sleep(self.api_latency)
+            raise FakeThrottledError()
+        self.window.append(now)
+        message = await super().create_async(**params)
+        message.body = params.get("body")
+        return message
+
+
+def bench_outbound_burst():
+    """
+    Send a burst of messages for several users at once, directly and through the outbound scheduler.
+    """
+    users, per_user, limit = 5, 20, 20
+    table = Table(title=f"{users} users x {per_user} messages against a {limit} msg/s sender limit")
+    table.add_column("Strategy")
+    table.add_column("Rejected\n(429)", justify="right")
+    table.add_column("Lost", justify="right")
+    table.add_column("Out of order", justify="right")
+    table.add_column("Finished", justify="right")
+    table.add_column("p95 latency", justify="right")
+
+    for name, scheduled in (("direct", False), ("outbound scheduler", True)):
+        async def run():
+            loop = asyncio.get_running_loop()
+            messages = FakeRateLimitedMessages(limit, api_latency=0.05)
+            scheduler = OutboundScheduler(sender_rate=limit, sender_burst=1, recipient_rate=limit, recipient_burst=1)
+            latencies = []
+
+            async def send_all(user):
+                for i in range(per_user):
+                    start = loop.time()
+                    send = lambda: messages.create_async(to=user, body=f"{user} {i}")
+                    try:
+                        await (scheduler.submit(user, send) if scheduled else send())
+                    except FakeThrottledError:
+                        continue
+                    latencies.append(loop.time() - start)
+
+            start = loop.time()
+            await asyncio.gather(*(send_all(f"user {user}") for user in range(users)))
+            elapsed = loop.time() - start
+            inversions = 0
+            for user in range(users):
+                sequence = [int(message.body.split()[-1]) for message in messages.created
+                            if message.body.startswith(f"user {user} ")]
+                inversions += sum(1 for before, after in zip(sequence, sequence[1:]) if after < before)
+            lost = users * per_user - len(messages.created)
+            p95 = sorted(latencies)[int(len(latencies) * 0.95)] if latencies else 0.0
+            return messages.rejected, lost, inversions, elapsed, p95
+
+        rejected, lost, inversions, elapsed, p95 = asyncio.run(run())
+        table.add_row(name, str(rejected), str(lost), str(inversions), f"{elapsed:.1f} s", f"{p95:.2f} s")
+    console.print(table)
+
+
+def bench_idle_user_memory():
+    """
+    Measure the memory each registered but idle user costs the bot.
+    """
+    table = Table(title="Memory per idle user")
+    table.add_column("Users", justify="right")
+    table.add_column("Total", justify="right")
+    table.add_column("Per user", justify="right")
+
+    for users in (1_000, 10_000, 100_000):
+        def register():
+            registry = ConversationRegistry()
+            for i in range(users):
+                registry.add(f"whatsapp:+1555{i:07d}", f"CH{i:032x}", i)
+            return registry
+
+        total = _measure(register)
+        table.add_row(f"{users:,}", f"{total / 1e6:.1f} MB", f"{total / users:.0f} B")
+    console.print(table)
+
+
+def bench_surprise_prompts():
+    """
+    Compare reading and flattening the prompt file per surprise command with sampling the prompt pool.
+    """
+    picks = 200
+    table = Table(title=f"Cost per surprise prompt over {picks} picks")
+    table.add_column("Prompts", justify="right")
+    table.add_column("Read per pick", justify="right")
+    table.add_column("Prompt pool", justify="right")
+    table.add_column("Pool (no repeats\nfor the user)", justify="right")
+
+    folder = tempfile.mkdtemp(prefix="prompt_bench_")
+    try:
+        for size in (100, 10_000, 50_000):
+            path = os.path.join(folder, f"prompts_{size}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({f"category_{c}": [f"Prompt {c} {i}" for i in range(100)] for c in range(size // 100)}, f)
+
+            start = time.perf_counter()
+            for _ in range(picks):
+                with open(path, "r") as handle:
+                    prompts = json.load(handle)
+                random.choice(list(itertools.chain.from_iterable(prompts.values())))
+            per_read = (time.perf_counter() - start) / picks
+
+            pool = PromptPool(path)
+            start = time.perf_counter()
+            for _ in range(picks):
+                pool.sample()
+            per_sample = (time.perf_counter() - start) / picks
+            start = time.perf_counter()
+            for _ in range(picks):
+                pool.sample(user="whatsapp:+15550000000")
+            per_user_sample = (time.perf_counter() - start) / picks
+
+            table.add_row(
+                f"{size:,}", f"{per_read * 1e3:.2f} ms", f"{per_sample * 1e6:.1f} µs", f"{per_user_sample * 1e6:.1f} µs"
+            )
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    console.print(table)
+
+
+def bench_surprise_pool():
+    """
+    Measure how long surprise commands wait for their meme with and without the warm pool.
+    """
+    latency, commands = 1.0, 20
+    table = Table(title=f"{commands} surprise commands against a {latency}s meme generation")
+    table.add_column("Strategy")
+    table.add_column("Arrivals", justify="right")
+    table.add_column("Hit rate", justify="right")
+    table.add_column("Avg wait", justify="right")
+    table.add_column("p95 wait", justify="right")
+    table.add_column("Refill p95", justify="right")
+
+    async def generate(prompt):
+        await asyncio.sleep(latency)
+        return {"success": True, "data": {"url": f"https://i.imgflip.com/{hash(prompt) & 0xffff:x}.jpg"}}
+
+    for name, size in (("generate per command", 0), ("warm pool of 5", 5)):
+        for gap in (0.5, 0.1):
+            async def run():
+                loop = asyncio.get_running_loop()
+                pool = SurpriseMemePool(PromptPool("iconic_meme_prompts.json"), generate, size=size)
+                pool.start()
+                # Let the pool fill as it would while the bot is idle
+                await asyncio.sleep(latency * 3 if size else 0)
+                waits = []
+
+                async def command():
+                    start = loop.time()
+                    if pool.take() is None:
+                        await generate("prompt")
+                    waits.append(loop.time() - start)
+
+                tasks = []
+                for _ in range(commands):
+                    tasks.append(loop.create_task(command()))
+                    await asyncio.sleep(gap)
+                await asyncio.gather(*tasks)
+                await pool.close()
+                return pool.stats(), sorted(waits)
+
+            stats, waits = asyncio.run(run())
+            table.add_row(
+                name, f"every {gap}s", f"{stats['hit_rate']:.0%}", f"{statistics.mean(waits):.2f} s",
+                f"{waits[int(len(waits) * 0.95)]:.2f} s", f"{stats['p95_refill_latency']:.2f} s"
+            )
+    console.print(table)
+
+
+def bench_trending_prompt():
+    """
+    Send bursts of identical and near-identical captions with and without request coalescing.
+
+    Image captions are deterministic, so they may also be cached; automemes are only coalesced.
+    """
+    latency, users, bursts = 0.5, 50, 3
+    prompts = ["When the code works", "When the code works ", "  When the   code works "]
+    table = Table(title=f"{bursts} bursts of {users} users sending a trending caption ({latency}s upstream)")
+    table.add_column("Strategy")
+    table.add_column("Upstream calls", justify="right")
+    table.add_column("Coalesced", justify="right")
+    table.add_column("Cache hit rate", justify="right")
+    table.add_column("Avg wait", justify="right")
+
+    for name, coalescer in (("one call per user", None),
+                            ("singleflight", RequestCoalescer(cache_size=0)),
+                            ("singleflight + cache", RequestCoalescer(cache_size=100))):
+        async def run():
+            loop = asyncio.get_running_loop()
+            upstream = 0
+            waits = []
+
+            async def send():
+                nonlocal upstream
+                upstream += 1
+                await asyncio.sleep(latency)
+                return {"success": True, "data": {"url": "https://i.imgflip.com/abc.jpg"}}
+
+            async def user(i):
+                start = loop.time()
+                if coalescer is None:
+                    await send()
+                else:
+                    await coalescer.call_async("caption_image", normalize_prompt(prompts[i % len(prompts)]), send, cache=True)
+                waits.append(loop.time() - start)
+
+            for _ in range(bursts):
+                await asyncio.gather(*(user(i) for i in range(users)))
+            return upstream, statistics.mean(waits)
+
+        upstream, wait = asyncio.run(run())
+        stats = coalescer.stats() if coalescer else {"coalesced": 0, "hit_rate": 0.0}
+        table.add_row(name, str(upstream), str(stats["coalesced"]), f"{stats['hit_rate']:.0%}", f"{wait:.2f} s")
+    console.print(table)
+
+
+def bench_gallery_load():
+    """
+    Compare parsing and sorting the archive per website request with the mtime-invalidated content cache.
+    """
+    requests_per_size = 20
+    table = Table(title=f"Archive load cost per website request ({requests_per_size} requests)")
+    table.add_column("Memes", justify="right")
+    table.add_column("Parse + sort\nper request", justify="right")
+    table.add_column("Cached", justify="right")
+    table.add_column("Reload after\na new meme", justify="right")
+
+    def load_sorted(folder):
+        memes = read_memes(folder)
+        memes.sort(key=lambda x: x["timestamp"], reverse=True)
+        return memes
+
+    for size in (1_000, 10_000, 100_000):
+        folder = tempfile.mkdtemp(prefix="gallery_bench_")
+        try:
+            archive = _build_archive(folder, size)
+            start = time.perf_counter()
+            for _ in range(requests_per_size):
+                load_sorted(folder)
+            uncached = (time.perf_counter() - start) / requests_per_size
+
+            cache = ContentCache()
+            paths = archive_paths(folder)
+            cache.get("memes", paths, lambda: load_sorted(folder))
+            start = time.perf_counter()
+            for _ in range(requests_per_size):
+                cache.get("memes", paths, lambda: load_sorted(folder))
+            cached = (time.perf_counter() - start) / requests_per_size
+
+            archive.append(_fake_meme(size))
+            start = time.perf_counter()
+            cache.get("memes", paths, lambda: load_sorted(folder))
+            reload = time.perf_counter() - start
+
+            table.add_row(f"{size:,}", f"{uncached * 1e3:.1f} ms", f"{cached * 1e6:.0f} µs", f"{reload * 1e3:.1f} ms")
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+    console.print(table)
+
+
+def bench_api_memes_page():
+    """
+    Compare returning the whole archive from /api/memes with cursor-paginated pages.
+    """
+    # The website is not a package; import its app the way Vercel runs it
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "website"))
+    from flask import json as flask_json
+    import app as web
+
+    requests_per_case = 20
+    folder = tempfile.mkdtemp(prefix="api_memes_bench_")
+    try:
+        _build_archive(folder, 100_000)
+        web.MEMES_FOLDER = folder
+        client = web.app.test_client()
+        timeline = web.load_timeline()
+        first_page = client.get("/api/memes").get_json()
+        deep_cursor = timeline.page(50_000)[1]
+
+        def full_list():
+            # What /api/memes used to return: every meme in one response
+            with web.app.app_context():
+                return flask_json.dumps(web.load_memes()).encode()
+
+        cases = [
+            ("Whole archive (before)", full_list),
+            ("First page", lambda: client.get("/api/memes").data),
+            ("Second page", lambda: client.get(f"/api/memes?cursor={first_page['next_cursor']}").data),
+            ("Page 50,000 memes deep", lambda: client.get(f"/api/memes?cursor={deep_cursor}").data),
+            ("First page, type=auto", lambda: client.get("/api/memes?type=auto").data),
+        ]
+        table = Table(title=f"/api/memes with 100,000 memes ({requests_per_case} requests each)")
+        table.add_column("Request")
+        table.add_column("Response size", justify="right")
+        table.add_column("Avg latency", justify="right")
+        for name, fetch in cases:
+            size = len(fetch())
+            start = time.perf_counter()
+            for _ in range(requests_per_case):
+                fetch()
+            latency = (time.perf_counter() - start) / requests_per_case
+            table.add_row(name, f"{size / 1024:,.1f} KiB", f"{latency * 1e3:.2f} ms")
+        console.print(table)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def bench_meme_database():
+    """
+    Compare saving a meme and reading a gallery page with the JSON archive and the SQLite database.
+    """
+    operations = 200
+    table = Table(title=f"Meme archive operations (average of {operations})")
+    table.add_column("Memes", justify="right")
+    table.add_column("Migration", justify="right")
+    table.add_column("Save\nJSON log", justify="right")
+    table.add_column("Save\nSQLite", justify="right")
+    table.add_column("Page after a save\nJSON (reparse)", justify="right")
+    table.add_column("Page after a save\nSQLite", justify="right")
+    table.add_column("Page by type,\nhalfway, SQLite", justify="right")
+
+    for size in (1_000, 10_000, 100_000):
+        folder = tempfile.mkdtemp(prefix="meme_db_bench_")
+        try:
+            archive = _build_archive(folder, size)
+            database = MemeDatabase(os.path.join(folder, "memes.db"))
+            start = time.perf_counter()
+            migrate_json_archive(database, folder)
+            migration = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for i in range(operations):
+                archive.append(_fake_meme(size + i))
+            json_save = (time.perf_counter() - start) / operations
+            start = time.perf_counter()
+            for i in range(operations):
+                database.add(_fake_meme(size + i))
+            sqlite_save = (time.perf_counter() - start) / operations
+
+            # Every save invalidates what the website holds, so the JSON archive is parsed again
+            reads = 3 if size >= 100_000 else 10
+            start = time.perf_counter()
+            for _ in range(reads):
+                MemeTimeline(read_memes(folder)).page(24)
+            json_page = (time.perf_counter() - start) / reads
+            start = time.perf_counter()
+            for _ in range(operations):
+                database.page(24)
+            sqlite_page = (time.perf_counter() - start) / operations
+
+            cursor = database.page(size // 2)[1]
+            start = time.perf_counter()
+            for _ in range(operations):
+                database.page(24, cursor=cursor, meme_type="auto")
+            sqlite_deep = (time.perf_counter() - start) / operations
+            database.close()
+
+            table.add_row(f"{size:,}", f"{migration * 1e3:.0f} ms", f"{json_save * 1e6:.0f} µs",
+                          f"{sqlite_save * 1e6:.0f} µs", f"{json_page * 1e3:.1f} ms",
+                          f"{sqlite_page * 1e6:.0f} µs", f"{sqlite_deep * 1e6:.0f} µs")
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+    console.print(table)
+
+
+def bench_conditional_responses():
+    """
+    Compare bandwidth and response time of the gallery and /api/memes before and after ETags and compression.
+    """
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "website"))
+    import app as web
+    from response_cache import ResponseCache
+
+    requests_per_case = 50
+    folder = tempfile.mkdtemp(prefix="conditional_bench_")
+    try:
+        _build_archive(folder, 100_000)
+        web.MEMES_FOLDER = folder
+        client = web.app.test_client()
+        client.get("/api/memes")
+
+        def timed(path, headers, fresh_cache=False):
+            sizes = []
+            start = time.perf_counter()
+            for _ in range(requests_per_case):
+                if fresh_cache:
+                    # First request of a new archive version: render and compress again
+                    web.response_cache = ResponseCache()
+                sizes.append(len(client.get(path, headers=headers).data))
+            return statistics.mean(sizes), (time.perf_counter() - start) / requests_per_case
+
+        table = Table(title=f"Website responses with 100,000 memes ({requests_per_case} requests each)")
+        table.add_column("Path")
+        table.add_column("Request")
+        table.add_column("Bytes sent", justify="right")
+        table.add_column("Time to response", justify="right")
+        for path in ("/", "/api/memes"):
+            etag = client.get(path, headers={"Accept-Encoding": "br, gzip"}).headers["ETag"]
+            # Caching off and no compression behaves like the routes did before
+            web.response_cache = ResponseCache(max_entries=0)
+            cases = [("Before: render, uncompressed", timed(path, {}))]
+            web.response_cache = ResponseCache()
+            cases += [
+                ("New version, gzip", timed(path, {"Accept-Encoding": "gzip"}, fresh_cache=True)),
+                ("New version, brotli", timed(path, {"Accept-Encoding": "br"}, fresh_cache=True)),
+                ("Cached, gzip", timed(path, {"Accept-Encoding": "gzip"})),
+                ("Cached, brotli", timed(path, {"Accept-Encoding": "br"})),
+                ("Revalidated (304)", timed(path, {"Accept-Encoding": "br", "If-None-Match": etag})),
+            ]
+            for name, (size, latency) in cases:
+                table.add_row(path, name, f"{size:,.0f}", f"{latency * 1e3:.2f} ms")
+        console.print(table)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+BENCHMARKS = {
+    "metadata_memory": bench_metadata_memory,
+    "template_search": bench_template_search,
+    "message_polling": bench_message_polling,
+    "idle_user_memory": bench_idle_user_memory,
+    "template_fanout": bench_template_fanout,
+    "outbound_burst": bench_outbound_burst,
+    "surprise_prompts": bench_surprise_prompts,
+    "surprise_pool": bench_surprise_pool,
+    "trending_prompt": bench_trending_prompt,
+    "gallery_load": bench_gallery_load,
+    "api_memes_page": bench_api_memes_page,
+    "meme_database": bench_meme_database,
+    "conditional_responses": bench_conditional_responses,
+}
+
+
+def main():
+    """
+    Run the benchmarks named on the command line, or all of them.
+    """
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            console.print(f"Unknown benchmark: {name}. Available: {', '.join(BENCHMARKS)}", style="bold red")
+            continue
+        console.print(f"Running {name}...", style="bold yellow")
+        start = time.perf_counter()
+        BENCHMARKS[name]()
+        console.print(f"Finished {name} in {time.perf_counter() - start:.1f}s", style="bold green")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Module for caching data parsed from files until the files change.
+
+The website parses the meme archive and its content JSON on every request.
+A ContentCache keeps the parsed (and e.g. pre-sorted) result in memory and
+only reloads it when the mtime or size of one of its source files changes,
+which costs a few stat calls per request instead of a full parse.
+
+This module only uses the standard library so the website can import it too.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+Signature = Tuple[Optional[Tuple[int, int]], ...]
+
+
+def file_signature(paths: Iterable[str]) -> Signature:
+    """
+    Describe the current state of some files by their mtime and size.
+
+    Args:
+        paths (Iterable[str]): The files. Missing files are part of the signature too.
+
+    Returns:
+        Signature: One (mtime in ns, size) pair per file, or None for a missing file.
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class _Entry:
+    __slots__ = ("signature", "value", "reloads", "last_load_time", "total_load_time")
+
+    def __init__(self):
+        self.signature = None
+        self.value = None
+        self.reloads = 0
+        self.last_load_time = 0.0
+        self.total_load_time = 0.0
+
+
+class ContentCache:
+    """
+    Thread-safe cache of values loaded from files, invalidated by file mtime and size.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+
+    def get(self, name: str, paths: Iterable[str], load: Callable[[], Any]) -> Any:
+        """
+        Return the cached value, loading it first if it is missing or a source file changed.
+
+        The signature is taken before loading, so a file that changes while it is
+        being read is reloaded on the next call.
+
+        Args:
+            name (str): Name of the cached value.
+            paths (Iterable[str]): Files the value is loaded from.
+            load (Callable[[], Any]): Function loading the value from the files.
+
+        Returns:
+            Any: The cached value. Callers must not modify it.
+        """
+        paths = tuple(paths)
+        with self._lock:
+            entry = self._entries.setdefault(name, _Entry())
+            signature = file_signature(paths)
+            if entry.reloads and signature == entry.signature:
+                return entry.value
+
+            start = time.perf_counter()
+            value = load()
+            elapsed = time.perf_counter() - start
+            entry.signature = signature
+            entry.value = value
+            entry.reloads += 1
+            entry.last_load_time = elapsed
+            entry.total_load_time += elapsed
+        print(f"Loaded {name} in {elapsed * 1000:.1f} ms (load #{entry.reloads})")
+        return value
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Return how often each value was loaded and how long loading took.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Per value, the number of loads and the last and
+            average load time in seconds.
+        """
+        with self._lock:
+            return {
+                name: {
+                    "reloads": entry.reloads,
+                    "last_load_time": entry.last_load_time,
+                    "avg_load_time": entry.total_load_time / entry.reloads if entry.reloads else 0.0,
+                }
+                for name, entry in self._entries.items()
+            }
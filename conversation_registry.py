@@ -0,0 +1,84 @@
+"""
+Module for tracking the WhatsApp users a single bot process is serving.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class UserSession:
+    """
+    Per-user conversation state.
+
+    Kept deliberately small since one bot process may hold thousands of idle users.
+
+    Attributes:
+        address (str): The user's WhatsApp address, e.g. "whatsapp:+15551234567".
+        conversation_sid (str): SID of the Twilio conversation with the user.
+        last_message_index (int): Index of the newest message already seen when polling.
+        last_active (float): Time of the last message from or to the user.
+    """
+
+    __slots__ = ("address", "conversation_sid", "last_message_index", "last_active")
+
+    def __init__(self, address: str, conversation_sid: str, last_message_index: int = -1):
+        self.address = address
+        self.conversation_sid = conversation_sid
+        self.last_message_index = last_message_index
+        self.last_active = time.time()
+
+
+class ConversationRegistry:
+    """
+    Thread-safe map of participant addresses to their sessions.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, UserSession] = {}
+
+    def get(self, address: str) -> Optional[UserSession]:
+        """
+        Look up the session of an address.
+
+        Args:
+            address (str): The user's WhatsApp address.
+
+        Returns:
+            Optional[UserSession]: The session, or None if the user is unknown.
+        """
+        with self._lock:
+            return self._sessions.get(address)
+
+    def add(self, address: str, conversation_sid: str, last_message_index: int = -1) -> UserSession:
+        """
+        Register a user, keeping the existing session if there is one.
+
+        Args:
+            address (str): The user's WhatsApp address.
+            conversation_sid (str): SID of the conversation with the user.
+            last_message_index (int, optional): Newest message index already seen. Defaults to -1.
+
+        Returns:
+            UserSession: The user's session.
+        """
+        with self._lock:
+            session = self._sessions.get(address)
+            if session is None:
+                session = self._sessions[address] = UserSession(address, conversation_sid, last_message_index)
+            return session
+
+    def sessions(self) -> List[UserSession]:
+        """
+        Return a snapshot of all sessions.
+
+        Returns:
+            List[UserSession]: Every registered session.
+        """
+        with self._lock:
+            return list(self._sessions.values())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,188 @@
+"""
+Module for giving each WhatsApp command a latency budget.
+
+The deadline of the command being handled lives in a context variable, so
+the Imgflip and Twilio calls made on its behalf can cap their timeouts at
+the time left, and the command is cancelled once the budget is spent.
+Time spent waiting for the user to reply does not count.
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+_current_deadline = ContextVar("current_deadline", default=None)
+
+# Seconds request timeouts may run past the deadline
+DEADLINE_GRACE = 1.0
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """
+    Raised when a command runs out of time.
+
+    Attributes:
+        command (str): The command whose budget was exhausted.
+    """
+
+    def __init__(self, command: str, budget: float):
+        super().__init__(f"'{command}' did not finish within {budget:.0f}s")
+        self.command = command
+
+
+class Deadline:
+    """
+    Latency budget of a single command.
+
+    Used as an async context manager, it makes itself the current deadline
+    and cancels the block when the budget runs out, raising DeadlineExceeded.
+
+    Attributes:
+        command (str): The command the deadline belongs to.
+        budget (float): Seconds the command may take.
+        expires_at (float): Monotonic time at which the budget runs out.
+    """
+
+    def __init__(self, budget: float, command: str = ""):
+        self.command = command
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+        self._paused_at = None
+        self._timeout = None
+        self._token = None
+
+    def remaining(self) -> float:
+        """
+        Seconds left before the deadline, 0 once it passed.
+        """
+        now = self._paused_at if self._paused_at is not None else time.monotonic()
+        return max(self.expires_at - now, 0.0)
+
+    @property
+    def expired(self) -> bool:
+        """
+        Whether the budget is exhausted.
+        """
+        return self.remaining() <= 0
+
+    @contextmanager
+    def paused(self):
+        """
+        Stop the clock within the block, e.g. while waiting for the user to reply.
+        """
+        if self._paused_at is not None:
+            yield
+            return
+        self._paused_at = time.monotonic()
+        if self._timeout is not None and not self._timeout.expired():
+            self._timeout.reschedule(None)
+        try:
+            yield
+        finally:
+            self.expires_at += time.monotonic() - self._paused_at
+            self._paused_at = None
+            if self._timeout is not None and not self._timeout.expired():
+                self._timeout.reschedule(asyncio.get_running_loop().time() + self.remaining())
+
+    async def __aenter__(self) -> "Deadline":
+        self._token = _current_deadline.set(self)
+        self._timeout = asyncio.timeout(self.remaining())
+        await self._timeout.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        _current_deadline.reset(self._token)
+        try:
+            await self._timeout.__aexit__(exc_type, exc, tb)
+        except TimeoutError as e:
+            raise DeadlineExceeded(self.command, self.budget) from e
+        finally:
+            self._timeout = None
+        return False
+
+
+def current_deadline() -> Optional[Deadline]:
+    """
+    Return the deadline of the command being handled, if any.
+
+    Returns:
+        Optional[Deadline]: The current deadline.
+    """
+    return _current_deadline.get()
+
+
+def cap_timeout(timeout: float) -> float:
+    """
+    Shorten a timeout so it does not outlast the current deadline.
+
+    The capped timeout runs a little past the deadline, so an async command
+    is cancelled by its deadline rather than failing on the request timeout,
+    while blocking requests in worker threads still give up soon after.
+
+    Args:
+        timeout (float): The timeout the caller would use without a deadline.
+
+    Returns:
+        float: The shorter of `timeout` and the time left plus DEADLINE_GRACE.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return timeout
+    return min(timeout, deadline.remaining() + DEADLINE_GRACE)
+
+
+@contextmanager
+def deadline_paused():
+    """
+    Pause the current deadline, if any, within the block.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        yield
+    else:
+        with deadline.paused():
+            yield
+
+
+class DeadlineStats:
+    """
+    Per-command counts of handled commands and exceeded deadlines.
+    """
+
+    def __init__(self):
+        self._handled = defaultdict(int)
+        self._exceeded = defaultdict(int)
+
+    def record(self, command: str, exceeded: bool):
+        """
+        Count a finished command.
+
+        Args:
+            command (str): The command type.
+            exceeded (bool): Whether it ran out of time.
+        """
+        self._handled[command] += 1
+        if exceeded:
+            self._exceeded[command] += 1
+
+    def exceeded(self, command: str) -> int:
+        """
+        Number of times the given command ran out of time.
+        """
+        return self._exceeded[command]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Return the counts per command type.
+
+        Returns:
+            Dict[str, Dict[str, int]]: For every command, how often it was handled and how
+            often its deadline was exceeded.
+        """
+        return {
+            command: {"handled": handled, "exceeded": self._exceeded[command]}
+            for command, handled in sorted(self._handled.items())
+        }
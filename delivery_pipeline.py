@@ -0,0 +1,173 @@
+"""
+Module for sending a batch of WhatsApp messages in order without fixed sleeps.
+
+Media messages reach WhatsApp later than plain messages created after them,
+since Twilio has to fetch the media first. Instead of sleeping a few seconds
+after every media message, only the messages that have to appear after a
+media message wait for its delivery; media messages themselves are sent
+back to back, so Twilio fetches their media concurrently.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, List, Optional
+
+from rich.console import Console
+
+from message_status import DELIVERED_STATUSES, MessageHandle
+
+console = Console()
+
+_current_pipeline = ContextVar("current_pipeline", default=None)
+
+
+class DeliveryPipeline:
+    """
+    Ordered outbound queue for the current user.
+
+    Messages are queued without waiting and sent by chained tasks, so a
+    handler can queue a whole listing and only wait for it once. Each
+    message is created after the one queued before it was accepted by
+    Twilio, except that:
+
+    - a quick reply waits until the media message before it was delivered,
+      and does not hold up the messages queued after it;
+    - a text message waits until every earlier media message was delivered
+      and every earlier quick reply was sent.
+
+    So a listing's images are fetched concurrently, each quick reply shows
+    up after its image, and the closing message after the whole listing.
+
+    Create the pipeline within `Twilio.session_for()` so its tasks send to
+    the right user.
+    """
+
+    def __init__(self, twilio, delivery_timeout: float = 10.0):
+        """
+        Initialize an empty pipeline.
+
+        Args:
+            twilio (Twilio): The Twilio wrapper used to send the messages.
+            delivery_timeout (float, optional): Maximum seconds to wait for a media message
+                to be delivered before sending the next message anyway. Defaults to 10.0.
+        """
+        self.twilio = twilio
+        self.delivery_timeout = delivery_timeout
+        self._tasks: List[asyncio.Task] = []
+        # The last message the next one is chained to
+        self._tail: Optional[asyncio.Task] = None
+        # Media deliveries and quick replies the next text message has to wait for
+        self._deliveries: List[asyncio.Task] = []
+        self._quick_replies: List[asyncio.Task] = []
+
+    def _enqueue(self, send: Callable[[], Awaitable[MessageHandle]], after: List[asyncio.Task],
+                 chained: bool = True) -> asyncio.Task:
+        waits = after + [self._tail] if self._tail is not None else list(after)
+
+        async def step():
+            # A failed message must not hold up the ones after it
+            await asyncio.gather(*waits, return_exceptions=True)
+            return await send()
+
+        task = asyncio.get_running_loop().create_task(step())
+        self._tasks.append(task)
+        if chained:
+            self._tail = task
+        return task
+
+    def send_message(self, message: str) -> asyncio.Task:
+        """
+        Queue a text message.
+
+        Args:
+            message (str): The message to be sent.
+
+        Returns:
+            asyncio.Task: Task resolving to the message's handle.
+        """
+        after = self._deliveries + self._quick_replies
+        self._deliveries, self._quick_replies = [], []
+        return self._enqueue(lambda: self.twilio.send_message_async(message), after)
+
+    def send_media_message(self, message_body: str, url_for_media) -> asyncio.Task:
+        """
+        Queue a media message.
+
+        Args:
+            message_body (str): The text accompanying the media.
+            url_for_media (list or str): URL(s) of the media to send.
+
+        Returns:
+            asyncio.Task: Task resolving to the message's handle.
+        """
+        task = self._enqueue(
+            lambda: self.twilio.send_media_message_async(message_body, url_for_media=url_for_media), []
+        )
+
+        async def delivered():
+            handle = await task
+            return await handle.wait_for(DELIVERED_STATUSES, timeout=self.delivery_timeout)
+
+        self._deliveries.append(asyncio.get_running_loop().create_task(delivered()))
+        return task
+
+    def send_quick_reply_message(self, template_id) -> asyncio.Task:
+        """
+        Queue the quick reply message for a template, shown after the media message queued before it.
+
+        Args:
+            template_id (str): ID of the meme template.
+
+        Returns:
+            asyncio.Task: Task resolving to the message's handle.
+        """
+        task = self._enqueue(
+            lambda: self.twilio.send_quick_reply_message_async(template_id), self._deliveries[-1:], chained=False
+        )
+        self._quick_replies.append(task)
+        return task
+
+    async def drain(self) -> List[MessageHandle]:
+        """
+        Wait until every queued message has been sent and every media message delivered (or timed out).
+
+        Returns:
+            List[MessageHandle]: Handles of the sent messages, in queue order.
+
+        Raises:
+            Exception: The first error raised while sending, after all messages were attempted.
+        """
+        tasks, deliveries = self._tasks, self._deliveries
+        self._tasks, self._tail, self._deliveries, self._quick_replies = [], None, [], []
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # Failed media messages are already reported through their send task
+        await asyncio.gather(*deliveries, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            console.print(f"{len(errors)} of {len(results)} messages failed to send", style="bold red")
+            raise errors[0]
+        return results
+
+
+def current_pipeline() -> Optional[DeliveryPipeline]:
+    """
+    Return the pipeline of the command being handled, if any.
+
+    Returns:
+        Optional[DeliveryPipeline]: The current pipeline.
+    """
+    return _current_pipeline.get()
+
+
+@contextmanager
+def use_pipeline(pipeline: DeliveryPipeline):
+    """
+    Make `pipeline` the current pipeline within the block, so everything the
+    command queues for the user, including notices from other tasks, is sent in order.
+    """
+    token = _current_pipeline.set(pipeline)
+    try:
+        yield pipeline
+    finally:
+        _current_pipeline.reset(token)
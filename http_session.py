@@ -0,0 +1,248 @@
+"""
+Module providing a shared, connection-pooled HTTP session for the Imgflip clients.
+
+Every ImgflipAPI instance draws from the same keep-alive pool so repeated
+calls to api.imgflip.com reuse TCP/TLS connections instead of paying a fresh
+handshake per meme. Async callers get one shared aiohttp session per event loop.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from typing import Dict, Optional
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool, PoolManager
+
+
+class PoolStats:
+    """
+    Thread-safe counters describing how the connection pool is being used.
+
+    Attributes:
+        checkouts (int): Number of times a connection was taken from a pool.
+        new_connections (int): Number of connections that had to be opened.
+        waits (int): Number of checkouts that found the pool exhausted and had to wait.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.new_connections = 0
+        self.waits = 0
+
+    def record_checkout(self, waited: bool):
+        with self._lock:
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+
+    def record_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    @property
+    def hits(self) -> int:
+        """
+        Number of checkouts served by an already open (keep-alive) connection.
+        """
+        return max(self.checkouts - self.new_connections, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Return the current counters as a plain dictionary.
+
+        Returns:
+            Dict[str, int]: Counters for hits, new connections, waits and checkouts.
+        """
+        with self._lock:
+            return {
+                "hits": max(self.checkouts - self.new_connections, 0),
+                "new_connections": self.new_connections,
+                "waits": self.waits,
+                "checkouts": self.checkouts,
+            }
+
+
+def _counting_pool_class(base, stats: PoolStats):
+    """
+    Build a connection pool class that reports its activity to `stats`.
+    """
+
+    class CountingPool(base):
+        def _get_conn(self, timeout=None):
+            waited = self.block and self.pool is not None and self.pool.empty()
+            stats.record_checkout(waited)
+            return super()._get_conn(timeout)
+
+        def _new_conn(self):
+            stats.record_new_connection()
+            return super()._new_conn()
+
+    return CountingPool
+
+
+class _LimitedPoolManager(PoolManager):
+    """
+    PoolManager that applies a per-host pool size on top of the default one.
+    """
+
+    def __init__(self, host_limits: Dict[str, int], **kwargs):
+        self.host_limits = host_limits
+        super().__init__(**kwargs)
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        if host in self.host_limits:
+            request_context = dict(request_context or self.connection_pool_kw)
+            request_context["maxsize"] = self.host_limits[host]
+        return super()._new_pool(scheme, host, port, request_context)
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    HTTPAdapter with per-host pool limits and pool usage statistics.
+    """
+
+    def __init__(self, stats: PoolStats, host_limits: Optional[Dict[str, int]] = None, **kwargs):
+        self.stats = stats
+        self.host_limits = host_limits or {}
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _LimitedPoolManager(
+            self.host_limits,
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            **pool_kwargs,
+        )
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool_class(HTTPConnectionPool, self.stats),
+            "https": _counting_pool_class(HTTPSConnectionPool, self.stats),
+        }
+
+
+class PooledSession(requests.Session):
+    """
+    A requests.Session with a sized keep-alive pool and pool statistics.
+
+    Attributes:
+        stats (PoolStats): Counters for pool hits, new connections and waits.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = True,
+        host_limits: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Initialize the session and mount the pooled adapter for http and https.
+
+        Args:
+            pool_connections (int, optional): Number of per-host pools to keep. Defaults to 10.
+            pool_maxsize (int, optional): Connections kept open per host. Defaults to 10.
+            pool_block (bool, optional): Wait for a free connection instead of opening
+                a throwaway one when a host's pool is exhausted. Defaults to True.
+            host_limits (Dict[str, int], optional): Per-host overrides of `pool_maxsize`.
+        """
+        super().__init__()
+        self.stats = PoolStats()
+        adapter = PooledAdapter(
+            self.stats,
+            host_limits=host_limits,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.headers["Connection"] = "keep-alive"
+
+
+def _parse_host_limits(value: Optional[str]) -> Dict[str, int]:
+    """
+    Parse a "host=limit,host=limit" string into a dictionary.
+    """
+    limits = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            host, limit = item.split("=", 1)
+            limits[host.strip()] = int(limit)
+    return limits
+
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def get_shared_session() -> PooledSession:
+    """
+    Return the process-wide pooled session, creating it on first use.
+
+    Pool sizing can be configured with the IMGFLIP_POOL_CONNECTIONS,
+    IMGFLIP_POOL_MAXSIZE and IMGFLIP_POOL_HOST_LIMITS (e.g. "api.imgflip.com=20")
+    environment variables.
+
+    Returns:
+        PooledSession: The shared session.
+    """
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = PooledSession(
+                pool_connections=int(os.getenv("IMGFLIP_POOL_CONNECTIONS", "10")),
+                pool_maxsize=int(os.getenv("IMGFLIP_POOL_MAXSIZE", "10")),
+                host_limits=_parse_host_limits(os.getenv("IMGFLIP_POOL_HOST_LIMITS")),
+            )
+        return _shared_session
+
+
+def get_pool_stats() -> Dict[str, int]:
+    """
+    Return the statistics of the shared session's connection pool.
+
+    Returns:
+        Dict[str, int]: Counters for hits, new connections, waits and checkouts.
+    """
+    return get_shared_session().stats.snapshot()
+
+
+_async_sessions = weakref.WeakKeyDictionary()
+
+
+def get_shared_async_session() -> aiohttp.ClientSession:
+    """
+    Return the aiohttp session shared by all async Imgflip calls on the running event loop.
+
+    The connector uses the same IMGFLIP_POOL_MAXSIZE limit as the blocking session,
+    applied per host.
+
+    Returns:
+        aiohttp.ClientSession: The shared session for the current loop.
+    """
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit_per_host=int(os.getenv("IMGFLIP_POOL_MAXSIZE", "10")),
+            keepalive_timeout=30,
+        )
+        session = _async_sessions[loop] = aiohttp.ClientSession(connector=connector)
+    return session
+
+
+async def close_shared_async_session():
+    """
+    Close the shared aiohttp session of the running event loop, if any.
+    """
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
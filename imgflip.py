@@ -1,4 +1,5 @@
 import os
+import aiohttp
 import requests
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional
@@ -6,6 +7,14 @@ from datetime import datetime
 import json
 from dotenv import load_dotenv
 from rich.console import Console
+from deadline import cap_timeout
+from http_session import get_shared_async_session, get_shared_session
+from request_coalescer import RequestCoalescer, get_request_coalescer, normalize_prompt
+from request_guard import REQUEST_ERRORS, RequestGuard, get_request_guard
+from meme_db import MemeDatabase, get_meme_database
+from meme_store import MemeArchive, get_shared_archive
+from template_cache import CACHE_FOLDER, CatalogCache, get_template_cache
+from template_index import get_template_index
 
 console = Console()
 
@@ -17,10 +26,21 @@ class ImgflipAPI(ABC):
 
     This class handles the basic utilities like folder creation, metadata management,
     and performing API requests.
+
+    Requests time out after IMGFLIP_TIMEOUT seconds (default 20). Requests to
+    idempotent endpoints are retried and optionally hedged, and all requests
+    fail fast while the shared circuit breaker is open. Identical concurrent
+    requests share one upstream call, and results of deterministic endpoints
+    are cached by normalized prompt.
     """
     BASE_URL = "https://api.imgflip.com"
+    CONNECT_TIMEOUT = 5
+    # Endpoints that only read data and can safely be sent more than once
+    IDEMPOTENT_ENDPOINTS = frozenset({"get_meme", "get_memes", "search_memes"})
     
-    def __init__(self, username: str = None, password: str = None, base_folder: str = "website/memes"):
+    def __init__(self, username: str = None, password: str = None, base_folder: str = "website/memes",
+                 session: requests.Session = None, store: MemeDatabase = None, guard: RequestGuard = None,
+                 coalescer: RequestCoalescer = None, archive: MemeArchive = None):
         """
         Initialize the API client.
 
@@ -31,6 +51,16 @@ class ImgflipAPI(ABC):
             username (str, optional): Imgflip username. Defaults to os.getenv("IMGFLIP_USERNAME").
             password (str, optional): Imgflip password. Defaults to os.getenv("IMGFLIP_PASSWORD").
             base_folder (str, optional): Folder to store meme metadata. Defaults to "website/memes".
+            session (requests.Session, optional): HTTP session to send requests with.
+                Defaults to the shared connection-pooled session.
+            store (MemeDatabase, optional): Database to record memes in.
+                Defaults to the process-wide database in `base_folder`.
+            guard (RequestGuard, optional): Retry, hedging and circuit breaker policy.
+                Defaults to the process-wide guard.
+            coalescer (RequestCoalescer, optional): Shares results between identical requests.
+                Defaults to the process-wide coalescer.
+            archive (MemeArchive, optional): JSON archive memes are also appended to, for the
+                website to fall back on. Defaults to the process-wide archive in `base_folder`.
         
         Raises:
             ValueError: If credentials are not found.
@@ -41,11 +71,16 @@ class ImgflipAPI(ABC):
         if not self.username or not self.password:
             raise ValueError("Imgflip credentials not found. Please set IMGFLIP_USERNAME and IMGFLIP_PASSWORD in .env file")
         
+        self.session = session or get_shared_session()
+        self.guard = guard or get_request_guard()
+        self.coalescer = coalescer or get_request_coalescer()
+        self.timeout = float(os.getenv("IMGFLIP_TIMEOUT", "20"))
         self.base_folder = base_folder
         self._create_folder_structure()
         
-        self.metadata_file = os.path.join(self.base_folder, "meme_metadata.json")
-        self.metadata = self._load_metadata()
+        self.store = store or get_meme_database(self.base_folder)
+        self.archive = archive or get_shared_archive(self.base_folder)
+        self.metadata_file = self.store.path
     
     def _create_folder_structure(self):
         """
@@ -56,27 +91,13 @@ class ImgflipAPI(ABC):
         if not os.path.exists(self.base_folder):
             os.makedirs(self.base_folder)
     
-    def _load_metadata(self) -> Dict:
-        """
-        Load the metadata from the JSON file or create a new structure if the file doesn't exist.
-
-        Returns:
-            Dict: Metadata containing a list of memes.
-        """
-        if os.path.exists(self.metadata_file):
-            try:
-                with open(self.metadata_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                print(f"Warning: Could not read {self.metadata_file}. Creating new metadata file.")
-                return {"memes": []}
-        return {"memes": []}
-    
     def _save_metadata(self, meme_type: str, query: str, response_data: Dict[str, Any], local_path: str):
         """
-        Save meme metadata to a JSON file.
+        Save meme metadata to the archive.
 
-        This method updates the metadata JSON file with new meme information.
+        This method inserts the new meme information into the meme database
+        and appends it to the JSON archive the website falls back on, instead
+        of rewriting the whole archive.
 
         Args:
             meme_type (str): The type of meme (e.g., 'ai', 'auto', etc.).
@@ -97,12 +118,8 @@ class ImgflipAPI(ABC):
                 "texts": response_data["data"].get("texts", [])
             }
             
-            self.metadata["memes"].append(meme_info)
-            
-            os.makedirs(os.path.dirname(self.metadata_file), exist_ok=True)
-            
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.metadata, f, indent=2, ensure_ascii=False)
+            self.store.add(meme_info)
+            self.archive.append(meme_info)
             
             print(f"\nMetadata saved to: {self.metadata_file}")
             
@@ -124,20 +141,86 @@ class ImgflipAPI(ABC):
 
         Raises:
             HTTPError: If the API response indicates an error.
+            CircuitOpenError: If Imgflip has been failing and the circuit breaker is open.
         """
         url = f"{self.BASE_URL}/{endpoint}"
-        data.update({
-            "username": self.username,
-            "password": self.password
-        })
-        
-        response = requests.post(url, data=data)
-        response.raise_for_status()
+        data = self._with_credentials(data)
+        return self.guard.call(lambda: self._post(url, data), idempotent=endpoint in self.IDEMPOTENT_ENDPOINTS)
+    
+    def _post(self, url: str, data: Dict[str, Any], raise_for_status: bool = True) -> Dict[str, Any]:
+        """
+        POST form data with the shared session and decode the JSON response.
+
+        Args:
+            url (str): The URL to post to.
+            data (Dict[str, Any]): Payload data for the request.
+            raise_for_status (bool, optional): Raise on HTTP error statuses. Defaults to True.
+
+        Returns:
+            Dict[str, Any]: The JSON response.
+        """
+        timeout = (cap_timeout(self.CONNECT_TIMEOUT), cap_timeout(self.timeout))
+        response = self.session.post(url, data=data, timeout=timeout)
+        if raise_for_status:
+            response.raise_for_status()
         return response.json()
     
+    def _with_credentials(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the request payload with the account credentials added.
+
+        The caller's dictionary is left untouched, so it can be reused or
+        used in a cache key without carrying the credentials.
+
+        Args:
+            data (Dict[str, Any]): Payload data for the request.
+
+        Returns:
+            Dict[str, Any]: A copy of `data` with `username` and `password` set.
+        """
+        return {**data, "username": self.username, "password": self.password}
+    
+    async def _post_async(self, url: str, data: Dict[str, Any], raise_for_status: bool = True) -> Dict[str, Any]:
+        """
+        POST form data with the shared aiohttp session and decode the JSON response.
+
+        Booleans are sent the same way requests encodes them.
+
+        Args:
+            url (str): The URL to post to.
+            data (Dict[str, Any]): Payload data for the request.
+            raise_for_status (bool, optional): Raise on HTTP error statuses. Defaults to True.
+
+        Returns:
+            Dict[str, Any]: The JSON response.
+        """
+        form = {key: str(value) for key, value in data.items()}
+        timeout = aiohttp.ClientTimeout(total=cap_timeout(self.timeout), connect=self.CONNECT_TIMEOUT)
+        async with get_shared_async_session().post(url, data=form, timeout=timeout) as response:
+            if raise_for_status:
+                response.raise_for_status()
+            return await response.json(content_type=None)
+    
+    async def _make_request_async(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Async counterpart of `_make_request`, sharing one aiohttp session per event loop.
+
+        Args:
+            endpoint (str): API endpoint (e.g., "caption_image").
+            data (Dict[str, Any]): Payload data for the request.
+
+        Returns:
+            Dict[str, Any]: The JSON response from the API.
+        """
+        url = f"{self.BASE_URL}/{endpoint}"
+        data = self._with_credentials(data)
+        return await self.guard.call_async(
+            lambda: self._post_async(url, data), idempotent=endpoint in self.IDEMPOTENT_ENDPOINTS
+        )
+    
     def save_meme(self, response_data: Dict[str, Any], meme_type: str, query: str, prefix: str = "") -> str:
         """
-        Save the meme metadata to the JSON file.
+        Save the meme metadata to the meme database.
 
         Validates the API response and delegates saving metadata.
         
@@ -167,6 +250,21 @@ class AIMeme(ImgflipAPI):
     Extends the basic ImgflipAPI to include AI meme specific functionality.
     """
     
+    def _generate_data(self, prefix_text: str, model: str, template_id: Optional[int]) -> Dict[str, Any]:
+        data = {
+            "model": model,
+            "prefix_text": prefix_text,
+            "no_watermark": True
+        }
+        if template_id:
+            data["template_id"] = template_id
+        return data
+    
+    def _handle_generate(self, response: Dict[str, Any], prefix_text: str) -> Dict[str, Any]:
+        query = f"{prefix_text[:30]}"
+        url = self.save_meme(response, "ai", query, f"ai_meme_{prefix_text[:30]}")
+        return response
+    
     def generate(self, prefix_text: str, model: str = "openai", template_id: Optional[int] = None) -> Dict[str, Any]:
         """
         Generate an AI-powered meme.
@@ -179,18 +277,31 @@ class AIMeme(ImgflipAPI):
         Returns:
             Dict[str, Any]: API response data for the generated meme.
         """
-        data = {
+        data = self._generate_data(prefix_text, model, template_id)
+        response = self._make_request("ai_meme", data)
+        return self._handle_generate(response, prefix_text)
+    
+    async def generate_async(self, prefix_text: str, model: str = "openai", template_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Async counterpart of `generate`.
+        """
+        data = self._generate_data(prefix_text, model, template_id)
+        response = await self._make_request_async("ai_meme", data)
+        return self._handle_generate(response, prefix_text)
+    
+    def _send_ai_meme_data(self, prompt: str, model: str) -> Dict[str, Any]:
+        return {
+            "username": os.getenv("IMGFLIP_USERNAME"),
+            "password": os.getenv("IMGFLIP_PASSWORD"),
             "model": model,
-            "prefix_text": prefix_text,
-            "no_watermark": True
+            "prefix_text": prompt,
+            "no_watermark": ""
         }
-        if template_id:
-            data["template_id"] = template_id
-            
-        response = self._make_request("ai_meme", data)
-        query = f"{prefix_text[:30]}"
-        url = self.save_meme(response, "ai", query, f"ai_meme_{prefix_text[:30]}")
-        return response
+    
+    def _handle_send_ai_meme(self, response_data: Dict[str, Any], prompt: str) -> Dict[str, Any]:
+        if response_data["success"]:
+            self.save_meme(response_data, "ai", prompt)
+        return response_data
     
     def send_ai_meme_to_imgflip(self, prompt, model="openai"):
         """
@@ -204,20 +315,20 @@ class AIMeme(ImgflipAPI):
             Dict[str, Any]: API response data.
         """
         console.print(f"Sending AI meme prompt: {prompt}", style="bold blue")
-        response = requests.post(
-            os.getenv("IMGFLIP_AI_ENDPOINT"),
-            data={
-                "username": os.getenv("IMGFLIP_USERNAME"),
-                "password": os.getenv("IMGFLIP_PASSWORD"),
-                "model": model,
-                "prefix_text": prompt,
-                "no_watermark": ""
-            },
-        )
-        response_data = response.json()
-        if response_data["success"]:
-            self.save_meme(response_data, "ai", prompt)
-        return response_data
+        url = os.getenv("IMGFLIP_AI_ENDPOINT")
+        data = self._send_ai_meme_data(prompt, model)
+        response_data = self.guard.call(lambda: self._post(url, data, raise_for_status=False))
+        return self._handle_send_ai_meme(response_data, prompt)
+    
+    async def send_ai_meme_to_imgflip_async(self, prompt, model="openai"):
+        """
+        Async counterpart of `send_ai_meme_to_imgflip`.
+        """
+        console.print(f"Sending AI meme prompt: {prompt}", style="bold blue")
+        url = os.getenv("IMGFLIP_AI_ENDPOINT")
+        data = self._send_ai_meme_data(prompt, model)
+        response_data = await self.guard.call_async(lambda: self._post_async(url, data, raise_for_status=False))
+        return self._handle_send_ai_meme(response_data, prompt)
 
 class AutoMeme(ImgflipAPI):
     """
@@ -226,6 +337,11 @@ class AutoMeme(ImgflipAPI):
     Provides functionality to generate auto memes and interact with Imgflip's API.
     """
     
+    def _handle_generate(self, response: Dict[str, Any], text: str) -> Dict[str, Any]:
+        query = f"{text[:30]}"
+        url = self.save_meme(response, "auto", query, f"automeme_{text[:30]}")
+        return response
+    
     def generate(self, text: str) -> Dict[str, Any]:
         """
         Generate an automatic meme from provided text.
@@ -241,43 +357,92 @@ class AutoMeme(ImgflipAPI):
             "no_watermark": True
         }
         
-        response = self._make_request("automeme", data)
-        query = f"{text[:30]}"
-        url = self.save_meme(response, "auto", query, f"automeme_{text[:30]}")
-        return response
+        # Only concurrent identical requests share a result, and every caller saves the
+        # meme it is given. Automemes vary between calls, so they are never cached.
+        response = self.coalescer.call(
+            "automeme", ("generate", normalize_prompt(text)), lambda: self._make_request("automeme", data)
+        )
+        return self._handle_generate(response, text)
     
-    def send_caption_to_imgflip(self, caption):
+    async def generate_async(self, text: str) -> Dict[str, Any]:
+        """
+        Async counterpart of `generate`.
+        """
+        data = {
+            "text": text,
+            "no_watermark": True
+        }
+        
+        response = await self.coalescer.call_async(
+            "automeme", ("generate", normalize_prompt(text)), lambda: self._make_request_async("automeme", data)
+        )
+        return self._handle_generate(response, text)
+    
+    def _send_caption_data(self, caption: str) -> Dict[str, Any]:
+        return {
+            "username": os.getenv("IMGFLIP_USERNAME"),
+            "password": os.getenv("IMGFLIP_PASSWORD"),
+            "text": caption,
+            "no_watermark": True
+        }
+    
+    def _handle_send_caption(self, response_data: Dict[str, Any], caption: str, save: bool) -> Dict[str, Any]:
+        if response_data["success"] and save:
+            self.save_meme(response_data, "auto", caption)
+        return response_data
+    
+    def send_caption_to_imgflip(self, caption, save: bool = True):
         """
         Send a caption to Imgflip to generate a meme.
 
         Args:
             caption (str): Caption text to send for meme generation.
+            save (bool, optional): Save the meme's metadata. Pass False for memes that may
+                never be shown, and call `save_meme` once they are. Defaults to True.
 
         Returns:
             Dict[str, Any]: API response from Imgflip.
         """
-        console.print(f"Sending caption to imgflip: {caption}", style="bold blue")
-        response = requests.post(
-            os.getenv("IMGFLIP_AUTOMEME_ENDPOINT"),
-            data={
-                "username": os.getenv("IMGFLIP_USERNAME"),
-                "password": os.getenv("IMGFLIP_PASSWORD"),
-                "text": caption,
-                "no_watermark": True
-            },
-        )
-        response_data = response.json()
-        if response_data["success"]:
-            self.save_meme(response_data, "auto", caption)
-        return response_data
+        url = os.getenv("IMGFLIP_AUTOMEME_ENDPOINT")
+        data = self._send_caption_data(caption)
+        
+        def send():
+            console.print(f"Sending caption to imgflip: {caption}", style="bold blue")
+            return self.guard.call(lambda: self._post(url, data, raise_for_status=False))
+        
+        # Shared by concurrent identical requests only, see `generate`
+        response_data = self.coalescer.call("automeme", ("caption", normalize_prompt(caption)), send)
+        return self._handle_send_caption(response_data, caption, save)
+    
+    async def send_caption_to_imgflip_async(self, caption, save: bool = True):
+        """
+        Async counterpart of `send_caption_to_imgflip`.
+        """
+        url = os.getenv("IMGFLIP_AUTOMEME_ENDPOINT")
+        data = self._send_caption_data(caption)
+        
+        async def send():
+            console.print(f"Sending caption to imgflip: {caption}", style="bold blue")
+            return await self.guard.call_async(lambda: self._post_async(url, data, raise_for_status=False))
+        
+        response_data = await self.coalescer.call_async("automeme", ("caption", normalize_prompt(caption)), send)
+        return self._handle_send_caption(response_data, caption, save)
 
 class MemeSearch(ImgflipAPI):
     """
     Class for searching meme templates.
     
     Allows queries to search for specific meme templates.
+    Results from the API are added to the local template index so later
+    searches can be answered without a network call.
     """
     
+    def _handle_search(self, response: Dict[str, Any], query: str) -> Dict[str, Any]:
+        if response.get("success"):
+            get_template_cache().seed(response["data"]["memes"])
+            get_template_index().add_many(response["data"]["memes"], alias=query)
+        return response
+    
     def search(self, query: str, include_nsfw: bool = False) -> Dict[str, Any]:
         """
         Search for meme templates by query.
@@ -294,15 +459,110 @@ class MemeSearch(ImgflipAPI):
             "include_nsfw": 1 if include_nsfw else 0
         }
         
-        return self._make_request("search_memes", data)
+        def send():
+            return self._handle_search(self._make_request("search_memes", data), query)
+        
+        key = (normalize_prompt(query, casefold=True), include_nsfw)
+        return self.coalescer.call("search_memes", key, send, cache=True)
+    
+    async def search_async(self, query: str, include_nsfw: bool = False) -> Dict[str, Any]:
+        """
+        Async counterpart of `search`.
+        """
+        data = {
+            "query": query,
+            "include_nsfw": 1 if include_nsfw else 0
+        }
+        
+        async def send():
+            return self._handle_search(await self._make_request_async("search_memes", data), query)
+        
+        key = (normalize_prompt(query, casefold=True), include_nsfw)
+        return await self.coalescer.call_async("search_memes", key, send, cache=True)
+    
+    def _search_local(self, query: str, min_results: int, limit: int) -> Optional[Dict[str, Any]]:
+        results = get_template_index().search(query, limit=limit, match_all=True)
+        if len(results) >= min_results:
+            memes = [template for template, _ in results]
+            return {"success": True, "data": {"memes": memes}, "source": "local"}
+        return None
+    
+    def _search_fallback(self, query: str, limit: int, error: Exception) -> Dict[str, Any]:
+        """
+        Answer from the local index with whatever matches it has when the API is unavailable.
+
+        Raises:
+            Exception: `error`, if the local index has no matches either.
+        """
+        results = get_template_index().search(query, limit=limit)
+        if not results:
+            raise error
+        console.print(f"Imgflip search unavailable ({str(error)}), using local results", style="bold yellow")
+        memes = [template for template, _ in results]
+        return {"success": True, "data": {"memes": memes}, "source": "local"}
+    
+    def search_local_first(self, query: str, min_results: int = 3, limit: int = 10) -> Dict[str, Any]:
+        """
+        Search the local template index, falling back to the API when local recall is poor.
+
+        Only local results matched by every word of the query count towards
+        `min_results`. If the API is unavailable, any local matches are returned.
+
+        Args:
+            query (str): The search query.
+            min_results (int, optional): Good local results needed to skip the API. Defaults to 3.
+            limit (int, optional): Maximum number of local results. Defaults to 10.
+
+        Returns:
+            Dict[str, Any]: Response shaped like the search_memes API response, with
+            a `source` key set to "local" or "api".
+        """
+        local = self._search_local(query, min_results, limit)
+        if local is not None:
+            return local
+        
+        try:
+            response = self.search(query)
+        except REQUEST_ERRORS as e:
+            return self._search_fallback(query, limit, e)
+        response["source"] = "api"
+        return response
+    
+    async def search_local_first_async(self, query: str, min_results: int = 3, limit: int = 10) -> Dict[str, Any]:
+        """
+        Async counterpart of `search_local_first`.
+        """
+        local = self._search_local(query, min_results, limit)
+        if local is not None:
+            return local
+        
+        try:
+            response = await self.search_async(query)
+        except REQUEST_ERRORS as e:
+            return self._search_fallback(query, limit, e)
+        response["source"] = "api"
+        return response
 
 class GetMeme(ImgflipAPI):
     """
     Class for retrieving a specific meme template.
     
     Retrieves details of a meme template by its ID.
+    Templates already seen in the catalog or in search results are served from
+    the shared template detail cache.
     """
     
+    def _cached(self, template_id) -> Optional[Dict[str, Any]]:
+        template = get_template_cache().get(template_id)
+        if template is not None:
+            return {"success": True, "data": {"meme": template}}
+        return None
+    
+    def _handle_get(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        if response.get("success"):
+            get_template_cache().put(response["data"]["meme"])
+        return response
+    
     def get(self, template_id: int) -> Dict[str, Any]:
         """
         Get a specific meme template by template ID.
@@ -313,30 +573,122 @@ class GetMeme(ImgflipAPI):
         Returns:
             Dict[str, Any]: API response data containing the meme template.
         """
+        cached = self._cached(template_id)
+        if cached is not None:
+            return cached
+        
         data = {
             "template_id": template_id
         }
         
-        return self._make_request("get_meme", data)
+        response = self._make_request("get_meme", data)
+        return self._handle_get(response)
+    
+    async def get_async(self, template_id: int) -> Dict[str, Any]:
+        """
+        Async counterpart of `get`.
+        """
+        cached = self._cached(template_id)
+        if cached is not None:
+            return cached
+        
+        data = {
+            "template_id": template_id
+        }
+        
+        response = await self._make_request_async("get_meme", data)
+        return self._handle_get(response)
     
 class GetMemes(ImgflipAPI):
     """
     Class for retrieving all meme templates.
     
     Provides functionality to get a complete list of meme templates.
+    The catalog is cached with a TTL and refreshed in the background once stale.
     """
     
+    def __init__(self, *args, catalog_ttl: float = None, **kwargs):
+        """
+        Initialize the client and its template catalog cache.
+
+        Args:
+            catalog_ttl (float, optional): Seconds before the cached catalog goes stale.
+                Defaults to os.getenv("IMGFLIP_CATALOG_TTL", 3600).
+            *args, **kwargs: Passed on to ImgflipAPI.
+        """
+        super().__init__(*args, **kwargs)
+        if catalog_ttl is None:
+            catalog_ttl = float(os.getenv("IMGFLIP_CATALOG_TTL", "3600"))
+        self.catalog_cache = CatalogCache(
+            self.fetch_memes,
+            ttl=catalog_ttl,
+            path=os.path.join(CACHE_FOLDER, "imgflip_catalog.json"),
+        )
+        self._seeded_catalog = None
+    
+    def _seed(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        if response is not self._seeded_catalog and response.get("success"):
+            get_template_cache().seed(response["data"]["memes"])
+            get_template_index().add_many(response["data"]["memes"])
+            self._seeded_catalog = response
+        return response
+    
     def get_memes(self):
         """
-        Retrieve all meme templates available on Imgflip.
+        Retrieve all meme templates available on Imgflip, served from the catalog cache.
+
+        Templates from a newly fetched catalog are also added to the template detail
+        cache and the local template index.
+
+        Returns:
+            Dict[str, Any]: API response data with the list of memes.
+        """
+        return self._seed(self.catalog_cache.get())
+    
+    async def get_memes_async(self):
+        """
+        Async counterpart of `get_memes`.
+
+        Only downloads the catalog on the event loop when nothing is cached yet;
+        stale catalogs are refreshed in the background as usual.
+        """
+        if self.catalog_cache.has_catalog:
+            return self.get_memes()
+        response = await self.fetch_memes_async()
+        self.catalog_cache.store(response)
+        return self._seed(response)
+    
+    def fetch_memes(self):
+        """
+        Download all meme templates from Imgflip, bypassing the cache.
 
         Returns:
             Dict[str, Any]: API response data with the list of memes.
         """
         url = f"{self.BASE_URL}/get_memes"
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        
+        def send():
+            timeout = (cap_timeout(self.CONNECT_TIMEOUT), cap_timeout(self.timeout))
+            response = self.session.get(url, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        
+        # The catalog has its own cache; only share concurrent downloads
+        return self.coalescer.call("get_memes", None, lambda: self.guard.call(send, idempotent=True))
+    
+    async def fetch_memes_async(self):
+        """
+        Async counterpart of `fetch_memes`.
+        """
+        url = f"{self.BASE_URL}/get_memes"
+        
+        async def send():
+            timeout = aiohttp.ClientTimeout(total=cap_timeout(self.timeout), connect=self.CONNECT_TIMEOUT)
+            async with get_shared_async_session().get(url, timeout=timeout) as response:
+                response.raise_for_status()
+                return await response.json(content_type=None)
+        
+        return await self.coalescer.call_async("get_memes", None, lambda: self.guard.call_async(send, idempotent=True))
 
 class CaptionImage(ImgflipAPI):
     """
@@ -345,6 +697,15 @@ class CaptionImage(ImgflipAPI):
     Uses Imgflip's caption_image endpoint to generate memes with captions.
     """
     
+    def _caption_data(self, template_id: int, text0: str, text1: str, font: str) -> Dict[str, Any]:
+        return {
+            "template_id": template_id,
+            "text0": text0,
+            "text1": text1,
+            "font": font,
+            "no_watermark": True
+        }
+    
     def caption(self, template_id: int, text0: str, text1: str = "", font: str = "impact") -> Dict[str, Any]:
         """
         Caption a static image using a template.
@@ -358,16 +719,19 @@ class CaptionImage(ImgflipAPI):
         Returns:
             Dict[str, Any]: API response data with the captioned image.
         """
-        data = {
-            "template_id": template_id,
-            "text0": text0,
-            "text1": text1,
-            "font": font,
-            "no_watermark": True
-        }
-        
-        response = self._make_request("caption_image", data)
-        return response
+        data = self._caption_data(template_id, text0, text1, font)
+        key = (str(template_id), normalize_prompt(text0), normalize_prompt(text1), font)
+        return self.coalescer.call("caption_image", key, lambda: self._make_request("caption_image", data), cache=True)
+    
+    async def caption_async(self, template_id: int, text0: str, text1: str = "", font: str = "impact") -> Dict[str, Any]:
+        """
+        Async counterpart of `caption`.
+        """
+        data = self._caption_data(template_id, text0, text1, font)
+        key = (str(template_id), normalize_prompt(text0), normalize_prompt(text1), font)
+        return await self.coalescer.call_async(
+            "caption_image", key, lambda: self._make_request_async("caption_image", data), cache=True
+        )
 
 class CaptionGif(ImgflipAPI):
     """
@@ -376,6 +740,18 @@ class CaptionGif(ImgflipAPI):
     Uses Imgflip's caption_gif endpoint to embed text into GIFs.
     """
     
+    def _caption_data(self, template_id: int, boxes: list) -> Dict[str, Any]:
+        return {
+            "template_id": template_id,
+            "boxes": json.dumps(boxes),
+            "no_watermark": True
+        }
+    
+    def _handle_caption(self, response: Dict[str, Any], template_id: int, boxes: list) -> Dict[str, Any]:
+        query = " | ".join(box["text"] for box in boxes)
+        url = self.save_meme(response, "gif", query, f"gif_{template_id}")
+        return response
+    
     def caption(self, template_id: int, boxes: list) -> Dict[str, Any]:
         """
         Caption an animated GIF with multiple text boxes.
@@ -387,16 +763,17 @@ class CaptionGif(ImgflipAPI):
         Returns:
             Dict[str, Any]: API response data with the captioned GIF.
         """
-        data = {
-            "template_id": template_id,
-            "boxes": json.dumps(boxes),
-            "no_watermark": True
-        }
-        
+        data = self._caption_data(template_id, boxes)
         response = self._make_request("caption_gif", data)
-        query = " | ".join(box["text"] for box in boxes)
-        url = self.save_meme(response, "gif", query, f"gif_{template_id}")
-        return response
+        return self._handle_caption(response, template_id, boxes)
+    
+    async def caption_async(self, template_id: int, boxes: list) -> Dict[str, Any]:
+        """
+        Async counterpart of `caption`.
+        """
+        data = self._caption_data(template_id, boxes)
+        response = await self._make_request_async("caption_gif", data)
+        return self._handle_caption(response, template_id, boxes)
 
 def main():
     """
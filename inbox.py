@@ -0,0 +1,138 @@
+"""
+Module providing an ordered inbox for inbound user messages.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Optional
+
+
+class Inbox:
+    """
+    Thread-safe FIFO of inbound messages, de-duplicated by message SID.
+
+    Every message is kept in arrival order until the bot takes it, so a burst
+    of commands sent between two polls is processed one by one instead of
+    only the last one being seen.
+
+    Attributes:
+        received (int): Number of messages accepted.
+        duplicates (int): Number of messages dropped because their SID was already seen.
+        delivered (int): Number of messages handed to the bot.
+    """
+
+    def __init__(self, dedupe_window: int = 1000):
+        """
+        Initialize an empty inbox.
+
+        Args:
+            dedupe_window (int, optional): Number of recent message SIDs remembered
+                for de-duplication. Defaults to 1000.
+        """
+        self.dedupe_window = dedupe_window
+        self.received = 0
+        self.duplicates = 0
+        self.delivered = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._messages = deque()
+        self._seen_sids = OrderedDict()
+        self._not_empty = threading.Condition()
+
+    def put(self, message: Dict[str, Any]) -> bool:
+        """
+        Add a message unless a message with the same SID was already received.
+
+        Args:
+            message (Dict[str, Any]): The message, with at least `sid` and `body` keys.
+
+        Returns:
+            bool: True if the message was queued, False if it was a duplicate.
+        """
+        sid = message.get("sid")
+        with self._not_empty:
+            if sid is not None:
+                if sid in self._seen_sids:
+                    self.duplicates += 1
+                    return False
+                self._seen_sids[sid] = None
+                if len(self._seen_sids) > self.dedupe_window:
+                    self._seen_sids.popitem(last=False)
+            self._messages.append((time.monotonic(), message))
+            self.received += 1
+            self._not_empty.notify_all()
+            return True
+
+    def _find(self, match: Optional[Callable[[Dict[str, Any]], bool]]) -> Optional[int]:
+        for position, (_, message) in enumerate(self._messages):
+            if match is None or match(message):
+                return position
+        return None
+
+    def get(self, timeout: Optional[float] = None,
+            match: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Take the oldest message, waiting for one if the inbox is empty.
+
+        Args:
+            timeout (float, optional): Seconds to wait, or None to wait forever.
+            match (Callable, optional): Only take the oldest message this predicate
+                accepts, e.g. one from a particular user. Other messages stay queued.
+
+        Returns:
+            Optional[Dict[str, Any]]: The message, or None if the timeout expired.
+        """
+        with self._not_empty:
+            position = None
+
+            def found():
+                nonlocal position
+                position = self._find(match)
+                return position is not None
+
+            if not self._not_empty.wait_for(found, timeout):
+                return None
+            received_at, message = self._messages[position]
+            del self._messages[position]
+            waited = time.monotonic() - received_at
+            self.delivered += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            return message
+
+    def notify(self):
+        """
+        Wake up waiting consumers so their `match` predicates are checked again.
+
+        Needed when a predicate depends on state outside the inbox, such as
+        which users are currently busy.
+        """
+        with self._not_empty:
+            self._not_empty.notify_all()
+
+    @property
+    def depth(self) -> int:
+        """
+        Number of messages waiting to be processed.
+        """
+        with self._not_empty:
+            return len(self._messages)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return queue depth, counters and wait times.
+
+        Returns:
+            Dict[str, float]: Depth, received, duplicates and delivered counts, and the
+            average and maximum seconds a message waited in the inbox.
+        """
+        with self._not_empty:
+            return {
+                "depth": len(self._messages),
+                "received": self.received,
+                "duplicates": self.duplicates,
+                "delivered": self.delivered,
+                "avg_wait": self._total_wait / self.delivered if self.delivered else 0.0,
+                "max_wait": self._max_wait,
+            }
@@ -2,10 +2,17 @@
 from rich.console import Console
 from Twilio import Twilio
 from imgflip import AutoMeme, AIMeme, GetMeme, GetMemes, MemeSearch, CaptionImage
+from http_session import close_shared_async_session
+from delivery_pipeline import DeliveryPipeline, current_pipeline, use_pipeline
+from message_status import DELIVERED_STATUSES
+from request_guard import REQUEST_ERRORS, get_request_guard
+from deadline import Deadline, DeadlineExceeded, DeadlineStats, deadline_paused
+from prompt_pool import PromptPool
+from surprise_pool import SurpriseMemePool
+import asyncio
+import os
 import random
-import time
-import json
-import itertools
+import threading
 
 class MemeBot:
     """
@@ -20,7 +27,16 @@ class MemeBot:
         get_memes (GetMemes): Instance to get multiple meme templates.
         search_memes (MemeSearch): Instance to search meme templates.
         caption_image (CaptionImage): Instance to caption an image.
+        surprise_prompts (PromptPool): Prompts for the surprise command, reloaded when the file changes.
+        surprise_pool (SurpriseMemePool): Surprise memes generated ahead of time.
+        default_deadline (float): Seconds a command may take unless listed in COMMAND_DEADLINES.
+        reply_timeout (float): Seconds the caption flow waits for each caption before giving up.
+        deadline_stats (DeadlineStats): Per-command counts of exceeded deadlines.
     """
+    COMMANDS = ("help", "meme", "generate", "surprise", "search", "top", "random", "caption", "testing")
+    # AI generation regularly takes longer than the other commands
+    COMMAND_DEADLINES = {"generate": 60.0}
+
     def __init__(self):
         """
         Initialize the MemeBot with required components and instances.
@@ -36,8 +52,19 @@ class MemeBot:
         self.caption_image = CaptionImage()
         self.console.print("Meme Machine initialized.", style="bold green")
         self.surprise_meme_path = "iconic_meme_prompts.json"
+        self.surprise_prompts = PromptPool(self.surprise_meme_path)
+        self.surprise_pool = SurpriseMemePool(
+            self.surprise_prompts,
+            lambda prompt: self.automeme.send_caption_to_imgflip_async(caption=prompt, save=False),
+            size=int(os.getenv("MEME_BOT_SURPRISE_POOL", "5")),
+            max_age=float(os.getenv("MEME_BOT_SURPRISE_MAX_AGE", "3600")),
+        )
+        self.default_deadline = float(os.getenv("MEME_BOT_DEADLINE", "30"))
+        # A caption flow holds one of the concurrency slots while it waits for the user
+        self.reply_timeout = float(os.getenv("MEME_BOT_REPLY_TIMEOUT", "300"))
+        self.deadline_stats = DeadlineStats()
 
-    def process_message(self, message: str):
+    async def process_message(self, message: str):
         """
         Process an incoming message, determine the command, and handle it.
 
@@ -49,45 +76,70 @@ class MemeBot:
         prompt = message[len(user_message_instruction):].strip()
         
         if user_message_instruction == "help":
-            self.handle_help()
+            await self.handle_help()
         elif user_message_instruction in ("meme", "generate"):
-            self.handle_meme(user_message_instruction, prompt)
+            await self.handle_meme(user_message_instruction, prompt)
         elif user_message_instruction == "surprise":
-            self.handle_suprise()
+            await self.handle_suprise()
         elif user_message_instruction == "search":
-            self.handle_search(prompt)
+            await self.handle_search(prompt)
         elif user_message_instruction == "top":
-            self.handle_top_templates()
+            await self.handle_top_templates()
         elif user_message_instruction == "random":
-            self.handle_random_templates()
+            await self.handle_random_templates()
         elif user_message_instruction == "caption":
-            self.handle_caption(prompt)
+            await self.handle_caption(prompt)
         elif user_message_instruction == "testing":
-            self.twilio.send_message("Testing...")
+            await self.twilio.send_message_async("Testing...")
         else:
             # Fallback for unknown commands
-            self.twilio.send_message(
+            await self.twilio.send_message_async(
                 "Sorry, I didn't understand that command. Please type 'help' to see the possible commands."
             )
             
-    def send_meme_image_and_quick_reply(self, meme_name, meme_id, box_count, meme_url):
+    def send_meme_image_and_quick_reply(self, pipeline, meme_name, meme_id, box_count, meme_url):
         """
-        Send an image with a quick reply option.
+        Queue an image with a quick reply option.
+
+        The quick reply is only sent once the image has been delivered, so
+        the user always sees them in this order.
 
         Args:
-            image_url (str): URL of the image to send.
-            template_id (str): ID of the meme template.
+            pipeline (DeliveryPipeline): The pipeline to queue the messages on.
+            meme_name (str): Name of the meme template.
+            meme_id (str): ID of the meme template.
+            box_count (int): Number of text boxes of the template.
+            meme_url (str): URL of the image to send.
         """
-        self.twilio.send_media_message(
+        pipeline.send_media_message(
             f"Template: {meme_name}\n"
             f"ID: {meme_id}\n"
             f"Text Box Count: {box_count}", url_for_media=meme_url
         )
-        time.sleep(3)
-        self.twilio.send_quick_reply_message(meme_id)
+        pipeline.send_quick_reply_message(meme_id)
+
+    async def send_templates(self, memes, done_message: str):
+        """
+        Send meme templates with their quick replies, followed by a closing message.
 
+        All messages are queued at once. The images are sent back to back and each
+        quick reply follows its image's delivery. Delivery is paced per recipient,
+        so it does not count against the command's deadline; the pipeline bounds
+        each wait itself.
 
-    def handle_help(self):
+        Args:
+            memes (list): The templates to send.
+            done_message (str): Message sent after the last template.
+        """
+        pipeline = current_pipeline() or DeliveryPipeline(self.twilio)
+        for meme in memes:
+            self.send_meme_image_and_quick_reply(pipeline, meme["name"], meme["id"], meme["box_count"], meme["url"])
+        pipeline.send_message(done_message)
+        with deadline_paused():
+            await pipeline.drain()
+
+
+    async def handle_help(self):
         """
         Send the help menu message listing all available commands.
         """
@@ -102,10 +154,10 @@ class MemeBot:
             "- caption [id]    📝 Add your text to a specific meme template\n"
             "- help        ❓ Show all available commands\n"
         )
-        self.twilio.send_message(help_text)
+        await self.twilio.send_message_async(help_text)
         self.console.print("Replied with help menu", style="bold green")
 
-    def handle_meme(self, instruction: str, prompt: str):
+    async def handle_meme(self, instruction: str, prompt: str):
         """
         Generate a meme based on the provided caption or AI prompt.
 
@@ -113,74 +165,87 @@ class MemeBot:
             instruction (str): Either 'meme' for auto meme or 'generate' for AI meme.
             prompt (str): The caption or prompt for meme generation.
         """
-        if instruction == "meme":
-            response = self.automeme.send_caption_to_imgflip(caption=prompt)
-        elif instruction == "generate":
-            response = self.ai_meme.send_ai_meme_to_imgflip(prompt=prompt)
-        else:
-            response = None
+        try:
+            if instruction == "meme":
+                response = await self.automeme.send_caption_to_imgflip_async(caption=prompt)
+            elif instruction == "generate":
+                response = await self.ai_meme.send_ai_meme_to_imgflip_async(prompt=prompt)
+            else:
+                response = None
+        except REQUEST_ERRORS as e:
+            response = {"success": False, "error_message": str(e) or "Imgflip did not respond in time"}
 
         if response:
             if response.get("success"):
                 meme_url = response["data"]["url"]
                 self.console.print(f"Meme generated: {meme_url}", style="bold blue")
-                self.twilio.send_media_message(
+                await self.twilio.send_media_message_async(
                     "Here's your generated meme.", url_for_media=meme_url
                 )
             else:
                 error_message = response.get("error_message", "Unknown error")
                 self.console.print(f"Failed to generate meme: {error_message}", style="bold red")
-                self.twilio.send_message(
+                await self.twilio.send_message_async(
                     f"Failed to generate meme: {error_message}.\n"
                     "Try 'top' or 'random' to see some available meme templates.\n"
                     "Type 'help' for further instructions."
                 )
 
 
-    def handle_suprise(self):
+    async def handle_suprise(self):
         """
         Generate a random meme and send it to the user.
         """
         try:
-            self.console.print("Generating a random meme...", style="bold yellow")
-            self.twilio.send_message("Generating a random meme...")
-
-            # Load prompts
-            with open(self.surprise_meme_path, "r") as handle:
-                prompts = json.load(handle)
+            ready = self.surprise_pool.take(user=self.twilio.address)
+            if ready is not None:
+                suprise_caption, response = ready
+                self.automeme.save_meme(response, "auto", suprise_caption)
+                meme_url = response["data"]["url"]
+                pool_stats = self.surprise_pool.stats()
+                self.console.print(
+                    f"Surprise meme served from the pool: {meme_url} (hit rate {pool_stats['hit_rate']:.0%}, "
+                    f"{pool_stats['ready']} ready)", style="bold blue"
+                )
+                await self.twilio.send_message_async(f"Random caption selected: {suprise_caption}")
+                await self.twilio.send_media_message_async("Here's your surprise meme.", url_for_media=meme_url)
+                return
 
-            # Flatten all captions into a single list
-            all_captions = list(itertools.chain.from_iterable(prompts.values()))
+            self.console.print("Generating a random meme...", style="bold yellow")
+            await self.twilio.send_message_async("Generating a random meme...")
 
-            # Choose one at random
-            suprise_caption = random.choice(all_captions)
+            # Choose a prompt the user has not seen recently
+            suprise_caption = self.surprise_prompts.sample(user=self.twilio.address)
+            if suprise_caption is None:
+                await self.twilio.send_message_async("No surprise prompts available right now. Please try again later.")
+                return
 
             self.console.print(f"Random caption selected: {suprise_caption}", style="bold yellow")
-            self.twilio.send_message(f"Random caption selected: {suprise_caption}")
+            await self.twilio.send_message_async(f"Random caption selected: {suprise_caption}")
 
             # Send to Imgflip
             self.console.print("Sending caption to Imgflip...", style="bold yellow")
-            response = self.automeme.send_caption_to_imgflip(caption=suprise_caption)
+            response = await self.automeme.send_caption_to_imgflip_async(caption=suprise_caption)
 
             if response:
                 if response.get("success"):
                     meme_url = response["data"]["url"]
                     self.console.print(f"Random meme generated: {meme_url}", style="bold blue")
-                    self.twilio.send_media_message("Here's your surprise meme.", url_for_media=meme_url)
+                    await self.twilio.send_media_message_async("Here's your surprise meme.", url_for_media=meme_url)
                 else:
                     error_message = response.get("error_message", "Unknown error occurred.")
                     self.console.print(f"Error: {error_message}", style="bold red")
-                    self.twilio.send_message(f"Error generating surprise meme: {error_message}")
+                    await self.twilio.send_message_async(f"Error generating surprise meme: {error_message}")
             else:
                 self.console.print("Error: No response received.", style="bold red")
-                self.twilio.send_message("Error: No response received while generating surprise meme.")
+                await self.twilio.send_message_async("Error: No response received while generating surprise meme.")
         except Exception as e:
             self.console.print(f"An exception occurred: {str(e)}", style="bold red")
-            self.twilio.send_message("An error occurred while generating surprise meme. Please try again later.")
+            await self.twilio.send_message_async("An error occurred while generating surprise meme. Please try again later.")
 
             
             
-    def handle_search(self, prompt: str, limit: int = 10):
+    async def handle_search(self, prompt: str, limit: int = 10):
         """
         Search for meme templates based on a keyword and send the results.
 
@@ -190,37 +255,33 @@ class MemeBot:
         try:
             # Search for memes based on the prompt
             self.console.print(f"Searching for memes with keyword: {prompt}", style="bold yellow")
-            self.twilio.send_message(f"Searching for memes with keyword: {prompt}")
-            response = self.search_memes.search(query=prompt)
+            await self.twilio.send_message_async(f"Searching for memes with keyword: {prompt}")
+            # Make sure the local template index holds the catalog before searching it
+            await self.get_memes.get_memes_async()
+            response = await self.search_memes.search_local_first_async(query=prompt, limit=limit)
             if response:
                 if response.get("success"):
-                    self.console.print("Meme search completed successfully", style="bold blue")
+                    self.console.print(f"Meme search completed successfully ({response.get('source')})", style="bold blue")
                     memes = response["data"]["memes"]
                     if memes:
-                        for meme in memes[:limit]:
-                            meme_id = meme["id"]
-                            meme_name = meme["name"]
-                            meme_url = meme["url"]
-                            box_count = meme["box_count"]
-                            self.send_meme_image_and_quick_reply(meme_name, meme_id, box_count, meme_url)
+                        await self.send_templates(memes[:limit], "Meme search results sent successfully.")
                         self.console.print("Meme search results sent successfully", style="bold blue")
-                        self.twilio.send_message("Meme search results sent successfully.")
                     else:
                         self.console.print("No memes found for the given keyword.", style="bold red")
-                        self.twilio.send_message("No memes found for the given keyword.")
+                        await self.twilio.send_message_async("No memes found for the given keyword.")
                 else:
                     error_message = response.get("error_message", "Unknown error occurred during search.")
                     self.console.print(f"Error: {error_message}", style="bold red")
-                    self.twilio.send_message(f"Error during meme search: {error_message}")
+                    await self.twilio.send_message_async(f"Error during meme search: {error_message}")
             else:
                 self.console.print("Error: No response received during search.", style="bold red")
-                self.twilio.send_message("Error: No response received during meme search.")
+                await self.twilio.send_message_async("Error: No response received during meme search.")
         except Exception as e:
             self.console.print(f"An exception occurred: {str(e)}", style="bold red")
-            self.twilio.send_message("An error occurred while searching for memes. Please try again later.")
+            await self.twilio.send_message_async("An error occurred while searching for memes. Please try again later.")
         self.console.print("Replied with search results", style="bold green")
         
-    def handle_top_templates(self, limit: int = 10):
+    async def handle_top_templates(self, limit: int = 10):
         """
         Fetch and send the top meme templates.
 
@@ -230,34 +291,28 @@ class MemeBot:
         try:
             # Fetch top 10 meme templates from Imgflip
             self.console.print("Fetching top 10 meme templates...", style="bold yellow")
-            self.twilio.send_message("Fetching top 10 meme templates...")
-            response = self.get_memes.get_memes()
+            await self.twilio.send_message_async("Fetching top 10 meme templates...")
+            response = await self.get_memes.get_memes_async()
             
             if response:
                 if response.get("success"):
                     self.console.print("Meme templates retrieved successfully", style="bold blue")
                     memes = response["data"]["memes"]
-                    for meme in memes[:limit]:
-                        meme_id = meme["id"]
-                        meme_name = meme["name"]
-                        meme_url = meme["url"]
-                        box_count = meme["box_count"]
-                        self.send_meme_image_and_quick_reply(meme_name, meme_id, box_count, meme_url)
+                    await self.send_templates(memes[:limit], "Top meme templates sent successfully.")
                     self.console.print("Top meme templates sent successfully", style="bold blue")
-                    self.twilio.send_message("Top meme templates sent successfully.")
                 else:
                     error_message = response.get("error_message", "Unknown error occurred when fetching memes.")
                     self.console.print(f"Error: {error_message}", style="bold red")
-                    self.twilio.send_message(f"Error fetching meme templates: {error_message}")
+                    await self.twilio.send_message_async(f"Error fetching meme templates: {error_message}")
             else:
                 self.console.print("Error: No response received while fetching memes.", style="bold red")
-                self.twilio.send_message("Error: No response received while fetching meme templates.")
+                await self.twilio.send_message_async("Error: No response received while fetching meme templates.")
         except Exception as e:
             self.console.print(f"An exception occurred: {str(e)}", style="bold red")
-            self.twilio.send_message("An error occurred while fetching meme templates. Please try again later.")
+            await self.twilio.send_message_async("An error occurred while fetching meme templates. Please try again later.")
         self.console.print("Replied with top 10 meme templates", style="bold green")
         
-    def handle_random_templates(self, limit: int = 10):
+    async def handle_random_templates(self, limit: int = 10):
         """
         Fetch and send random meme templates.
 
@@ -267,42 +322,39 @@ class MemeBot:
         try:
             # Fetch 10 random meme templates from Imgflip
             self.console.print("Fetching 10 random meme templates...", style="bold yellow")
-            self.twilio.send_message("Fetching 10 random meme templates...")
-            response = self.get_memes.get_memes()
+            await self.twilio.send_message_async("Fetching 10 random meme templates...")
+            response = await self.get_memes.get_memes_async()
             
             if response:
                 if response.get("success"):
                     self.console.print("Meme templates retrieved successfully", style="bold blue")
                     memes = response["data"]["memes"]
                     random_memes = random.sample(memes, k=min(limit, len(memes)))
-                    for meme in random_memes:
-                        meme_id = meme["id"]
-                        meme_name = meme["name"]
-                        meme_url = meme["url"]
-                        box_count = meme["box_count"]
-                        self.send_meme_image_and_quick_reply(meme_name, meme_id, box_count, meme_url)
+                    await self.send_templates(random_memes, "Random meme templates sent successfully.")
                     self.console.print("Random meme templates sent successfully", style="bold blue")
-                    self.twilio.send_message("Random meme templates sent successfully.")
                 else:
                     error_message = response.get("error_message", "Unknown error occurred when fetching memes.")
                     self.console.print(f"Error: {error_message}", style="bold red")
-                    self.twilio.send_message(f"Error fetching meme templates: {error_message}")
+                    await self.twilio.send_message_async(f"Error fetching meme templates: {error_message}")
             else:
                 self.console.print("Error: No response received while fetching memes.", style="bold red")
-                self.twilio.send_message("Error fetching meme templates. Please try again later.")
+                await self.twilio.send_message_async("Error fetching meme templates. Please try again later.")
         except Exception as e:
             self.console.print(f"An exception occurred: {str(e)}", style="bold red")
-            self.twilio.send_message("An error occurred while fetching meme templates. Please try again later.")
+            await self.twilio.send_message_async("An error occurred while fetching meme templates. Please try again later.")
         self.console.print("Replied with 10 random meme templates", style="bold green")
         
-    def handle_caption(self, template_id: str):
+    async def handle_caption(self, template_id: str):
         """
         Handle captioning a meme template by prompting the user for each caption.
 
         Args:
             template_id (str): The ID of the meme template to caption.
         """
-        response = self.get_meme.get(template_id=template_id)
+        try:
+            response = await self.get_meme.get_async(template_id=template_id)
+        except REQUEST_ERRORS as e:
+            response = {"success": False, "error_message": str(e) or "Imgflip did not respond in time"}
         # Extract the template ID and text inputs from the message
         
         if response:
@@ -310,46 +362,199 @@ class MemeBot:
             if response.get("success"):
                 number_of_text_boxes = response["data"]["meme"]["box_count"]
                 self.console.print(f"Template ID: {template_id} has {number_of_text_boxes} text boxes.", style="bold blue")
-                self.twilio.send_message(f"Template ID: {template_id} has {number_of_text_boxes} text boxes.")
-                time.sleep(2)
+                box_count_message = await self.twilio.send_message_async(
+                    f"Template ID: {template_id} has {number_of_text_boxes} text boxes."
+                )
+                await box_count_message.wait_for(DELIVERED_STATUSES, timeout=5)
                 # Prompt the user for captions
                 captions = []
                 for i in range(number_of_text_boxes):
-                    self.twilio.send_message(f"Please provide caption {i + 1} (or send '.' to cancel):")
+                    await self.twilio.send_message_async(f"Please provide caption {i + 1} (or send '.' to cancel):")
                     self.console.print(f"Waiting for caption {i + 1}...", style="bold yellow")
                     # Wait for user input
-                    caption = self.twilio.wait_for_user_message()
+                    caption = await self.twilio.wait_for_user_message_async(timeout=self.reply_timeout)
+                    if caption is None:
+                        self.console.print(f"No caption {i + 1} received, cancelling the caption flow", style="bold red")
+                        await self.twilio.send_message_async(
+                            f"No caption received within {self.reply_timeout / 60:.0f} minutes, so I cancelled it. "
+                            f"Send 'caption {template_id}' to start again."
+                        )
+                        return
                     if caption == ".":
                         self.console.print("Ending conversation as user sent '.'", style="bold red")
-                        self.twilio.send_message("Ending conversation as user sent '.'")
+                        await self.twilio.send_message_async("Ending conversation as user sent '.'")
                         return
                     captions.append(caption)
                 # Generate the meme with the provided captions
-                response = self.caption_image.caption(
-                    template_id=template_id, text0=captions[0], text1=captions[1] if number_of_text_boxes > 1 else ""
-                )
+                try:
+                    response = await self.caption_image.caption_async(
+                        template_id=template_id, text0=captions[0], text1=captions[1] if number_of_text_boxes > 1 else ""
+                    )
+                except REQUEST_ERRORS as e:
+                    error_message = str(e) or "Imgflip did not respond in time"
+                    self.console.print(f"Failed to caption meme: {error_message}", style="bold red")
+                    await self.twilio.send_message_async(f"Failed to caption meme: {error_message}")
+                    return
                 meme_url = response["data"]["url"]
                 self.console.print(f"Meme generated with captions: {meme_url}", style="bold blue")
-                self.twilio.send_media_message(
+                await self.twilio.send_media_message_async(
                     "Here's your meme with captions.", url_for_media=meme_url
                 )
             else:
                 error_message = response.get("error_message", "Unknown error occurred while fetching template.")
                 self.console.print(f"Error: {error_message}", style="bold red")
-                self.twilio.send_message(f"Error fetching meme template: {error_message}")
+                await self.twilio.send_message_async(f"Error fetching meme template: {error_message}")
         else:
             self.console.print("Error: No response received while fetching template.", style="bold red")
-            self.twilio.send_message("Error: No response received while fetching meme template.")
+            await self.twilio.send_message_async("Error: No response received while fetching meme template.")
         
-    def run(self):
+    async def handle_inbound(self, inbound: dict):
         """
-        Start the main loop to continuously process incoming user messages.
+        Handle one inbound message on behalf of its author.
+
+        Args:
+            inbound (dict): The inbox message, with `author` and `body` keys.
         """
-        self.console.print("Meme Machine is running. Awaiting user messages...", style="bold green")
-        while True:
-            message = self.twilio.wait_for_user_message()
+        message = inbound["body"]
+        with self.twilio.session_for(inbound["author"]):
             if message == ".":
-                self.console.print("Ending conversation as user sent '.'", style="bold red")
-                break
-            self.console.print(f"Received message: '{message}'", style="bold green")
-            self.process_message(message)
+                self.console.print(f"Ending conversation with {inbound['author']} as user sent '.'", style="bold red")
+                await self.twilio.send_message_async("Conversation ended. Send 'help' whenever you want to start again.")
+                return
+            inbox_stats = self.twilio.inbox.stats()
+            outbound_stats = self.twilio.outbound.stats()
+            guard_stats = get_request_guard().stats()
+            self.console.print(
+                f"Received message from {inbound['author']}: '{message}' ({inbox_stats['depth']} more queued, "
+                f"average wait {inbox_stats['avg_wait']:.1f}s, {len(self.twilio.registry)} users, "
+                f"{outbound_stats['depth']} outbound queued, p95 send latency {outbound_stats['p95_latency']:.2f}s, "
+                f"Imgflip circuit {guard_stats['state']}, {guard_stats['retries']} retries, "
+                f"{guard_stats['hedges']} hedges ({guard_stats['hedge_wins']} won))",
+                style="bold green"
+            )
+            await self.process_message_within_deadline(message)
+
+    async def process_message_within_deadline(self, message: str):
+        """
+        Process an incoming message within its command's latency budget.
+
+        Once half of the budget is used up the user is told the bot is still
+        working on it. When the budget is spent, the command is cancelled along
+        with the Imgflip and Twilio calls it is waiting for, and the user is
+        told it took too long. Time spent waiting for the user's captions, or
+        for a template listing to be delivered, does not count. The notices go
+        through the command's delivery pipeline, so they never land between
+        the messages of a listing.
+
+        Args:
+            message (str): The incoming message text.
+        """
+        command = message.lower().split(" ")[0]
+        if command not in self.COMMANDS:
+            command = "unknown"
+        deadline = Deadline(self.COMMAND_DEADLINES.get(command, self.default_deadline), command)
+        with use_pipeline(DeliveryPipeline(self.twilio)) as pipeline:
+            notice = asyncio.get_running_loop().create_task(self.notify_still_working(deadline, pipeline))
+            try:
+                async with deadline:
+                    await self.process_message(message)
+            except DeadlineExceeded as e:
+                self.deadline_stats.record(command, exceeded=True)
+                self.console.print(
+                    f"Deadline exceeded: {str(e)} ({self.deadline_stats.exceeded(command)} times so far)",
+                    style="bold red"
+                )
+                pipeline.send_message(
+                    "Sorry, that took too long, so I stopped working on it. Please try again in a moment."
+                )
+            else:
+                self.deadline_stats.record(command, exceeded=False)
+            finally:
+                notice.cancel()
+                # Send whatever is still queued, e.g. a notice, before the user's next command
+                try:
+                    await pipeline.drain()
+                except Exception as e:
+                    self.console.print(f"An exception occurred: {str(e)}", style="bold red")
+
+    async def notify_still_working(self, deadline: Deadline, pipeline: DeliveryPipeline):
+        """
+        Tell the user the bot is still working once half of the command's budget is used up.
+
+        Args:
+            deadline (Deadline): The deadline of the running command.
+            pipeline (DeliveryPipeline): The command's pipeline, which orders the notice
+                after everything already queued for the user.
+        """
+        # The remaining time stands still while the bot waits for the user
+        while deadline.remaining() > deadline.budget / 2:
+            await asyncio.sleep(deadline.remaining() - deadline.budget / 2)
+        pipeline.send_message("Still working on it, hang on...")
+
+    async def run_async(self, max_concurrency: int = None):
+        """
+        Serve users concurrently on an event loop.
+
+        Every inbound message is handled in its own task, with at most
+        `max_concurrency` commands running at once. Each user's messages are
+        handled one after the other in the order they were sent: while a
+        user's command is running, that user's later messages stay in the
+        inbox (which is where handle_caption picks up its caption replies).
+
+        Args:
+            max_concurrency (int, optional): Maximum number of commands handled at once.
+                Defaults to os.getenv("MEME_BOT_CONCURRENCY", 10).
+        """
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("MEME_BOT_CONCURRENCY", "10"))
+        loop = asyncio.get_running_loop()
+        slots = threading.Semaphore(max_concurrency)
+        busy_authors = set()
+        tasks = set()
+
+        async def handle(inbound):
+            try:
+                await self.handle_inbound(inbound)
+            except Exception as e:
+                self.console.print(f"An exception occurred: {str(e)}", style="bold red")
+            finally:
+                busy_authors.discard(inbound["author"])
+                slots.release()
+                # Let the receiver take messages the author sent in the meantime
+                self.twilio.inbox.notify()
+
+        def start(inbound):
+            task = loop.create_task(handle(inbound))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        def receive():
+            # Runs in its own thread since waiting for messages blocks
+            while True:
+                slots.acquire()
+                inbound = self.twilio.wait_for_next_message(
+                    match=lambda message: message["author"] not in busy_authors
+                )
+                busy_authors.add(inbound["author"])
+                loop.call_soon_threadsafe(start, inbound)
+
+        threading.Thread(target=receive, daemon=True).start()
+        self.surprise_pool.start()
+        self.console.print(
+            f"Meme Machine is running. Awaiting user messages (up to {max_concurrency} at once)...", style="bold green"
+        )
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.surprise_pool.close()
+            await close_shared_async_session()
+            await self.twilio.close_async()
+
+    def run(self):
+        """
+        Start the event loop that continuously processes incoming user messages.
+
+        Messages from every user are processed concurrently, each user's in
+        arrival order, and replies go to the user who sent the message.
+        """
+        asyncio.run(self.run_async())
@@ -0,0 +1,256 @@
+"""
+Module for storing meme metadata in an SQLite database shared by the bot and the website.
+
+The database runs in WAL mode, so the website keeps reading while the bot
+inserts, and both processes can have it open at the same time. Memes are
+indexed by timestamp, type and template ID, so saving a meme and reading a
+page of the gallery cost O(log n) however large the archive grows. Every
+record is also kept as JSON, so memes read back exactly as they were saved.
+
+An existing JSON archive (see meme_store) is imported when the database is
+created. To import it again, e.g. after copying memes in from elsewhere:
+
+    python meme_db.py website/memes
+
+This module only uses the standard library so the website can import it too.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from meme_store import decode_cursor, encode_cursor, read_memes
+
+DATABASE_NAME = "memes.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memes (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    imgflip_url TEXT NOT NULL,
+    type TEXT,
+    template_id TEXT,
+    record TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS memes_by_timestamp ON memes (timestamp, imgflip_url);
+CREATE INDEX IF NOT EXISTS memes_by_type ON memes (type, timestamp, imgflip_url);
+CREATE INDEX IF NOT EXISTS memes_by_template ON memes (template_id, timestamp, imgflip_url);
+"""
+
+
+def _row(meme: Dict[str, Any]) -> Tuple[str, str, Optional[str], Optional[str], str]:
+    template_id = meme.get("template_id")
+    return (
+        meme.get("timestamp") or "",
+        meme.get("imgflip_url") or "",
+        meme.get("type"),
+        str(template_id) if template_id is not None else None,
+        json.dumps(meme, ensure_ascii=False),
+    )
+
+
+class MemeDatabase:
+    """
+    SQLite meme archive, safe to use from several threads and processes.
+
+    Each thread gets its own connection. Writes within a process are
+    serialized by a lock; writes from other processes wait up to
+    `busy_timeout` seconds for the database lock.
+
+    Attributes:
+        path (str): Path of the database file.
+        busy_timeout (float): Seconds to wait for another process's write to finish.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        """
+        Open the database, creating the file and schema if needed.
+
+        Args:
+            path (str): Path of the database file.
+            busy_timeout (float, optional): Seconds to wait for another process's
+                write to finish. Defaults to 5.
+        """
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._write_lock:
+            self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # WAL keeps the database consistent with NORMAL; a crash can only lose the last commits
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """
+        Close the calling thread's connection.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def add(self, meme: Dict[str, Any]):
+        """
+        Insert a meme record. A record already stored (same timestamp and URL) is ignored.
+
+        Args:
+            meme (Dict[str, Any]): The meme record to store.
+        """
+        self.add_many([meme])
+
+    def add_many(self, memes: Iterable[Dict[str, Any]]) -> int:
+        """
+        Insert meme records in a single transaction, ignoring records already stored.
+
+        Args:
+            memes (Iterable[Dict[str, Any]]): The meme records to store.
+
+        Returns:
+            int: Number of records inserted.
+        """
+        rows = [_row(meme) for meme in memes]
+        with self._write_lock:
+            connection = self._connection()
+            before = connection.total_changes
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO memes (timestamp, imgflip_url, type, template_id, record) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+            return connection.total_changes - before
+
+    @property
+    def memes(self) -> List[Dict[str, Any]]:
+        """
+        Every meme, oldest first.
+        """
+        rows = self._connection().execute("SELECT record FROM memes ORDER BY timestamp, imgflip_url")
+        return [json.loads(record) for record, in rows]
+
+    @property
+    def newest(self) -> List[Dict[str, Any]]:
+        """
+        Every meme, newest first.
+        """
+        rows = self._connection().execute("SELECT record FROM memes ORDER BY timestamp DESC, imgflip_url DESC")
+        return [json.loads(record) for record, in rows]
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT count(*) FROM memes").fetchone()[0]
+
+    def version(self) -> int:
+        """
+        Return a number that grows whenever a meme is added.
+
+        Returns:
+            int: The highest row ID, 0 for an empty database.
+        """
+        return self._connection().execute("SELECT coalesce(max(id), 0) FROM memes").fetchone()[0]
+
+    def page(self, limit: int, cursor: Optional[str] = None, meme_type: Optional[str] = None,
+             template_id: Optional[Any] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Return a page of memes, newest first, with the same cursors as `MemeTimeline.page`.
+
+        Args:
+            limit (int): Maximum number of memes on the page.
+            cursor (str, optional): Cursor returned with the previous page. Defaults to the first page.
+            meme_type (str, optional): Only return memes of this type (e.g. "ai"). Defaults to all.
+            template_id (Any, optional): Only return memes made from this template. Defaults to all.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: The memes, and the cursor of the next
+            page or None if this is the last one.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        conditions = []
+        params: List[Any] = []
+        if meme_type:
+            conditions.append("type = ?")
+            params.append(meme_type)
+        if template_id is not None:
+            conditions.append("template_id = ?")
+            params.append(str(template_id))
+        if cursor:
+            conditions.append("(timestamp, imgflip_url) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        # One extra row tells whether there is a next page
+        rows = self._connection().execute(
+            f"SELECT record FROM memes {where}ORDER BY timestamp DESC, imgflip_url DESC LIMIT ?",
+            params + [limit + 1],
+        ).fetchall()
+        memes = [json.loads(record) for record, in rows[:limit]]
+        next_cursor = encode_cursor(memes[-1]) if memes and len(rows) > limit else None
+        return memes, next_cursor
+
+
+def migrate_json_archive(database: MemeDatabase, folder: str) -> int:
+    """
+    Import the memes of a JSON archive (snapshot and append log) into the database.
+
+    Safe to run repeatedly: memes already in the database are skipped.
+
+    Args:
+        database (MemeDatabase): The database to import into.
+        folder (str): Folder holding the JSON archive.
+
+    Returns:
+        int: Number of memes imported.
+    """
+    return database.add_many(read_memes(folder))
+
+
+_databases: Dict[str, MemeDatabase] = {}
+_databases_lock = threading.Lock()
+
+
+def get_meme_database(folder: str) -> MemeDatabase:
+    """
+    Return the process-wide database in `folder`, creating it on first use.
+
+    A new database is filled from the JSON archive in the same folder, if any.
+
+    Args:
+        folder (str): Folder holding the database (and the JSON archive).
+
+    Returns:
+        MemeDatabase: The database shared by every client using that folder.
+    """
+    key = os.path.abspath(folder)
+    with _databases_lock:
+        if key not in _databases:
+            os.makedirs(folder, exist_ok=True)
+            database = MemeDatabase(os.path.join(folder, DATABASE_NAME))
+            if not database.version():
+                imported = migrate_json_archive(database, folder)
+                if imported:
+                    print(f"Imported {imported} memes from the JSON archive into {database.path}")
+            _databases[key] = database
+        return _databases[key]
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else os.path.join("website", "memes")
+    database = get_meme_database(folder)
+    imported = migrate_json_archive(database, folder)
+    print(f"Imported {imported} memes, {len(database)} memes in {database.path}")
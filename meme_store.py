@@ -0,0 +1,347 @@
+"""
+Module for persisting meme metadata as an append-only log with periodic compaction.
+
+Each generated meme is appended as one JSON line to `meme_metadata.jsonl`, so
+saving a meme costs the same no matter how large the archive is. From time to
+time the log is folded into the `meme_metadata.json` snapshot in a background
+thread. The snapshot keeps the original `{"memes": [...]}` format, so an
+existing archive is picked up as-is on first run.
+
+The bot records memes in the SQLite database of meme_db, which imports
+this archive when it is created, and keeps appending them here too: the
+website falls back to reading the archive where the database cannot be
+opened, e.g. on a read-only deployment.
+
+This module only uses the standard library so the website can import it too.
+"""
+
+import base64
+import bisect
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SNAPSHOT_NAME = "meme_metadata.json"
+LOG_NAME = "meme_metadata.jsonl"
+COMPACTING_SUFFIX = ".compacting"
+
+
+def _meme_key(meme: Dict[str, Any]):
+    """
+    Identify a meme record so a record is never listed twice while a compaction is in progress.
+    """
+    return meme.get("timestamp"), meme.get("imgflip_url")
+
+
+def _read_snapshot(path: str) -> List[Dict[str, Any]]:
+    """
+    Read the memes stored in a snapshot file.
+
+    Args:
+        path (str): Path to the snapshot JSON file.
+
+    Returns:
+        List[Dict[str, Any]]: Memes in the snapshot, or an empty list if it is missing or unreadable.
+    """
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("memes", [])
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"Warning: Could not read {path}: {str(e)}")
+        return []
+
+
+def _read_log(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the memes recorded in a JSONL log file.
+
+    A truncated last line (a write still in progress) is skipped.
+
+    Args:
+        path (str): Path to the JSONL log file.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def archive_paths(folder: str) -> List[str]:
+    """
+    List the files an archive in `folder` may be stored in.
+
+    Args:
+        folder (str): Folder holding the archive files.
+
+    Returns:
+        List[str]: The snapshot, the log being compacted and the live log.
+    """
+    log_path = os.path.join(folder, LOG_NAME)
+    return [os.path.join(folder, SNAPSHOT_NAME), log_path + COMPACTING_SUFFIX, log_path]
+
+
+def read_memes(folder: str) -> List[Dict[str, Any]]:
+    """
+    Read every meme in the archive stored in `folder`, in insertion order.
+
+    Combines the snapshot, a log being compacted (if any) and the live log.
+
+    Args:
+        folder (str): Folder holding the archive files.
+
+    Returns:
+        List[Dict[str, Any]]: All meme records.
+    """
+    snapshot_path, compacting_path, log_path = archive_paths(folder)
+
+    memes = _read_snapshot(snapshot_path)
+    seen = {_meme_key(meme) for meme in memes}
+    for path in (compacting_path, log_path):
+        for meme in _read_log(path):
+            key = _meme_key(meme)
+            if key not in seen:
+                seen.add(key)
+                memes.append(meme)
+    return memes
+
+
+def encode_cursor(meme: Dict[str, Any]) -> str:
+    """
+    Build the opaque pagination cursor pointing just past a meme.
+
+    Args:
+        meme (Dict[str, Any]): The last meme of a page.
+
+    Returns:
+        str: URL-safe cursor.
+    """
+    raw = json.dumps([meme.get("timestamp") or "", meme.get("imgflip_url") or ""], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decode a cursor built by `encode_cursor`.
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        Tuple[str, str]: Timestamp and URL of the meme the cursor points past.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, url = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(timestamp, str) or not isinstance(url, str):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return timestamp, url
+
+
+class MemeTimeline:
+    """
+    Memes ordered newest first, paged with cursors.
+
+    Memes are ordered by timestamp, ties broken by URL, so a cursor keeps
+    pointing at the same place while new memes are added at the top. Each
+    type and template gets its own sorted key list, so a page of a filtered
+    timeline is found by binary search instead of a scan.
+    """
+
+    def __init__(self, memes: List[Dict[str, Any]]):
+        """
+        Index the given memes.
+
+        Args:
+            memes (List[Dict[str, Any]]): Meme records in any order.
+        """
+        def sort_key(meme):
+            return meme.get("timestamp") or "", meme.get("imgflip_url") or ""
+
+        # Oldest first, so bisect works on the natural order
+        self._memes = sorted(memes, key=sort_key)
+        self._keys = [sort_key(meme) for meme in self._memes]
+        self._by_type: Dict[str, Tuple[List[Tuple[str, str]], List[Dict[str, Any]]]] = {}
+        self._by_template: Dict[str, Tuple[List[Tuple[str, str]], List[Dict[str, Any]]]] = {}
+        for key, meme in zip(self._keys, self._memes):
+            for index, value in ((self._by_type, meme.get("type")), (self._by_template, meme.get("template_id"))):
+                if value is None:
+                    continue
+                keys, records = index.setdefault(str(value), ([], []))
+                keys.append(key)
+                records.append(meme)
+
+    def __len__(self) -> int:
+        return len(self._memes)
+
+    @property
+    def newest(self) -> List[Dict[str, Any]]:
+        """
+        All memes, newest first.
+        """
+        return self._memes[::-1]
+
+    def page(self, limit: int, cursor: Optional[str] = None, meme_type: Optional[str] = None,
+             template_id: Optional[Any] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Return a page of memes, newest first.
+
+        Args:
+            limit (int): Maximum number of memes on the page.
+            cursor (str, optional): Cursor returned with the previous page. Defaults to the first page.
+            meme_type (str, optional): Only return memes of this type (e.g. "ai"). Defaults to all.
+            template_id (Any, optional): Only return memes made from this template. Defaults to all.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: The memes, and the cursor of the next
+            page or None if this is the last one.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        keys, memes = self._keys, self._memes
+        if template_id is not None:
+            keys, memes = self._by_template.get(str(template_id), ([], []))
+            if meme_type:
+                # A template has few enough memes to filter them by type
+                pairs = [(key, meme) for key, meme in zip(keys, memes) if meme.get("type") == meme_type]
+                keys, memes = [key for key, _ in pairs], [meme for _, meme in pairs]
+        elif meme_type:
+            keys, memes = self._by_type.get(meme_type, ([], []))
+        end = bisect.bisect_left(keys, decode_cursor(cursor)) if cursor else len(keys)
+        start = max(end - limit, 0)
+        page = memes[start:end][::-1]
+        next_cursor = encode_cursor(page[-1]) if page and start > 0 else None
+        return page, next_cursor
+
+
+class MemeArchive:
+    """
+    Append-only meme metadata archive with background compaction.
+
+    Attributes:
+        folder (str): Folder holding the archive files.
+        snapshot_path (str): Path of the compacted `meme_metadata.json` snapshot.
+        log_path (str): Path of the `meme_metadata.jsonl` append log.
+        compact_every (int): Number of appended records that triggers a compaction.
+    """
+
+    def __init__(self, folder: str, compact_every: int = 500):
+        """
+        Initialize the archive in the given folder.
+
+        Args:
+            folder (str): Folder holding the archive files.
+            compact_every (int, optional): Appended records between compactions. Defaults to 500.
+        """
+        self.folder = folder
+        self.snapshot_path = os.path.join(folder, SNAPSHOT_NAME)
+        self.log_path = os.path.join(folder, LOG_NAME)
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compactor = None
+        os.makedirs(folder, exist_ok=True)
+        self._log_records = sum(1 for _ in _read_log(self.log_path))
+
+    def load(self) -> List[Dict[str, Any]]:
+        """
+        Load every meme in the archive.
+
+        Returns:
+            List[Dict[str, Any]]: All meme records, oldest first.
+        """
+        return read_memes(self.folder)
+
+    def append(self, meme: Dict[str, Any]):
+        """
+        Append one meme record to the log.
+
+        Starts a background compaction once `compact_every` records have accumulated.
+
+        Args:
+            meme (Dict[str, Any]): The meme record to store.
+        """
+        line = json.dumps(meme, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._log_records += 1
+            should_compact = self._log_records >= self.compact_every
+        if should_compact:
+            self.compact_in_background()
+
+    def compact_in_background(self):
+        """
+        Start a compaction thread unless one is already running.
+        """
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self.compact, daemon=True)
+            self._compactor.start()
+
+    def compact(self):
+        """
+        Fold the log into the snapshot.
+
+        The live log is first renamed aside so new records keep being appended
+        while the snapshot is rewritten. The snapshot is replaced atomically.
+        """
+        with self._compact_lock:
+            compacting_path = self.log_path + COMPACTING_SUFFIX
+            with self._lock:
+                # A leftover file from an interrupted compaction is merged first.
+                if not os.path.exists(compacting_path) and os.path.exists(self.log_path):
+                    os.replace(self.log_path, compacting_path)
+                    self._log_records = 0
+            if not os.path.exists(compacting_path):
+                return
+
+            memes = _read_snapshot(self.snapshot_path)
+            seen = {_meme_key(meme) for meme in memes}
+            for meme in _read_log(compacting_path):
+                if _meme_key(meme) not in seen:
+                    seen.add(_meme_key(meme))
+                    memes.append(meme)
+
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"memes": memes}, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+            os.remove(compacting_path)
+
+
+_shared_archives: Dict[str, MemeArchive] = {}
+_shared_archives_lock = threading.Lock()
+
+
+def get_shared_archive(folder: str) -> MemeArchive:
+    """
+    Return the process-wide archive for `folder`, creating it on first use.
+
+    Args:
+        folder (str): Folder holding the archive files.
+
+    Returns:
+        MemeArchive: The archive shared by every client using that folder.
+    """
+    key = os.path.abspath(folder)
+    with _shared_archives_lock:
+        if key not in _shared_archives:
+            _shared_archives[key] = MemeArchive(folder)
+        return _shared_archives[key]
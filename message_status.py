@@ -0,0 +1,247 @@
+"""
+Module for tracking the delivery status of outbound messages.
+
+Statuses come from Twilio status callbacks when the webhook receiver is
+running, and from batched status polling otherwise, so the bot can send a
+follow-up message the moment the previous one was delivered instead of
+sleeping for a fixed time.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from rich.console import Console
+
+console = Console()
+
+DELIVERED_STATUSES = frozenset({"delivered", "read"})
+FINAL_STATUSES = frozenset({"delivered", "read", "failed", "undelivered"})
+
+# Statuses only ever move forward; late or repeated updates are ignored
+_STATUS_RANK = {
+    "accepted": 0,
+    "scheduled": 0,
+    "queued": 1,
+    "sending": 2,
+    "sent": 3,
+    "delivered": 4,
+    "read": 5,
+    "failed": 6,
+    "undelivered": 6,
+}
+
+
+class MessageHandle:
+    """
+    Awaitable delivery status of an outbound message.
+
+    Awaiting the handle waits until the message is delivered, read or has
+    failed, and returns that status.
+
+    Attributes:
+        sid (str): SID of the message.
+        conversation_sid (Optional[str]): SID of the conversation, for conversation messages.
+        created_at (float): Time the message was created.
+    """
+
+    def __init__(self, sid: str, status: str, conversation_sid: str = None):
+        self.sid = sid
+        self.conversation_sid = conversation_sid
+        self.created_at = time.time()
+        self._status = status
+        self._changed = asyncio.Event()
+
+    @property
+    def status(self) -> str:
+        """
+        The latest known status of the message.
+        """
+        return self._status
+
+    @property
+    def done(self) -> bool:
+        """
+        Whether the message reached a final status.
+        """
+        return self._status in FINAL_STATUSES
+
+    def update(self, status: str) -> bool:
+        """
+        Record a new status unless it is older than the current one.
+
+        Must be called on the event loop the handle was created on.
+
+        Args:
+            status (str): The reported status.
+
+        Returns:
+            bool: True if the status changed.
+        """
+        if status == self._status or _STATUS_RANK.get(status, -1) <= _STATUS_RANK.get(self._status, -1):
+            return False
+        self._status = status
+        self._changed.set()
+        self._changed = asyncio.Event()
+        return True
+
+    async def wait_for(self, statuses: Iterable[str] = FINAL_STATUSES, timeout: Optional[float] = None) -> str:
+        """
+        Wait until the message reaches one of the given statuses, or any final status.
+
+        Args:
+            statuses (Iterable[str], optional): Statuses to wait for. Defaults to the final ones.
+            timeout (float, optional): Maximum seconds to wait, or None to wait forever.
+
+        Returns:
+            str: The status the message is in when the wait ends, which may be
+            an earlier one if the timeout expired.
+        """
+        statuses = set(statuses) | FINAL_STATUSES
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while self._status not in statuses:
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return self._status
+
+    def __await__(self):
+        return self.wait_for().__await__()
+
+    def __repr__(self) -> str:
+        return f"MessageHandle({self.sid!r}, {self._status!r})"
+
+
+class DeliveryTracker:
+    """
+    Routes status updates to the handles of pending outbound messages.
+
+    Updates can be pushed from any thread (e.g. the webhook receiver) with
+    `update`. While handles are pending, a background task additionally asks
+    `poll` for the statuses of all of them at once every `poll_interval`
+    seconds.
+
+    Attributes:
+        updates (int): Number of status changes applied.
+        polls (int): Number of batched status polls made.
+    """
+
+    def __init__(self, poll: Callable[[List[MessageHandle]], Awaitable[Dict[str, str]]] = None,
+                 poll_interval: float = 0.5, max_age: float = 300.0):
+        """
+        Initialize the tracker.
+
+        Args:
+            poll (Callable, optional): Coroutine function returning the current statuses
+                of the given handles, keyed by SID. Defaults to no polling.
+            poll_interval (float, optional): Seconds between batched polls. Defaults to 0.5.
+            max_age (float, optional): Seconds after which a handle that never reached a
+                final status is no longer tracked. Defaults to 300.
+        """
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.max_age = max_age
+        self.updates = 0
+        self.polls = 0
+        self._lock = threading.Lock()
+        self._handles: Dict[str, MessageHandle] = {}
+        self._early: Dict[str, str] = {}
+        self._loop = None
+        self._poller = None
+
+    def track(self, sid: str, status: str, conversation_sid: str = None) -> MessageHandle:
+        """
+        Start tracking a message that was just created.
+
+        Must be called on the event loop the handle will be awaited on.
+
+        Args:
+            sid (str): SID of the message.
+            status (str): Status returned when the message was created.
+            conversation_sid (str, optional): SID of the conversation, for conversation messages.
+
+        Returns:
+            MessageHandle: The message's handle.
+        """
+        handle = MessageHandle(sid, status, conversation_sid)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._handles[sid] = handle
+            # A callback may have arrived before the create call returned
+            early_status = self._early.pop(sid, None)
+        if early_status is not None:
+            self._apply(sid, early_status)
+        if self.poll is not None and (self._poller is None or self._poller.done()):
+            self._poller = self._loop.create_task(self._poll_while_pending())
+        return handle
+
+    def update(self, sid: str, status: str):
+        """
+        Record a status reported for a message. Safe to call from any thread.
+
+        Args:
+            sid (str): SID of the message.
+            status (str): The reported status.
+        """
+        with self._lock:
+            loop = self._loop
+            if sid not in self._handles:
+                self._early[sid] = status
+                if len(self._early) > 1000:
+                    self._early.pop(next(iter(self._early)))
+                return
+        loop.call_soon_threadsafe(self._apply, sid, status)
+
+    def _apply(self, sid: str, status: str):
+        with self._lock:
+            handle = self._handles.get(sid)
+        if handle is not None and handle.update(status):
+            self.updates += 1
+            if handle.done:
+                with self._lock:
+                    self._handles.pop(sid, None)
+
+    def pending(self) -> List[MessageHandle]:
+        """
+        Return the handles still waiting for a final status, dropping expired ones.
+
+        Returns:
+            List[MessageHandle]: The pending handles.
+        """
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            for sid in [sid for sid, handle in self._handles.items() if handle.created_at < cutoff]:
+                del self._handles[sid]
+            return list(self._handles.values())
+
+    async def _poll_while_pending(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            handles = self.pending()
+            if not handles:
+                return
+            try:
+                statuses = await self.poll(handles)
+                self.polls += 1
+            except Exception as e:
+                console.print(f"Could not poll message statuses: {str(e)}", style="bold yellow")
+                continue
+            for sid, status in statuses.items():
+                self._apply(sid, status)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the number of pending handles, applied updates and polls.
+
+        Returns:
+            Dict[str, int]: Pending, updates and polls counts.
+        """
+        with self._lock:
+            pending = len(self._handles)
+        return {"pending": pending, "updates": self.updates, "polls": self.polls}
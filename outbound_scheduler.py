@@ -0,0 +1,243 @@
+"""
+Module for pacing outbound messages to stay within Twilio's throughput limits.
+
+Messages are queued per recipient and released by token buckets: one for the
+bot's sender number and one per recipient. Sends Twilio throttles anyway
+(HTTP 429) are retried with jittered exponential backoff.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from rich.console import Console
+
+console = Console()
+
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate` events per second with bursts of up to `burst`.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float = None) -> float:
+        """
+        Seconds until a token is available, 0 if one is available now.
+        """
+        self._refill(time.monotonic() if now is None else now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        """
+        Use up a token. Call only after `wait_time` returned 0.
+        """
+        self.tokens -= 1
+
+    def full(self, now: float = None) -> bool:
+        """
+        Whether the bucket has refilled completely, i.e. it holds no state worth keeping.
+        """
+        self._refill(time.monotonic() if now is None else now)
+        return self.tokens >= self.burst
+
+
+class OutboundScheduler:
+    """
+    Queues outbound sends and releases them at the configured rates.
+
+    Each recipient's messages are sent one at a time in the order they were
+    submitted, and recipients with queued messages take turns, so a long
+    listing for one user does not hold up a short reply to another.
+
+    Attributes:
+        sent (int): Number of messages accepted by Twilio.
+        throttled (int): Number of sends rejected with HTTP 429 and retried.
+        failed (int): Number of messages that could not be sent.
+        dropped (int): Number of queued messages dropped because their sender gave up waiting.
+    """
+
+    def __init__(self, sender_rate: float = 80.0, sender_burst: float = 10, recipient_rate: float = 2.0,
+                 recipient_burst: float = 5, max_retries: int = 5, backoff: float = 0.5):
+        """
+        Initialize the scheduler.
+
+        Args:
+            sender_rate (float, optional): Messages per second for the sender number. Defaults to 80.
+            sender_burst (float, optional): Burst size for the sender number. Defaults to 10.
+            recipient_rate (float, optional): Messages per second for each recipient. Defaults to 2.
+            recipient_burst (float, optional): Burst size for each recipient. Defaults to 5.
+            max_retries (int, optional): Retries of a throttled send before giving up. Defaults to 5.
+            backoff (float, optional): Base delay in seconds of the first retry, doubled
+                on every further retry and jittered by ±50%. Defaults to 0.5.
+        """
+        self.recipient_rate = recipient_rate
+        self.recipient_burst = recipient_burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.sent = 0
+        self.throttled = 0
+        self.failed = 0
+        self.dropped = 0
+        self._sender = TokenBucket(sender_rate, sender_burst)
+        self._recipients: Dict[str, TokenBucket] = {}
+        self._queues: Dict[str, Deque] = {}
+        self._turns: Deque[str] = deque()
+        self._in_flight = set()
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def submit(self, recipient: str, send: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Queue a send and wait until it went through.
+
+        Args:
+            recipient (str): Address the message goes to.
+            send (Callable): Coroutine function making the API call.
+
+        Returns:
+            Any: Whatever `send` returned.
+
+        Raises:
+            Exception: The error of the last attempt if the message could not be sent.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._queues.get(recipient)
+        if queue is None:
+            queue = self._queues[recipient] = deque()
+            self._turns.append(recipient)
+        queue.append((loop.time(), send, future))
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+        return await future
+
+    def _bucket(self, recipient: str) -> TokenBucket:
+        bucket = self._recipients.get(recipient)
+        if bucket is None:
+            bucket = self._recipients[recipient] = TokenBucket(self.recipient_rate, self.recipient_burst)
+        return bucket
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self._queues:
+            now = time.monotonic()
+            chosen = None
+            wait = None
+            for _ in range(len(self._turns)):
+                recipient = self._turns[0]
+                self._turns.rotate(-1)
+                if recipient in self._in_flight:
+                    continue
+                delay = self._bucket(recipient).wait_time(now)
+                if delay <= 0:
+                    chosen = recipient
+                    break
+                wait = delay if wait is None else min(wait, delay)
+
+            if chosen is None:
+                # Sleep until a recipient's bucket refills or a send completes
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            sender_delay = self._sender.wait_time(now)
+            if sender_delay > 0:
+                await asyncio.sleep(sender_delay)
+                continue
+
+            queue = self._queues[chosen]
+            submitted_at, send, future = queue.popleft()
+            if not queue:
+                del self._queues[chosen]
+                self._turns.remove(chosen)
+            if future.done():
+                # The command that queued the message was cancelled, e.g. by its deadline
+                self.dropped += 1
+                continue
+            self._sender.take()
+            self._bucket(chosen).take()
+            self._in_flight.add(chosen)
+            loop.create_task(self._send(chosen, submitted_at, send, future))
+
+        # Forget recipients whose buckets have refilled
+        now = time.monotonic()
+        for recipient in [recipient for recipient, bucket in self._recipients.items() if bucket.full(now)]:
+            del self._recipients[recipient]
+
+    async def _send(self, recipient: str, submitted_at: float, send: Callable[[], Awaitable[Any]],
+                    future: asyncio.Future):
+        loop = asyncio.get_running_loop()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    result = await send()
+                    break
+                except Exception as e:
+                    if getattr(e, "status", None) != 429 or attempt == self.max_retries or future.done():
+                        raise
+                    self.throttled += 1
+                    delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                    console.print(f"Throttled sending to {recipient}, retrying in {delay:.1f}s", style="bold yellow")
+                    await asyncio.sleep(delay)
+                    while self._sender.wait_time() > 0:
+                        await asyncio.sleep(self._sender.wait_time())
+                    self._sender.take()
+            self.sent += 1
+            self._latencies.append(loop.time() - submitted_at)
+            if not future.done():
+                future.set_result(result)
+        except Exception as e:
+            self.failed += 1
+            if not future.done():
+                future.set_exception(e)
+        finally:
+            self._in_flight.discard(recipient)
+            self._wakeup.set()
+
+    @property
+    def depth(self) -> int:
+        """
+        Number of messages waiting to be sent.
+        """
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return queue depth, counters and send latencies.
+
+        Returns:
+            Dict[str, float]: Depth, in-flight, sent, throttled, failed and dropped counts, and the
+            average and 95th percentile seconds from submitting a message to Twilio accepting it.
+        """
+        latencies = sorted(self._latencies)
+        return {
+            "depth": self.depth,
+            "in_flight": len(self._in_flight),
+            "sent": self.sent,
+            "throttled": self.throttled,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "avg_latency": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p95_latency": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+        }
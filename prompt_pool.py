@@ -0,0 +1,176 @@
+"""
+Module for sampling surprise meme prompts from the curated prompt file.
+
+The file maps categories to lists of prompts. It is flattened once into a
+single array, so picking a prompt is a random index instead of a file read,
+and reloaded only when the file changes on disk. A prompt can be given as a
+plain string or as {"text": ..., "weight": ...} to make it more or less
+likely to be picked.
+"""
+
+import bisect
+import json
+import os
+import random
+import threading
+from array import array
+from collections import deque
+from itertools import accumulate
+from typing import Deque, Dict, Optional, Set, Tuple
+
+
+class PromptPool:
+    """
+    Flat, hot-reloading pool of prompts with weighted, no-repeat sampling.
+
+    Prompts are kept in one flat tuple. Uniform picks are O(1); weighted
+    picks are a binary search over the cumulative weights built at load
+    time. Each user's last few prompts are remembered so they do not get the
+    same one twice in a row.
+
+    Attributes:
+        path (str): The prompt file.
+        history_size (int): Number of recent prompts per user that are not repeated.
+        reloads (int): Number of times the file was loaded.
+    """
+
+    def __init__(self, path: str, history_size: int = 50, max_users: int = 10000):
+        """
+        Initialize the pool and load the prompt file.
+
+        Args:
+            path (str): The prompt file.
+            history_size (int, optional): Recent prompts per user that are not repeated.
+                Capped at one less than the number of prompts. Defaults to 50.
+            max_users (int, optional): Users whose history is remembered, least recently
+                served first to be forgotten. Defaults to 10000.
+        """
+        self.path = path
+        self.history_size = history_size
+        self.max_users = max_users
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._prompts: Tuple[str, ...] = ()
+        self._indexes: Dict[str, int] = {}
+        self._cumulative: Optional[array] = None
+        self._history: Dict[str, Tuple[Deque[int], Set[int]]] = {}
+        self._reload_if_changed()
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            if self._mtime is None:
+                print(f"Warning: Could not read prompt file {self.path}: {str(e)}")
+                self._mtime = 0
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                categories = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            # Keep serving the prompts loaded last; retry once the file changes again
+            print(f"Warning: Could not load prompt file {self.path}: {str(e)}")
+            self._mtime = mtime
+            return
+
+        prompts = []
+        weights = []
+        for entries in categories.values():
+            for entry in entries:
+                if isinstance(entry, dict):
+                    prompts.append(entry["text"])
+                    weights.append(float(entry.get("weight", 1.0)))
+                else:
+                    prompts.append(entry)
+                    weights.append(1.0)
+
+        self._prompts = tuple(prompts)
+        self._indexes = {}
+        for index, prompt in enumerate(self._prompts):
+            self._indexes.setdefault(prompt, index)
+        # Only weighted files pay for the cumulative weights
+        self._cumulative = array("d", accumulate(weights)) if any(w != 1.0 for w in weights) else None
+        self._history.clear()
+        self._mtime = mtime
+        self.reloads += 1
+
+    def __len__(self) -> int:
+        return len(self._prompts)
+
+    def _pick(self) -> int:
+        if self._cumulative is None:
+            return random.randrange(len(self._prompts))
+        point = random.random() * self._cumulative[-1]
+        return min(bisect.bisect_right(self._cumulative, point), len(self._prompts) - 1)
+
+    def sample(self, user: str = None, max_tries: int = 20) -> Optional[str]:
+        """
+        Pick a random prompt, reloading the file first if it changed.
+
+        Args:
+            user (str, optional): User the prompt is for. Their recent prompts are
+                avoided. Defaults to None (no history).
+            max_tries (int, optional): Picks to try before accepting a repeat, which
+                only happens when a few heavily weighted prompts dominate. Defaults to 20.
+
+        Returns:
+            Optional[str]: The prompt, or None if the pool is empty.
+        """
+        with self._lock:
+            self._reload_if_changed()
+            if not self._prompts:
+                return None
+            if user is None:
+                return self._prompts[self._pick()]
+
+            _, seen = self._history.get(user, (None, ()))
+            for _ in range(max_tries):
+                index = self._pick()
+                if index not in seen:
+                    break
+            self._remember(user, index)
+            return self._prompts[index]
+
+    def _remember(self, user: str, index: int):
+        recent, seen = self._history.pop(user, (deque(), set()))
+        limit = min(self.history_size, len(self._prompts) - 1)
+        if limit > 0:
+            recent.append(index)
+            seen.add(index)
+            while len(recent) > limit:
+                seen.discard(recent.popleft())
+        # Re-inserting keeps the dictionary ordered from least to most recently served
+        self._history[user] = (recent, seen)
+        if len(self._history) > self.max_users:
+            self._history.pop(next(iter(self._history)))
+
+    def seen_recently(self, user: str, prompt: str) -> bool:
+        """
+        Whether `prompt` is among the user's recent prompts, which `sample` avoids.
+
+        Args:
+            user (str): The user.
+            prompt (str): The prompt.
+
+        Returns:
+            bool: True if the user was served the prompt recently.
+        """
+        with self._lock:
+            index = self._indexes.get(prompt)
+            return index is not None and index in self._history.get(user, (None, ()))[1]
+
+    def record(self, user: str, prompt: str):
+        """
+        Add a prompt picked elsewhere, e.g. for a pre-generated meme, to the user's recent prompts.
+
+        Args:
+            user (str): The user the prompt was served to.
+            prompt (str): The prompt. Prompts no longer in the file are ignored.
+        """
+        with self._lock:
+            index = self._indexes.get(prompt)
+            if index is not None:
+                self._remember(user, index)
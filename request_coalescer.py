@@ -0,0 +1,266 @@
+"""
+Module for sharing Imgflip results between identical requests.
+
+When several users send the same trending prompt at once, only the first
+request goes to Imgflip and the others wait for its result (singleflight).
+Results of deterministic endpoints can additionally be kept in a bounded
+cache keyed by endpoint and normalized prompt, so a repeated prompt is
+answered without a network call.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+def normalize_prompt(text: Any, casefold: bool = False) -> str:
+    """
+    Normalize prompt text for use in a cache key.
+
+    Args:
+        text (Any): The prompt.
+        casefold (bool, optional): Also ignore case, for endpoints that do. Defaults to False.
+
+    Returns:
+        str: The prompt with surrounding whitespace removed and inner runs of whitespace collapsed.
+    """
+    text = " ".join(str(text).split())
+    return text.casefold() if casefold else text
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with a TTL.
+
+    Attributes:
+        max_entries (int): Entries kept before the least recently used is evicted.
+        ttl (float): Seconds an entry stays valid.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups that found nothing valid.
+        evictions (int): Number of entries evicted to stay within `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Return the cached value for `key`, or None if missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Store a value, evicting the least recently used entries if the cache is full.
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _Call:
+    """
+    A blocking request other threads are waiting on.
+    """
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """
+    Singleflight for identical requests, plus an optional result cache.
+
+    Callers waiting on another caller's request get a shallow copy of its
+    result, so adding keys to a response does not affect the others. Side
+    effects of the request, like saving meme metadata, happen once, in the
+    call that actually went to Imgflip.
+
+    Attributes:
+        cache (ResultCache): Cache for results of deterministic endpoints.
+        coalesced (int): Number of calls that waited on an identical request in flight.
+    """
+
+    def __init__(self, cache_size: int = 1000, cache_ttl: float = 3600.0):
+        """
+        Initialize the coalescer.
+
+        Args:
+            cache_size (int, optional): Results to cache, 0 to disable caching. Defaults to 1000.
+            cache_ttl (float, optional): Seconds a cached result stays valid. Defaults to 3600.
+        """
+        self.cache = ResultCache(cache_size, cache_ttl)
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def _cached(self, key: Hashable, cache: bool) -> Optional[Dict[str, Any]]:
+        if not cache or self.cache.max_entries <= 0:
+            return None
+        result = self.cache.get(key)
+        return dict(result) if result is not None else None
+
+    def _store(self, key: Hashable, result: Any, cache: bool):
+        # Only successful responses are worth repeating
+        if cache and isinstance(result, dict) and result.get("success"):
+            self.cache.put(key, dict(result))
+
+    def call(self, endpoint: str, key: Hashable, send: Callable[[], Any], cache: bool = False) -> Any:
+        """
+        Run a blocking request unless an identical one is in flight or cached.
+
+        Args:
+            endpoint (str): The Imgflip endpoint, part of the key.
+            key (Hashable): Identifies the request within the endpoint, e.g. its normalized prompt.
+            send (Callable): Function making the request.
+            cache (bool, optional): Whether the endpoint's results may be cached. Defaults to False.
+
+        Returns:
+            Any: The result of the request.
+        """
+        key = (endpoint, key)
+        cached = self._cached(key, cache)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return dict(call.result) if isinstance(call.result, dict) else call.result
+
+        try:
+            call.result = send()
+            self._store(key, call.result, cache)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def call_async(self, endpoint: str, key: Hashable, send: Callable[[], Awaitable[Any]],
+                         cache: bool = False) -> Any:
+        """
+        Async counterpart of `call`.
+
+        The request runs in its own task, so a caller that is cancelled (e.g. by
+        its deadline) does not cancel it for the others waiting on it.
+
+        Args:
+            endpoint (str): The Imgflip endpoint, part of the key.
+            key (Hashable): Identifies the request within the endpoint, e.g. its normalized prompt.
+            send (Callable): Coroutine function making the request.
+            cache (bool, optional): Whether the endpoint's results may be cached. Defaults to False.
+
+        Returns:
+            Any: The result of the request.
+        """
+        key = (endpoint, key)
+        cached = self._cached(key, cache)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        task = self._tasks.get(key)
+        leader = task is None or task.get_loop() is not loop
+        if leader:
+            async def run():
+                result = await send()
+                self._store(key, result, cache)
+                return result
+
+            # A fresh context, so the shared request is not bound to the first caller's deadline
+            task = self._tasks[key] = loop.create_task(run(), context=contextvars.Context())
+            task.add_done_callback(lambda done: self._tasks.pop(key, None) if self._tasks.get(key) is done else None)
+        else:
+            self.coalesced += 1
+
+        result = await asyncio.shield(task)
+        if not leader and isinstance(result, dict):
+            return dict(result)
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return cache and coalescing counters.
+
+        Returns:
+            Dict[str, float]: Cache size, hits, misses, hit rate and evictions, and the
+            number of coalesced calls.
+        """
+        lookups = self.cache.hits + self.cache.misses
+        return {
+            "cached": len(self.cache),
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+            "hit_rate": self.cache.hits / lookups if lookups else 0.0,
+            "evictions": self.cache.evictions,
+            "coalesced": self.coalesced,
+        }
+
+
+_request_coalescer = None
+_request_coalescer_lock = threading.Lock()
+
+
+def get_request_coalescer() -> RequestCoalescer:
+    """
+    Return the process-wide coalescer for Imgflip requests, creating it on first use.
+
+    The result cache is configured with the IMGFLIP_RESULT_CACHE_SIZE (0 disables
+    it) and IMGFLIP_RESULT_CACHE_TTL environment variables.
+
+    Returns:
+        RequestCoalescer: The shared coalescer.
+    """
+    global _request_coalescer
+    with _request_coalescer_lock:
+        if _request_coalescer is None:
+            _request_coalescer = RequestCoalescer(
+                cache_size=int(os.getenv("IMGFLIP_RESULT_CACHE_SIZE", "1000")),
+                cache_ttl=float(os.getenv("IMGFLIP_RESULT_CACHE_TTL", "3600")),
+            )
+        return _request_coalescer
@@ -0,0 +1,378 @@
+"""
+Module guarding Imgflip requests with retries, hedging and a circuit breaker.
+
+Idempotent requests are retried with jittered backoff, as long as the
+deadline of the command being handled leaves time, and can optionally be
+hedged: if a response is slow, an identical second request is raced against
+it. All requests share a circuit breaker, so while Imgflip is down callers
+fail fast instead of each waiting for a timeout.
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import aiohttp
+import requests
+from rich.console import Console
+
+from deadline import current_deadline
+
+console = Console()
+
+# Errors raised by a request that did not get a usable response
+REQUEST_ERRORS = (requests.RequestException, aiohttp.ClientError, asyncio.TimeoutError)
+
+
+class CircuitOpenError(requests.RequestException):
+    """
+    Raised instead of making a request while the circuit breaker is open.
+    """
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Check whether a request error is worth retrying: a timeout, a connection
+    problem, throttling (429) or a server error (5xx).
+
+    Args:
+        error (Exception): The error raised by the request.
+
+    Returns:
+        bool: True if the error is transient.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(error, "status", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, REQUEST_ERRORS)
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+
+    After `failure_threshold` consecutive transient failures the circuit
+    opens and requests are rejected for `reset_timeout` seconds. Then a
+    single trial request is let through (half-open): its success closes the
+    circuit, its failure opens it again.
+
+    Attributes:
+        opened (int): Number of times the circuit opened.
+        rejected (int): Number of requests rejected while open.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, name: str = "Imgflip"):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.opened = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        """
+        The current state: "closed", "open" or "half-open".
+        """
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def before_request(self):
+        """
+        Let a request through, or reject it while the circuit is open.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a trial already running.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if remaining <= 0 and not self._trial_running:
+                self._state = self.HALF_OPEN
+                self._trial_running = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(
+            f"{self.name} is unavailable, not retrying for another {max(remaining, 0):.0f}s"
+        )
+
+    def record_success(self):
+        """
+        Record a request that got a response, closing the circuit.
+        """
+        with self._lock:
+            if self._state != self.CLOSED:
+                console.print(f"{self.name} circuit closed", style="bold green")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def release_trial(self):
+        """
+        Let another trial through after one ended without an outcome, e.g. because it was cancelled.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        """
+        Record a transient failure, opening the circuit once the threshold is reached.
+        """
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                    console.print(
+                        f"{self.name} circuit opened after {self._failures} failures", style="bold red"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the breaker state and counters.
+
+        Returns:
+            Dict[str, Any]: State, consecutive failures, times opened and rejected requests.
+        """
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+class RequestGuard:
+    """
+    Runs requests with retries, optional hedging and a shared circuit breaker.
+
+    Attributes:
+        breaker (CircuitBreaker): The breaker all requests go through.
+        retries (int): Number of retried attempts.
+        hedges (int): Number of hedge requests sent.
+        hedge_wins (int): Number of times the hedge answered first.
+    """
+
+    def __init__(self, max_retries: int = 2, backoff: float = 0.5, hedge_after: Optional[float] = None,
+                 breaker: CircuitBreaker = None):
+        """
+        Initialize the guard.
+
+        Args:
+            max_retries (int, optional): Retries of an idempotent request after a transient
+                failure. Defaults to 2.
+            backoff (float, optional): Base delay in seconds of the first retry, doubled on
+                every further retry and jittered by ±50%. Defaults to 0.5.
+            hedge_after (float, optional): Seconds after which a slow idempotent request is
+                hedged with a second one. Defaults to None (no hedging).
+            breaker (CircuitBreaker, optional): The circuit breaker. Defaults to a new one.
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _delay(self, attempt: int) -> Optional[float]:
+        delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+        deadline = current_deadline()
+        if deadline is not None and deadline.remaining() <= delay:
+            # No time left for another attempt
+            return None
+        return delay
+
+    def _record(self, error: Optional[Exception]):
+        if error is None or not is_transient(error):
+            # Any response, even an error status, shows Imgflip is up
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def call(self, send: Callable[[], Any], idempotent: bool = False) -> Any:
+        """
+        Run a blocking request.
+
+        Args:
+            send (Callable): Function making the request and returning its result.
+            idempotent (bool, optional): Whether the request may be retried and hedged.
+                Defaults to False.
+
+        Returns:
+            Any: Whatever `send` returned.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open.
+            Exception: The error of the last attempt if every attempt failed.
+        """
+        attempts = 1 + (self.max_retries if idempotent else 0)
+        for attempt in range(attempts):
+            self.breaker.before_request()
+            try:
+                result = self._hedged(send) if idempotent and self.hedge_after else send()
+            except Exception as e:
+                self._record(e)
+                delay = self._delay(attempt)
+                if not is_transient(e) or attempt == attempts - 1 or delay is None:
+                    raise
+                self.retries += 1
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled or interrupted: says nothing about Imgflip, but must not hold the trial
+                self.breaker.release_trial()
+                raise
+            self._record(None)
+            return result
+
+    def _hedged(self, send: Callable[[], Any]) -> Any:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="imgflip-hedge")
+        # Each attempt runs in a copy of the caller's context, so it keeps the caller's deadline
+        first = self._executor.submit(contextvars.copy_context().run, send)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done:
+            # Answered (or failed) in time, no hedge needed
+            return first.result()
+        self.hedges += 1
+        pending = {first, self._executor.submit(contextvars.copy_context().run, send)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def call_async(self, send: Callable[[], Awaitable[Any]], idempotent: bool = False) -> Any:
+        """
+        Async counterpart of `call`.
+
+        Args:
+            send (Callable): Coroutine function making the request.
+            idempotent (bool, optional): Whether the request may be retried and hedged.
+                Defaults to False.
+
+        Returns:
+            Any: Whatever `send` returned.
+        """
+        attempts = 1 + (self.max_retries if idempotent else 0)
+        for attempt in range(attempts):
+            self.breaker.before_request()
+            try:
+                result = await (self._hedged_async(send) if idempotent and self.hedge_after else send())
+            except Exception as e:
+                self._record(e)
+                delay = self._delay(attempt)
+                if not is_transient(e) or attempt == attempts - 1 or delay is None:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Cancelled, e.g. by the command's deadline: must not hold the trial
+                self.breaker.release_trial()
+                raise
+            self._record(None)
+            return result
+
+    async def _hedged_async(self, send: Callable[[], Awaitable[Any]]) -> Any:
+        first = asyncio.ensure_future(send())
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        except asyncio.CancelledError:
+            first.cancel()
+            raise
+        if done:
+            # Answered (or failed) in time, no hedge needed
+            return first.result()
+        self.hedges += 1
+        pending = {first, asyncio.ensure_future(send())}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the breaker state together with retry and hedging counters.
+
+        Returns:
+            Dict[str, Any]: Breaker state and counters, retries, hedges and hedge wins.
+        """
+        return {
+            **self.breaker.stats(),
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+_request_guard = None
+_request_guard_lock = threading.Lock()
+
+
+def get_request_guard() -> RequestGuard:
+    """
+    Return the process-wide guard for Imgflip requests, creating it on first use.
+
+    Configured with the IMGFLIP_MAX_RETRIES, IMGFLIP_HEDGE_AFTER,
+    IMGFLIP_BREAKER_THRESHOLD and IMGFLIP_BREAKER_RESET environment variables.
+
+    Returns:
+        RequestGuard: The shared guard.
+    """
+    global _request_guard
+    with _request_guard_lock:
+        if _request_guard is None:
+            hedge_after = os.getenv("IMGFLIP_HEDGE_AFTER")
+            _request_guard = RequestGuard(
+                max_retries=int(os.getenv("IMGFLIP_MAX_RETRIES", "2")),
+                hedge_after=float(hedge_after) if hedge_after else None,
+                breaker=CircuitBreaker(
+                    failure_threshold=int(os.getenv("IMGFLIP_BREAKER_THRESHOLD", "5")),
+                    reset_timeout=float(os.getenv("IMGFLIP_BREAKER_RESET", "30")),
+                ),
+            )
+        return _request_guard
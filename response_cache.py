@@ -0,0 +1,142 @@
+"""
+Module for serving website responses conditionally and compressed.
+
+Gallery pages and API responses only change when a meme is added. Each
+response gets a strong ETag derived from the archive version, so a client
+that already has the current version gets an empty 304 instead of the
+page. Bodies are compressed with brotli or gzip, whichever the client
+accepts, once per version and kept in a bounded cache, so repeated hits
+neither re-render nor re-compress.
+
+Brotli is optional: without the `brotli` package responses are gzipped.
+This module only uses the standard library otherwise.
+"""
+
+import gzip
+import hashlib
+from typing import Callable, Dict, Hashable, Tuple
+
+from request_coalescer import ResultCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed; the framing costs more than it saves
+MIN_COMPRESS_SIZE = 512
+
+# Supported content encodings, most preferred first
+_COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {"gzip": lambda body: gzip.compress(body, compresslevel=6)}
+if brotli is not None:
+    _COMPRESSORS["br"] = lambda body: brotli.compress(body, quality=5)
+    ENCODINGS: Tuple[str, ...] = ("br", "gzip")
+else:
+    ENCODINGS = ("gzip",)
+
+# Suffixes telling the ETags of the encoded variants of a response apart
+_ETAG_SUFFIXES = {"identity": "", "gzip": "-gz", "br": "-br"}
+
+
+def make_etag(key: Hashable, version: Hashable, encoding: str = "identity") -> str:
+    """
+    Build the strong ETag of one encoding of a response.
+
+    Args:
+        key (Hashable): Identifies the response, e.g. the path and query string.
+        version (Hashable): Version of the content the response is built from.
+        encoding (str, optional): The content encoding. Defaults to "identity".
+
+    Returns:
+        str: The ETag, without quotes.
+    """
+    digest = hashlib.sha1(repr((key, version)).encode("utf-8")).hexdigest()[:20]
+    return digest + _ETAG_SUFFIXES[encoding]
+
+
+def etag_variants(key: Hashable, version: Hashable) -> Tuple[str, ...]:
+    """
+    Return the ETags of every encoding of a response.
+
+    A client holding any of them has the current version, whichever encoding it got.
+
+    Args:
+        key (Hashable): Identifies the response, e.g. the path and query string.
+        version (Hashable): Version of the content the response is built from.
+
+    Returns:
+        Tuple[str, ...]: The ETags, without quotes.
+    """
+    return tuple(make_etag(key, version, encoding) for encoding in _ETAG_SUFFIXES)
+
+
+class ResponseCache:
+    """
+    Bounded cache of rendered and compressed response bodies, keyed by version.
+
+    A new version simply misses the cache; bodies of older versions are
+    evicted as least recently used.
+
+    Attributes:
+        renders (int): Number of bodies rendered.
+        compressions (int): Number of bodies compressed.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries (int, optional): Bodies kept, counting each encoding separately. Defaults to 256.
+        """
+        self._bodies = ResultCache(max_entries, ttl=float("inf"))
+        self.renders = 0
+        self.compressions = 0
+
+    def body(self, key: Hashable, version: Hashable, encoding: str,
+             render: Callable[[], bytes]) -> Tuple[bytes, str]:
+        """
+        Return the body of a response in the given encoding, rendering and compressing it on a miss.
+
+        Args:
+            key (Hashable): Identifies the response, e.g. the path and query string.
+            version (Hashable): Version of the content the response is built from.
+            encoding (str): "br", "gzip" or "identity".
+            render (Callable[[], bytes]): Function rendering the uncompressed body.
+
+        Returns:
+            Tuple[bytes, str]: The body and its encoding, "identity" for bodies too small to compress.
+        """
+        cached = self._bodies.get((key, version, encoding))
+        if cached is not None:
+            return cached
+
+        plain = self._bodies.get((key, version, "identity"))
+        if plain is None:
+            plain = (render(), "identity")
+            self.renders += 1
+            self._bodies.put((key, version, "identity"), plain)
+        if encoding == "identity":
+            return plain
+        if len(plain[0]) < MIN_COMPRESS_SIZE:
+            result = plain
+        else:
+            result = (_COMPRESSORS[encoding](plain[0]), encoding)
+            self.compressions += 1
+        self._bodies.put((key, version, encoding), result)
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return cache counters.
+
+        Returns:
+            Dict[str, float]: Bodies cached, hits, misses, renders and compressions.
+        """
+        return {
+            "cached": len(self._bodies),
+            "hits": self._bodies.hits,
+            "misses": self._bodies.misses,
+            "renders": self.renders,
+            "compressions": self.compressions,
+        }
@@ -0,0 +1,201 @@
+"""
+Module keeping a few surprise memes generated ahead of time.
+
+Generating a surprise meme is a full Imgflip round trip. A background task
+keeps a small pool of memes generated from random prompts, so the surprise
+command can usually answer straight from the pool while the task replaces
+the meme it took.
+"""
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from rich.console import Console
+
+from prompt_pool import PromptPool
+
+console = Console()
+
+
+class SurpriseMemePool:
+    """
+    Pool of ready-made surprise memes, refilled in the background.
+
+    Memes older than `max_age` are thrown away rather than served, so a
+    quiet bot does not hand out memes generated hours ago, e.g. from prompts
+    that have since been edited, and the pool keeps turning over.
+
+    Attributes:
+        size (int): Number of memes to keep ready.
+        max_age (float): Seconds after which a ready meme expires.
+        hits (int): Number of surprise commands answered from the pool.
+        misses (int): Number of surprise commands that found the pool empty.
+        expired (int): Number of memes thrown away unused.
+        failed (int): Number of memes that could not be generated.
+    """
+
+    def __init__(self, prompts: PromptPool, generate: Callable[[str], Awaitable[Dict[str, Any]]],
+                 size: int = 5, max_age: float = 3600.0, concurrency: int = 2, retry_delay: float = 5.0):
+        """
+        Initialize an empty pool. The background task starts with `start`.
+
+        Args:
+            prompts (PromptPool): Prompts to generate memes from.
+            generate (Callable): Coroutine function turning a prompt into an Imgflip response.
+            size (int, optional): Number of memes to keep ready. Defaults to 5.
+            max_age (float, optional): Seconds after which a ready meme expires. Defaults to 3600.
+            concurrency (int, optional): Memes generated at once while refilling. Defaults to 2.
+            retry_delay (float, optional): Seconds to wait after a failed generation, doubled
+                on every further failure up to a minute. Defaults to 5.
+        """
+        self.prompts = prompts
+        self.generate = generate
+        self.size = size
+        self.max_age = max_age
+        self.concurrency = concurrency
+        self.retry_delay = retry_delay
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.failed = 0
+        self._ready: Deque[Tuple[float, str, Dict[str, Any]]] = deque()
+        self._generating = 0
+        self._failures_in_a_row = 0
+        self._refill_latencies: Deque[float] = deque(maxlen=100)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def start(self):
+        """
+        Start the refill task on the running event loop, unless it is running already.
+        """
+        if self.size <= 0 or (self._worker is not None and not self._worker.done()):
+            return
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        # A fresh context, so the task does not inherit the deadline of the command that started it
+        self._worker = asyncio.get_running_loop().create_task(self._refill(), context=contextvars.Context())
+
+    async def close(self):
+        """
+        Stop the refill task and any generation it started.
+        """
+        if self._worker is not None:
+            # The flag stops the loop even if the cancellation is lost while it wakes up
+            self._closing = True
+            self._wakeup.set()
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    def _drop_expired(self):
+        cutoff = time.monotonic() - self.max_age
+        while self._ready and self._ready[0][0] < cutoff:
+            self._ready.popleft()
+            self.expired += 1
+
+    def take(self, user: str = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Take the oldest ready meme and let the refill task replace it.
+
+        Memes are generated before it is known who gets them, so the user's
+        no-repeat history is applied here: memes made from a prompt the user
+        was served recently are left for other users, and the prompt of the
+        meme taken is added to the user's history.
+
+        Args:
+            user (str, optional): The user the meme is for. Defaults to None (no history).
+
+        Returns:
+            Optional[Tuple[str, Dict[str, Any]]]: The prompt and the Imgflip response, or
+            None if no meme is ready.
+        """
+        self.start()
+        self._drop_expired()
+        for position, (_, prompt, response) in enumerate(self._ready):
+            if user is None or not self.prompts.seen_recently(user, prompt):
+                break
+        else:
+            self.misses += 1
+            return None
+        del self._ready[position]
+        if user is not None:
+            self.prompts.record(user, prompt)
+        self.hits += 1
+        self._wakeup.set()
+        return prompt, response
+
+    async def _refill(self):
+        generations = set()
+        try:
+            while not self._closing:
+                self._drop_expired()
+                while len(self._ready) + self._generating < self.size and self._generating < self.concurrency:
+                    self._generating += 1
+                    task = asyncio.get_running_loop().create_task(self._generate_one())
+                    generations.add(task)
+                    task.add_done_callback(generations.discard)
+
+                # Wake up when a meme was taken or generated, or the oldest one expires
+                timeout = self._ready[0][0] + self.max_age - time.monotonic() if self._ready else None
+                self._wakeup.clear()
+                try:
+                    async with asyncio.timeout(timeout):
+                        await self._wakeup.wait()
+                except TimeoutError:
+                    pass
+        finally:
+            for task in list(generations):
+                task.cancel()
+            await asyncio.gather(*generations, return_exceptions=True)
+
+    async def _generate_one(self):
+        start = time.monotonic()
+        try:
+            prompt = self.prompts.sample()
+            if prompt is None:
+                raise ValueError("no prompts available")
+            response = await self.generate(prompt)
+            if not response or not response.get("success"):
+                raise ValueError((response or {}).get("error_message", "no response"))
+        except Exception as e:
+            self.failed += 1
+            self._failures_in_a_row += 1
+            delay = min(self.retry_delay * 2 ** (self._failures_in_a_row - 1), 60.0)
+            console.print(f"Could not pre-generate a surprise meme: {str(e)}, retrying in {delay:.0f}s",
+                          style="bold yellow")
+            await asyncio.sleep(delay)
+        else:
+            self._failures_in_a_row = 0
+            now = time.monotonic()
+            self._refill_latencies.append(now - start)
+            self._ready.append((now, prompt, response))
+        finally:
+            self._generating -= 1
+            self._wakeup.set()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return the pool's fill level, hit rate and refill latencies.
+
+        Returns:
+            Dict[str, float]: Ready and generating counts, hits, misses, hit rate, expired
+            and failed counts, and the average and 95th percentile seconds to generate a meme.
+        """
+        latencies = sorted(self._refill_latencies)
+        served = self.hits + self.misses
+        return {
+            "ready": len(self._ready),
+            "generating": self._generating,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / served if served else 0.0,
+            "expired": self.expired,
+            "failed": self.failed,
+            "avg_refill_latency": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p95_refill_latency": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+        }
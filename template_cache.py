@@ -0,0 +1,236 @@
+"""
+Module for caching Imgflip meme template data between bot commands.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+CACHE_FOLDER = ".cache"
+
+
+class CatalogCache:
+    """
+    TTL cache with stale-while-revalidate for the `get_memes` template catalog.
+
+    A fresh catalog is returned straight from memory. Once it is older than the
+    TTL the cached copy is still returned immediately while a background thread
+    fetches a new one. The catalog is persisted to disk, so a restarted bot can
+    answer without a network call.
+
+    Attributes:
+        ttl (float): Seconds after which the catalog is considered stale.
+        path (str): File the catalog is persisted to, or None to keep it in memory only.
+    """
+
+    def __init__(self, fetch: Callable[[], Dict[str, Any]], ttl: float = 3600, path: Optional[str] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            fetch (Callable[[], Dict[str, Any]]): Function returning a fresh `get_memes` response.
+            ttl (float, optional): Seconds before the catalog goes stale. Defaults to 3600.
+            path (str, optional): File to persist the catalog to. Defaults to None.
+        """
+        self._fetch = fetch
+        self.ttl = ttl
+        self.path = path
+        self._lock = threading.Lock()
+        self._response = None
+        self._fetched_at = 0.0
+        self._refreshing = False
+        self._load_from_disk()
+
+    def _load_from_disk(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            self._response = cached["response"]
+            self._fetched_at = cached["fetched_at"]
+        except (json.JSONDecodeError, KeyError, OSError) as e:
+            print(f"Warning: Could not read template catalog cache {self.path}: {str(e)}")
+
+    def _save_to_disk(self, response: Dict[str, Any], fetched_at: float):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fetched_at": fetched_at, "response": response}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: Could not save template catalog cache: {str(e)}")
+
+    @property
+    def is_stale(self) -> bool:
+        """
+        Whether the cached catalog is missing or older than the TTL.
+        """
+        return self._response is None or time.time() - self._fetched_at > self.ttl
+
+    @property
+    def has_catalog(self) -> bool:
+        """
+        Whether a catalog (fresh or stale) is cached.
+        """
+        return self._response is not None
+
+    def store(self, response: Dict[str, Any]):
+        """
+        Store a freshly fetched catalog if the request succeeded.
+
+        Args:
+            response (Dict[str, Any]): A `get_memes` response.
+        """
+        if not response.get("success"):
+            return
+        fetched_at = time.time()
+        with self._lock:
+            self._response = response
+            self._fetched_at = fetched_at
+        self._save_to_disk(response, fetched_at)
+
+    def refresh(self) -> Dict[str, Any]:
+        """
+        Fetch a new catalog and store it if the request succeeded.
+
+        Returns:
+            Dict[str, Any]: The fetched `get_memes` response.
+        """
+        try:
+            response = self._fetch()
+            self.store(response)
+            return response
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Warning: Background template catalog refresh failed: {str(e)}")
+
+    def get(self) -> Dict[str, Any]:
+        """
+        Return the catalog, fetching it synchronously only if nothing is cached.
+
+        Returns:
+            Dict[str, Any]: A `get_memes` response.
+        """
+        with self._lock:
+            response = self._response
+            start_refresh = self.is_stale and response is not None and not self._refreshing
+            if start_refresh:
+                self._refreshing = True
+        if response is None:
+            return self.refresh()
+        if start_refresh:
+            threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        return response
+
+
+class TemplateDetailCache:
+    """
+    Bounded LRU cache of meme template details keyed by template ID.
+
+    Attributes:
+        maxsize (int): Maximum number of templates kept.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups that were not cached.
+    """
+
+    def __init__(self, maxsize: int = 1000):
+        """
+        Initialize an empty cache.
+
+        Args:
+            maxsize (int, optional): Maximum number of templates kept. Defaults to 1000.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._templates = OrderedDict()
+
+    def get(self, template_id) -> Optional[Dict[str, Any]]:
+        """
+        Look up a template and mark it as recently used.
+
+        Args:
+            template_id (int or str): The ID of the meme template.
+
+        Returns:
+            Optional[Dict[str, Any]]: The template details, or None if not cached.
+        """
+        key = str(template_id)
+        with self._lock:
+            template = self._templates.get(key)
+            if template is None:
+                self.misses += 1
+                return None
+            self._templates.move_to_end(key)
+            self.hits += 1
+            return template
+
+    def put(self, template: Dict[str, Any]):
+        """
+        Store a template, evicting the least recently used one when full.
+
+        Args:
+            template (Dict[str, Any]): Template details with at least `id` and `box_count`.
+        """
+        if "id" not in template or "box_count" not in template:
+            return
+        key = str(template["id"])
+        with self._lock:
+            self._templates[key] = template
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+
+    def seed(self, templates: Iterable[Dict[str, Any]]):
+        """
+        Store many templates, e.g. from the catalog or search results.
+
+        Args:
+            templates (Iterable[Dict[str, Any]]): Template details to store.
+        """
+        for template in templates:
+            self.put(template)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the cache counters.
+
+        Returns:
+            Dict[str, int]: Hits, misses and the number of cached templates.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._templates)}
+
+
+_template_cache = None
+_template_cache_lock = threading.Lock()
+
+
+def get_template_cache() -> TemplateDetailCache:
+    """
+    Return the process-wide template detail cache, creating it on first use.
+
+    Its size can be configured with the IMGFLIP_TEMPLATE_CACHE_SIZE environment variable.
+
+    Returns:
+        TemplateDetailCache: The shared cache.
+    """
+    global _template_cache
+    with _template_cache_lock:
+        if _template_cache is None:
+            _template_cache = TemplateDetailCache(int(os.getenv("IMGFLIP_TEMPLATE_CACHE_SIZE", "1000")))
+        return _template_cache
@@ -0,0 +1,231 @@
+"""
+Module providing a local search engine over meme templates.
+
+Templates are indexed by the words in their names and by aliases learned from
+past `search_memes` queries, so most `search` commands can be answered without
+calling Imgflip. Matching supports exact words, prefixes and single-typo
+misspellings.
+"""
+
+import bisect
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+NAME_WEIGHT = 1.0
+ALIAS_WEIGHT = 0.7
+
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.6
+TYPO_MATCH = 0.5
+
+# Words shorter than this are only matched exactly or by prefix
+MIN_TYPO_LENGTH = 4
+# Maximum number of vocabulary words a prefix is expanded to
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase alphanumeric words.
+
+    Args:
+        text (str): Text to split.
+
+    Returns:
+        List[str]: The words in the text.
+    """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _deletions(word: str) -> Set[str]:
+    """
+    Return every variant of `word` with one character removed.
+    """
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """
+    Check whether two words differ by at most one insertion, deletion,
+    substitution or transposition of adjacent characters.
+    """
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diffs) == 1:
+            return True
+        return (
+            len(diffs) == 2
+            and diffs[1] == diffs[0] + 1
+            and a[diffs[0]] == b[diffs[1]]
+            and a[diffs[1]] == b[diffs[0]]
+        )
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+class TemplateIndex:
+    """
+    Inverted index over meme template names and aliases.
+
+    Attributes:
+        templates (Dict[str, Dict[str, Any]]): Indexed templates by template ID.
+    """
+
+    def __init__(self):
+        self.templates: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._deletion_map: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+        self._rank: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def _add_word(self, word: str, template_id: str, weight: float):
+        postings = self._postings.get(word)
+        if postings is None:
+            postings = self._postings[word] = {}
+            self._vocabulary_dirty = True
+            if len(word) >= MIN_TYPO_LENGTH:
+                for variant in _deletions(word):
+                    self._deletion_map.setdefault(variant, set()).add(word)
+        if postings.get(template_id, 0.0) < weight:
+            postings[template_id] = weight
+
+    def add(self, template: Dict[str, Any], aliases: Iterable[str] = ()):
+        """
+        Add a template, or update an indexed one, with optional aliases.
+
+        Args:
+            template (Dict[str, Any]): Template details with at least `id` and `name`.
+            aliases (Iterable[str], optional): Extra phrases the template should be found by.
+        """
+        if "id" not in template or "name" not in template:
+            return
+        template_id = str(template["id"])
+        with self._lock:
+            self.templates[template_id] = template
+            self._rank.setdefault(template_id, len(self._rank))
+            for word in tokenize(template["name"]):
+                self._add_word(word, template_id, NAME_WEIGHT)
+            for alias in aliases:
+                for word in tokenize(alias):
+                    self._add_word(word, template_id, ALIAS_WEIGHT)
+
+    def add_many(self, templates: Iterable[Dict[str, Any]], alias: str = None):
+        """
+        Add several templates, e.g. a catalog page or a set of search results.
+
+        Templates are ranked by the order they are first added in, so the
+        popularity order of the catalog is used to break score ties.
+
+        Args:
+            templates (Iterable[Dict[str, Any]]): Templates to index.
+            alias (str, optional): Phrase all of the templates should be found by,
+                such as the query that returned them.
+        """
+        aliases = (alias,) if alias else ()
+        with self._lock:
+            for template in templates:
+                self.add(template, aliases)
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """
+        Return the vocabulary words matching a query term and how well they match.
+        """
+        matches = {}
+        if term in self._postings:
+            matches[term] = EXACT_MATCH
+
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, term)
+        for word in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not word.startswith(term):
+                break
+            matches.setdefault(word, PREFIX_MATCH)
+
+        if len(term) >= MIN_TYPO_LENGTH:
+            candidates = set(self._deletion_map.get(term, ()))
+            for variant in _deletions(term) | {term}:
+                if variant in self._postings:
+                    candidates.add(variant)
+                candidates.update(self._deletion_map.get(variant, ()))
+            for word in candidates:
+                if word not in matches and _within_one_edit(term, word):
+                    matches[word] = TYPO_MATCH
+        return list(matches.items())
+
+    def search(self, query: str, limit: int = 10, match_all: bool = False) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Find the templates best matching a query.
+
+        Each query word contributes its best match (exact, prefix or typo) to a
+        template's score. Ties are broken by catalog popularity.
+
+        Args:
+            query (str): The search query.
+            limit (int, optional): Maximum number of results. Defaults to 10.
+            match_all (bool, optional): Only return templates matched by every query word.
+                Defaults to False.
+
+        Returns:
+            List[Tuple[Dict[str, Any], float]]: Templates with their scores, best first.
+            A template matching every query word exactly by name scores `len(query words)`.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        scores: Dict[str, float] = {}
+        matched_terms: Dict[str, int] = {}
+        with self._lock:
+            for term in terms:
+                best: Dict[str, float] = {}
+                for word, match in self._expand(term):
+                    for template_id, weight in self._postings[word].items():
+                        score = match * weight
+                        if score > best.get(template_id, 0.0):
+                            best[template_id] = score
+                for template_id, score in best.items():
+                    scores[template_id] = scores.get(template_id, 0.0) + score
+                    matched_terms[template_id] = matched_terms.get(template_id, 0) + 1
+
+            if match_all:
+                scores = {
+                    template_id: score for template_id, score in scores.items()
+                    if matched_terms[template_id] == len(terms)
+                }
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], self._rank[item[0]]))
+            return [(self.templates[template_id], score) for template_id, score in ranked[:limit]]
+
+
+_template_index = None
+_template_index_lock = threading.Lock()
+
+
+def get_template_index() -> TemplateIndex:
+    """
+    Return the process-wide template index, creating it on first use.
+
+    Returns:
+        TemplateIndex: The shared index.
+    """
+    global _template_index
+    with _template_index_lock:
+        if _template_index is None:
+            _template_index = TemplateIndex()
+        return _template_index
@@ -0,0 +1,42 @@
+"""
+Command deadlines: cancellation, pausing and timeout capping.
+"""
+
+import asyncio
+
+import pytest
+
+from deadline import DEADLINE_GRACE, Deadline, DeadlineExceeded, cap_timeout, current_deadline, deadline_paused
+
+
+def test_deadline_cancels_the_block():
+    async def main():
+        async with Deadline(0.05, command="meme"):
+            await asyncio.sleep(1)
+
+    with pytest.raises(DeadlineExceeded) as info:
+        asyncio.run(main())
+    assert info.value.command == "meme"
+
+
+def test_paused_time_does_not_count():
+    async def main():
+        async with Deadline(0.1) as deadline:
+            with deadline_paused():
+                await asyncio.sleep(0.2)
+            assert not deadline.expired
+        return current_deadline()
+
+    assert asyncio.run(main()) is None
+
+
+def test_cap_timeout_follows_the_current_deadline():
+    assert cap_timeout(30) == 30
+
+    async def main():
+        async with Deadline(2):
+            return cap_timeout(30), cap_timeout(0.5)
+
+    capped, shorter = asyncio.run(main())
+    assert capped <= 2 + DEADLINE_GRACE
+    assert shorter == 0.5
@@ -0,0 +1,74 @@
+"""
+Ordering of a listing sent through the delivery pipeline.
+"""
+
+import asyncio
+
+from delivery_pipeline import DeliveryPipeline
+from message_status import DeliveryTracker
+
+
+class FakeTwilio:
+    """
+    Records when each message is created and marks media messages delivered after `media_delay` seconds.
+    """
+
+    def __init__(self, media_delay: float = 0.05):
+        self.media_delay = media_delay
+        self.delivery = DeliveryTracker(poll=None)
+        self.created = []
+        self.delivered = {}
+
+    def _create(self, name: str, media: bool = False):
+        loop = asyncio.get_running_loop()
+        sid = f"SM{len(self.created)}"
+        self.created.append(name)
+        handle = self.delivery.track(sid, "queued")
+        if media:
+            def deliver():
+                self.delivered[name] = len(self.created)
+                self.delivery.update(sid, "delivered")
+
+            loop.call_later(self.media_delay, deliver)
+        else:
+            self.delivery.update(sid, "delivered")
+        return handle
+
+    async def send_message_async(self, message):
+        return self._create(message)
+
+    async def send_media_message_async(self, message_body, url_for_media):
+        return self._create(message_body, media=True)
+
+    async def send_quick_reply_message_async(self, template_id):
+        return self._create(f"reply {template_id}")
+
+
+def send_listing(twilio: FakeTwilio, count: int):
+    async def main():
+        pipeline = DeliveryPipeline(twilio, delivery_timeout=1)
+        pipeline.send_message("notice")
+        for i in range(count):
+            pipeline.send_media_message(f"image {i}", url_for_media=f"https://i.imgflip.com/{i}.jpg")
+            pipeline.send_quick_reply_message(str(i))
+        pipeline.send_message("done")
+        return await pipeline.drain()
+
+    return asyncio.run(main())
+
+
+def test_images_are_sent_without_waiting_for_delivery():
+    twilio = FakeTwilio()
+    send_listing(twilio, 3)
+    # Every image was created before the first one was delivered
+    assert twilio.created[:4] == ["notice", "image 0", "image 1", "image 2"]
+
+
+def test_quick_replies_follow_their_image_and_done_comes_last():
+    twilio = FakeTwilio()
+    handles = send_listing(twilio, 3)
+    assert len(handles) == 8
+    for i in range(3):
+        # The reply is only created once its image was delivered
+        assert twilio.created.index(f"reply {i}") >= twilio.delivered[f"image {i}"]
+    assert twilio.created[-1] == "done"
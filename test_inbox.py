@@ -0,0 +1,50 @@
+"""
+Ordering and de-duplication of the inbound message inbox.
+"""
+
+import threading
+
+from inbox import Inbox
+
+
+def message(sid, body="help", author="whatsapp:+15551234567"):
+    return {"sid": sid, "body": body, "author": author}
+
+
+def test_duplicate_sids_are_dropped():
+    inbox = Inbox()
+    assert inbox.put(message("SM1"))
+    assert not inbox.put(message("SM1"))
+    assert inbox.depth == 1
+    assert inbox.stats()["duplicates"] == 1
+
+
+def test_dedupe_window_forgets_old_sids():
+    inbox = Inbox(dedupe_window=2)
+    for sid in ("SM1", "SM2", "SM3"):
+        inbox.put(message(sid))
+    assert inbox.put(message("SM1"))
+    assert not inbox.put(message("SM3"))
+
+
+def test_messages_are_taken_in_arrival_order():
+    inbox = Inbox()
+    for i in range(3):
+        inbox.put(message(f"SM{i}", body=str(i)))
+    assert [inbox.get(timeout=0)["body"] for _ in range(3)] == ["0", "1", "2"]
+    assert inbox.get(timeout=0) is None
+
+
+def test_match_leaves_other_messages_queued():
+    inbox = Inbox()
+    inbox.put(message("SM1", author="whatsapp:+1"))
+    inbox.put(message("SM2", author="whatsapp:+2"))
+    taken = inbox.get(timeout=0, match=lambda m: m["author"] == "whatsapp:+2")
+    assert taken["sid"] == "SM2"
+    assert inbox.get(timeout=0)["sid"] == "SM1"
+
+
+def test_get_wakes_up_when_a_message_arrives():
+    inbox = Inbox()
+    threading.Timer(0.05, inbox.put, args=(message("SM1"),)).start()
+    assert inbox.get(timeout=1)["sid"] == "SM1"
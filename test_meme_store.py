@@ -0,0 +1,70 @@
+"""
+Cursor pagination of the meme timeline and the meme database.
+"""
+
+import pytest
+
+from meme_db import MemeDatabase
+from meme_store import MemeTimeline, decode_cursor, encode_cursor
+
+
+def make_memes(count):
+    return [
+        {
+            "timestamp": f"2025-01-01T00:00:{i:02d}",
+            "imgflip_url": f"https://i.imgflip.com/{i}.jpg",
+            "type": "ai" if i % 2 else "auto",
+            "template_id": str(i % 3),
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(params=["timeline", "database"])
+def pager(request, tmp_path):
+    memes = make_memes(25)
+    if request.param == "timeline":
+        return MemeTimeline(memes)
+    database = MemeDatabase(str(tmp_path / "memes.db"))
+    database.add_many(memes)
+    return database
+
+
+def all_pages(pager, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        page, cursor = pager.page(limit, cursor, **filters)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_meme_newest_first(pager):
+    pages = all_pages(pager, 10)
+    assert [len(page) for page in pages] == [10, 10, 5]
+    timestamps = [meme["timestamp"] for page in pages for meme in page]
+    assert timestamps == sorted(timestamps, reverse=True)
+    assert len(set(timestamps)) == 25
+
+
+def test_cursor_is_stable_when_memes_are_added(pager):
+    first, cursor = pager.page(10)
+    if isinstance(pager, MemeTimeline):
+        pager = MemeTimeline(make_memes(25) + [{"timestamp": "2025-01-02T00:00:00", "imgflip_url": "new"}])
+    else:
+        pager.add({"timestamp": "2025-01-02T00:00:00", "imgflip_url": "new"})
+    second, _ = pager.page(10, cursor)
+    assert second[0]["timestamp"] < first[-1]["timestamp"]
+
+
+def test_filters(pager):
+    memes = [meme for page in all_pages(pager, 4, meme_type="ai", template_id="1") for meme in page]
+    assert memes and all(meme["type"] == "ai" and meme["template_id"] == "1" for meme in memes)
+    assert len(memes) == sum(1 for meme in make_memes(25) if meme["type"] == "ai" and meme["template_id"] == "1")
+
+
+def test_cursor_round_trip_and_validation():
+    meme = make_memes(1)[0]
+    assert decode_cursor(encode_cursor(meme)) == (meme["timestamp"], meme["imgflip_url"])
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
@@ -0,0 +1,75 @@
+"""
+Circuit breaker behaviour of the request guard.
+"""
+
+import asyncio
+import time
+
+import pytest
+import requests
+
+from request_guard import CircuitBreaker, CircuitOpenError, RequestGuard
+
+
+def open_guard(reset_timeout: float = 0.05) -> RequestGuard:
+    guard = RequestGuard(max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=reset_timeout))
+
+    def fail():
+        raise requests.ConnectionError("down")
+
+    with pytest.raises(requests.ConnectionError):
+        guard.call(fail)
+    assert guard.breaker.state == CircuitBreaker.OPEN
+    return guard
+
+
+def test_open_circuit_rejects_until_reset():
+    guard = open_guard(reset_timeout=60)
+    with pytest.raises(CircuitOpenError):
+        guard.call(lambda: "ok")
+    assert guard.breaker.rejected == 1
+
+
+def test_successful_trial_closes_circuit():
+    guard = open_guard()
+    time.sleep(0.06)
+    assert guard.call(lambda: "ok") == "ok"
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_trial_does_not_block_later_requests():
+    guard = open_guard()
+    time.sleep(0.06)
+
+    async def main():
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        trial = asyncio.create_task(guard.call_async(slow))
+        await started.wait()
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        async def fast():
+            return "ok"
+
+        return await guard.call_async(fast)
+
+    assert asyncio.run(main()) == "ok"
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_interrupted_blocking_trial_does_not_block_later_requests():
+    guard = open_guard()
+    time.sleep(0.06)
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        guard.call(interrupted)
+    assert guard.call(lambda: "ok") == "ok"
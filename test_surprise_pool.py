@@ -0,0 +1,85 @@
+"""
+Refilling and shutting down the surprise meme pool.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from prompt_pool import PromptPool
+from surprise_pool import SurpriseMemePool
+
+
+@pytest.fixture
+def prompts(tmp_path):
+    path = tmp_path / "prompts.json"
+    path.write_text(json.dumps({"test": ["p1", "p2", "p3", "p4"]}))
+    return PromptPool(str(path))
+
+
+def make_pool(prompts, latency: float = 0.01, **kwargs) -> SurpriseMemePool:
+    async def generate(prompt):
+        await asyncio.sleep(latency)
+        return {"success": True, "data": {"url": f"https://i.imgflip.com/{prompt}.jpg"}}
+
+    return SurpriseMemePool(prompts, generate, **kwargs)
+
+
+def run(main):
+    # Not asyncio.run: it would wait forever for a refill task that ignores its cancellation
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+
+async def close(pool: SurpriseMemePool):
+    await asyncio.wait_for(asyncio.shield(pool.close()), timeout=1)
+
+
+def test_pool_refills_after_take(prompts):
+    async def main():
+        pool = make_pool(prompts, size=3)
+        pool.start()
+        await asyncio.sleep(0.1)
+        assert pool.stats()["ready"] == 3
+        assert pool.take() is not None
+        await asyncio.sleep(0.1)
+        stats = pool.stats()
+        await close(pool)
+        return stats
+
+    stats = run(main)
+    assert stats["ready"] == 3
+    assert stats["hits"] == 1
+
+
+def test_take_skips_prompts_the_user_saw_recently(prompts):
+    async def main():
+        pool = make_pool(prompts, size=4, concurrency=4)
+        pool.start()
+        await asyncio.sleep(0.1)
+        served = [pool.take(user="whatsapp:+1") for _ in range(4)]
+        await close(pool)
+        return served
+
+    served = [ready[0] for ready in run(main) if ready is not None]
+    assert len(served) == len(set(served))
+
+
+def test_close_stops_refill_while_it_is_being_woken(prompts):
+    async def main():
+        for _ in range(50):
+            pool = make_pool(prompts, latency=0, size=5)
+            pool.start()
+            for _ in range(5):
+                await asyncio.sleep(0)
+                pool.take()
+            # Wake the refill task in the same iteration as the cancellation
+            pool._wakeup.set()
+            await close(pool)
+            assert pool.stats()["generating"] == 0
+
+    run(main)
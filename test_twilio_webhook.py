@@ -0,0 +1,44 @@
+"""
+Round trips of signed test webhooks through the webhook server.
+"""
+
+import pytest
+
+from twilio_webhook import WebhookServer, send_test_webhook
+
+AUTH_TOKEN = "test-auth-token"
+AUTHOR = "whatsapp:+15551234567"
+
+
+@pytest.fixture
+def make_server():
+    servers = []
+
+    def make(path: str = ""):
+        server = WebhookServer(port=0, auth_token=AUTH_TOKEN, host="127.0.0.1")
+        # The public URL is only known once the port is
+        server.public_url = f"http://localhost:{server.port}{path}"
+        server.start()
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.stop()
+
+
+@pytest.mark.parametrize("path", ["", "/", "/twilio/webhook"])
+def test_signed_webhook_is_accepted(make_server, path):
+    server = make_server(path)
+    status = send_test_webhook(server.public_url, "help", AUTHOR, auth_token=AUTH_TOKEN)
+    assert status == 204
+    message = server.messages.get(timeout=1)
+    assert message["author"] == AUTHOR
+    assert message["body"] == "help"
+
+
+def test_wrong_signature_is_rejected(make_server):
+    server = make_server()
+    status = send_test_webhook(server.public_url, "help", AUTHOR, auth_token="another-token")
+    assert status == 403
+    assert server.messages.get(timeout=0.1) is None
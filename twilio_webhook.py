@@ -0,0 +1,228 @@
+"""
+Module for receiving Twilio webhooks instead of polling the conversation.
+
+A small local HTTP endpoint accepts Conversations `onMessageAdded` callbacks
+and incoming WhatsApp message callbacks, validates their signatures and puts
+the messages in an in-process inbox that the bot consumes. Delivery status
+callbacks are passed on to the bot as well.
+"""
+
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from rich.console import Console
+from twilio.request_validator import RequestValidator
+
+from inbox import Inbox
+
+console = Console()
+
+SIGNATURE_HEADER = "X-Twilio-Signature"
+
+
+def parse_inbound_message(params: Dict[str, str]) -> Optional[Dict[str, str]]:
+    """
+    Turn webhook form parameters into an inbound message.
+
+    Supports Conversations `onMessageAdded` events and incoming Messaging webhooks.
+
+    Args:
+        params (Dict[str, str]): The form parameters posted by Twilio.
+
+    Returns:
+        Optional[Dict[str, str]]: A message with `sid`, `author`, `body` and
+        `conversation_sid` keys, or None for other events.
+    """
+    if params.get("EventType") == "onMessageAdded":
+        return {
+            "sid": params.get("MessageSid"),
+            "author": params.get("Author"),
+            "body": params.get("Body", ""),
+            "conversation_sid": params.get("ConversationSid"),
+        }
+    if "From" in params and "Body" in params:
+        return {
+            "sid": params.get("MessageSid"),
+            "author": params["From"],
+            "body": params["Body"],
+            "conversation_sid": None,
+        }
+    return None
+
+
+def parse_status_update(params: Dict[str, str]) -> Optional[Tuple[str, str]]:
+    """
+    Turn webhook form parameters into a delivery status update.
+
+    Supports Messaging status callbacks and Conversations `onDeliveryUpdated` events.
+
+    Args:
+        params (Dict[str, str]): The form parameters posted by Twilio.
+
+    Returns:
+        Optional[Tuple[str, str]]: The message SID and its new status, or None for other events.
+    """
+    if params.get("EventType") == "onDeliveryUpdated":
+        return params.get("MessageSid"), params.get("Status")
+    if "MessageStatus" in params and "Body" not in params:
+        return params.get("MessageSid"), params["MessageStatus"]
+    return None
+
+
+class WebhookServer:
+    """
+    Local HTTP endpoint feeding inbound Twilio messages into an inbox.
+
+    Attributes:
+        messages (Inbox): Inbound messages in arrival order.
+        port (int): The port the server listens on.
+    """
+
+    def __init__(self, port: int = 8080, auth_token: str = None, public_url: str = None,
+                 validate: bool = True, host: str = "0.0.0.0", inbox: Inbox = None,
+                 accept: Callable[[Dict[str, str]], bool] = None,
+                 on_status: Callable[[str, str], None] = None):
+        """
+        Initialize the webhook server.
+
+        Args:
+            port (int, optional): Port to listen on (0 picks a free one). Defaults to 8080.
+            auth_token (str, optional): Twilio auth token used to validate signatures.
+                Defaults to os.getenv("TWILIO_AUTH_TOKEN").
+            public_url (str, optional): URL Twilio posts to, exactly as configured in
+                Twilio, since that is what the signature is computed over. Defaults to
+                os.getenv("TWILIO_WEBHOOK_URL") or the local address.
+            validate (bool, optional): Reject requests with invalid signatures. Defaults to True.
+            host (str, optional): Interface to bind to. Defaults to "0.0.0.0".
+            inbox (Inbox, optional): Inbox to deliver messages to. Defaults to a new one.
+            accept (Callable, optional): Predicate deciding which parsed messages are
+                queued, e.g. to drop the bot's own messages. Defaults to accepting all.
+            on_status (Callable, optional): Called with the message SID and status of
+                every delivery status callback. Defaults to ignoring them.
+
+        Raises:
+            ValueError: If validation is enabled but no auth token is available.
+        """
+        self.messages = inbox or Inbox()
+        self.accept = accept
+        self.on_status = on_status
+        auth_token = auth_token or os.getenv("TWILIO_AUTH_TOKEN")
+        if validate and not auth_token:
+            raise ValueError("Twilio auth token not found. Please set TWILIO_AUTH_TOKEN in .env file")
+        self.validator = RequestValidator(auth_token) if validate else None
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.port = self._server.server_address[1]
+        self.public_url = public_url or os.getenv("TWILIO_WEBHOOK_URL") or f"http://localhost:{self.port}"
+        self._thread = None
+
+    def signed_urls(self, path: str) -> List[str]:
+        """
+        Return the URLs Twilio may have signed a request arriving at `path` with.
+
+        Twilio signs the exact URL it posts to. That is the public origin plus the
+        request path, unless a proxy in front of the server strips the path of the
+        configured URL, in which case it is the configured URL (plus e.g. "/status").
+
+        Args:
+            path (str): Path and query of the request as received.
+
+        Returns:
+            List[str]: Candidate URLs, any of which may match the signature.
+        """
+        parts = urlsplit(self.public_url)
+        urls = [f"{parts.scheme}://{parts.netloc}{path}"]
+        if path == "/":
+            urls.append(self.public_url)
+        else:
+            urls.append(self.public_url.rstrip("/") + path)
+        return urls
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                params = dict(parse_qsl(self.rfile.read(length).decode("utf-8"), keep_blank_values=True))
+                if server.validator is not None:
+                    signature = self.headers.get(SIGNATURE_HEADER, "")
+                    if not any(server.validator.validate(url, params, signature)
+                               for url in server.signed_urls(self.path)):
+                        console.print("Rejected webhook with invalid signature", style="bold red")
+                        self.send_response(403)
+                        self.end_headers()
+                        return
+                status = parse_status_update(params)
+                if status is not None:
+                    if server.on_status is not None:
+                        server.on_status(*status)
+                    self.send_response(204)
+                    self.end_headers()
+                    return
+                message = parse_inbound_message(params)
+                if message is not None and (server.accept is None or server.accept(message)):
+                    server.messages.put(message)
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """
+        Start serving in a background thread.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        console.print(f"Listening for Twilio webhooks on port {self.port}", style="bold green")
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def send_test_webhook(url: str, body: str, author: str, auth_token: str = None,
+                      conversation_sid: str = None, message_sid: str = None) -> int:
+    """
+    Post a signed `onMessageAdded` callback, standing in for Twilio during testing.
+
+    Args:
+        url (str): Full webhook URL, as configured in Twilio.
+        body (str): The message text.
+        author (str): The message author, e.g. "whatsapp:+15551234567".
+        auth_token (str, optional): Token to sign with. Defaults to os.getenv("TWILIO_AUTH_TOKEN").
+        conversation_sid (str, optional): Conversation SID to report. Defaults to None,
+            which is accepted by a bot serving any conversation.
+        message_sid (str, optional): Message SID to report. Defaults to a random one.
+
+    Returns:
+        int: The HTTP status code returned by the webhook server.
+    """
+    params = {
+        "EventType": "onMessageAdded",
+        "MessageSid": message_sid or f"IM{os.urandom(16).hex()}",
+        "Author": author,
+        "Body": body,
+    }
+    if conversation_sid:
+        params["ConversationSid"] = conversation_sid
+    signature = RequestValidator(auth_token or os.getenv("TWILIO_AUTH_TOKEN", "")).compute_signature(url, params)
+    response = requests.post(url, data=params, headers={SIGNATURE_HEADER: signature})
+    return response.status_code
+
+
+if __name__ == "__main__":
+    # Usage: python twilio_webhook.py <webhook url> <author> <message>
+    status = send_test_webhook(sys.argv[1], " ".join(sys.argv[3:]), sys.argv[2])
+    console.print(f"Webhook responded with {status}", style="bold green")
@@ -1,49 +1,172 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, render_template, jsonify, request
 import json
 import os
+import sys
+import time
 from datetime import datetime
 
+# The meme archive reader lives next to the bot in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from content_cache import ContentCache, file_signature
+from meme_db import get_meme_database
+from meme_store import MemeTimeline, archive_paths, read_memes
+from response_cache import ENCODINGS, ResponseCache, etag_variants, make_etag
+
 app = Flask(__name__)
 
-def load_memes():
+MEMES_FOLDER = os.path.join('website', 'memes')
+PRESENTATION_FILE = os.path.join('website', 'content', 'presentation.json')
+TEAM_FILE = os.path.join('website', 'content', 'team.json')
+GALLERY_TEMPLATE = os.path.join(app.root_path, 'templates', 'gallery.html')
+
+# Memes rendered with the gallery page; the rest is fetched while scrolling
+GALLERY_PAGE_SIZE = 12
+API_PAGE_SIZE = 24
+API_MAX_PAGE_SIZE = 100
+
+# Parsed content is kept between requests and reloaded only when its files change
+content_cache = ContentCache()
+
+# Rendered and compressed gallery and API responses, per archive version
+response_cache = ResponseCache()
+
+# Seconds to wait before trying to open the database again, doubled after every failure
+DATABASE_RETRY_DELAY = 5.0
+DATABASE_MAX_RETRY_DELAY = 300.0
+_database_retry_at = 0.0
+_database_failures = 0
+
+def load_database():
+    # The SQLite archive the bot writes to, or None while it cannot be opened (e.g. locked, or a read-only deployment)
+    global _database_retry_at, _database_failures
+    if time.monotonic() < _database_retry_at:
+        return None
     try:
-        meme_file = os.path.join('website', 'memes', 'meme_metadata.json')
-        with open(meme_file, 'r') as f:
-            data = json.load(f)
-            # Sort memes by timestamp in descending order
-            data['memes'].sort(key=lambda x: x['timestamp'], reverse=True)
-            return data['memes']
+        database = get_meme_database(MEMES_FOLDER)
+    except Exception as e:
+        delay = min(DATABASE_RETRY_DELAY * 2 ** _database_failures, DATABASE_MAX_RETRY_DELAY)
+        _database_failures += 1
+        _database_retry_at = time.monotonic() + delay
+        print(f"Warning: Could not open meme database, reading the JSON archive for {delay:.0f}s: {e}")
+        return None
+    _database_failures = 0
+    return database
+
+def load_json_timeline():
+    try:
+        return content_cache.get('memes', archive_paths(MEMES_FOLDER),
+                                 lambda: MemeTimeline(read_memes(MEMES_FOLDER)))
     except Exception as e:
         print(f"Error loading memes: {e}")
-        return []
+        return MemeTimeline([])
+
+def load_timeline():
+    # Both provide page() and newest
+    database = load_database()
+    return database if database is not None else load_json_timeline()
+
+def load_memes():
+    # All memes, newest first
+    return load_timeline().newest
+
+def content_version():
+    # Changes whenever a meme is added or the gallery template is edited; also returns when that happened
+    database = load_database()
+    if database is not None:
+        signature = file_signature([database.path, database.path + '-wal', GALLERY_TEMPLATE])
+        version = (database.version(), signature[-1])
+    else:
+        signature = file_signature(archive_paths(MEMES_FOLDER) + [GALLERY_TEMPLATE])
+        version = signature
+    last_modified = max((entry[0] for entry in signature if entry), default=0) / 1e9
+    return version, last_modified
+
+def conditional_response(render, mimetype):
+    # Answer 304 if the client has the current version, else send the cached, compressed body
+    version, last_modified = content_version()
+    key = request.full_path
+    if request.if_none_match:
+        matched = [etag for etag in etag_variants(key, version) if request.if_none_match.contains(etag)]
+        not_modified = bool(matched)
+    else:
+        matched = []
+        not_modified = (request.if_modified_since is not None
+                        and int(last_modified) <= request.if_modified_since.timestamp())
+
+    if not_modified:
+        response = Response(status=304)
+        etag = matched[0] if matched else make_etag(key, version)
+    else:
+        encoding = request.accept_encodings.best_match(ENCODINGS, default='identity')
+        body, encoding = response_cache.body(key, version, encoding, render)
+        response = Response(body, mimetype=mimetype)
+        if encoding != 'identity':
+            response.content_encoding = encoding
+        etag = make_etag(key, version, encoding)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.vary.add('Accept-Encoding')
+    # Browsers may keep the response but must check it is current, which costs a 304 at most
+    response.cache_control.no_cache = True
+    return response
+
+def _requested_type():
+    meme_type = request.args.get('type')
+    return None if meme_type in (None, '', 'all') else meme_type
+
+def _load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
 
 def load_presentation():
     try:
-        presentation_file = os.path.join('website', 'content', 'presentation.json')
-        with open(presentation_file, 'r') as f:
-            return json.load(f)
+        return content_cache.get('presentation', [PRESENTATION_FILE], lambda: _load_json(PRESENTATION_FILE))
     except Exception as e:
         print(f"Error loading presentation: {e}")
         return {}
 
 def load_team():
     try:
-        team_file = os.path.join('website', 'content', 'team.json')
-        with open(team_file, 'r') as f:
-            data = json.load(f)
-            return data['team']
+        return content_cache.get('team', [TEAM_FILE], lambda: _load_json(TEAM_FILE)['team'])
     except Exception as e:
         print(f"Error loading team data: {e}")
         return []
 
 @app.route('/')
 def gallery():
-    memes = load_memes()
-    return render_template('gallery.html', memes=memes)
+    meme_type = _requested_type()
+
+    def render():
+        memes, next_cursor = load_timeline().page(GALLERY_PAGE_SIZE, meme_type=meme_type)
+        return render_template('gallery.html', memes=memes, next_cursor=next_cursor,
+                               meme_type=meme_type or 'all', page_size=API_PAGE_SIZE).encode('utf-8')
+
+    return conditional_response(render, 'text/html')
 
 @app.route('/api/memes')
 def get_memes():
-    return jsonify(load_memes())
+    # Newest first, one page per request: ?limit=24&type=ai&template_id=61579&cursor=<next_cursor of the previous page>
+    try:
+        limit = int(request.args.get('limit', API_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    limit = max(1, min(limit, API_MAX_PAGE_SIZE))
+
+    def render():
+        memes, next_cursor = load_timeline().page(limit, cursor=request.args.get('cursor') or None,
+                                                  meme_type=_requested_type(),
+                                                  template_id=request.args.get('template_id') or None)
+        return jsonify({'memes': memes, 'next_cursor': next_cursor}).get_data()
+
+    try:
+        return conditional_response(render, 'application/json')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/stats')
+def get_stats():
+    # Reload counts and load times of the cached content, and how often cached responses were reused
+    return jsonify({**content_cache.stats(), 'responses': response_cache.stats()})
 
 @app.route('/presentation/<int:slide_id>')
 def presentation(slide_id):